@@ -1,4 +1,5 @@
 from django.contrib.auth import authenticate, login
+from django.utils import timezone
 from rest_framework.exceptions import AuthenticationFailed
 from .models import LauncherToken
 
@@ -21,9 +22,7 @@ class AuthService:
     def launcher_login(request, username: str, password: str):
         user = AuthService.authenticate_user(request, username, password)
 
-        token = LauncherToken.objects.create(
-            user=user,
-            token=LauncherToken.generate_token(),
-        )
+        LauncherToken.objects.filter(user=user, expires_at__lte=timezone.now()).delete()
+        token, raw = LauncherToken.issue(user)
 
-        return user, token
+        return user, token, raw
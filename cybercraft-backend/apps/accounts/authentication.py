@@ -1,8 +1,23 @@
+import hmac
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from .models import LauncherToken
 
 
+def token_cache_key(digest: str) -> str:
+    return f"launcher_token:{digest}"
+
+
+def invalidate_tokens(digests):
+    cache.delete_many([token_cache_key(d) for d in digests])
+
+
 class LauncherTokenAuthentication(BaseAuthentication):
     keyword = "Launcher"
 
@@ -19,12 +34,42 @@ class LauncherTokenAuthentication(BaseAuthentication):
         if keyword != self.keyword:
             return None
 
-        try:
-            launcher_token = LauncherToken.objects.select_related("user").get(
-                token=token,
-                is_active=True,
-            )
-        except LauncherToken.DoesNotExist:
+        digest = LauncherToken.hash_token(token)
+        key = token_cache_key(digest)
+
+        cached = cache.get(key)
+        if cached is not None:
+            user_id, expires = cached
+            if expires > time.time():
+                # only the id is cached, so a deactivated user is refused
+                # at once rather than when the entry expires
+                user = get_user_model().objects.filter(id=user_id).first()
+                if user is None or not user.is_active:
+                    cache.delete(key)
+                    raise AuthenticationFailed("User inactive or deleted")
+                return (user, None)
+            cache.delete(key)
+
+        launcher_token = None
+        candidates = LauncherToken.objects.select_related("user").filter(
+            prefix=token[: LauncherToken.PREFIX_LENGTH],
+            is_active=True,
+            expires_at__gt=timezone.now(),
+        )
+        for candidate in candidates:
+            if hmac.compare_digest(candidate.digest, digest):
+                launcher_token = candidate
+                break
+
+        if launcher_token is None:
             raise AuthenticationFailed("Invalid launcher token")
+        if not launcher_token.user.is_active:
+            raise AuthenticationFailed("User inactive or deleted")
+
+        expires = launcher_token.expires_at.timestamp()
+        timeout = min(settings.LAUNCHER_TOKEN_CACHE_TTL, expires - time.time())
+        cache.set(
+            key, (launcher_token.user_id, expires), timeout=max(1, int(timeout))
+        )
 
         return (launcher_token.user, None)
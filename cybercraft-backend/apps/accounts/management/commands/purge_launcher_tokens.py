@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.accounts.models import LauncherToken
+
+
+class Command(BaseCommand):
+    help = "Delete expired and logged-out launcher tokens (run from cron)"
+
+    def handle(self, *args, **options):
+        deleted, _ = LauncherToken.objects.filter(
+            Q(expires_at__lte=timezone.now()) | Q(is_active=False)
+        ).delete()
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} launcher tokens"))
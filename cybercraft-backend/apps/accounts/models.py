@@ -2,10 +2,12 @@ import re
 import uuid
 import secrets
 import hashlib
+from datetime import timedelta
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.conf import settings
+from django.utils import timezone
 
 USERNAME_REGEX = re.compile(r"^[A-Za-z0-9_]+$")
 
@@ -87,19 +89,46 @@ class User(AbstractUser):
         return self.username
 
 
+def launcher_token_expiry():
+    return timezone.now() + timedelta(seconds=settings.LAUNCHER_TOKEN_TTL)
+
+
 class LauncherToken(models.Model):
+    """
+    Launcher session token. Only the SHA-256 digest is stored; ``prefix``
+    (the first characters of the raw token) is indexed for lookups and for
+    telling tokens apart without revealing them.
+    """
+
+    PREFIX_LENGTH = 8
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name="launcher_tokens",
     )
-    token = models.CharField(max_length=64, unique=True)
+    prefix = models.CharField(max_length=PREFIX_LENGTH, db_index=True)
+    digest = models.CharField(max_length=64, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(default=launcher_token_expiry, db_index=True)
     is_active = models.BooleanField(default=True)
 
     @staticmethod
     def generate_token() -> str:
         return secrets.token_hex(32)
 
+    @staticmethod
+    def hash_token(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def issue(cls, user):
+        """Create a token for ``user``; returns (instance, raw token)."""
+        raw = cls.generate_token()
+        token = cls.objects.create(
+            user=user, prefix=raw[: cls.PREFIX_LENGTH], digest=cls.hash_token(raw)
+        )
+        return token, raw
+
     def __str__(self):
-        return f"LauncherToken(user={self.user.username})"
+        return f"LauncherToken(user={self.user.username}, prefix={self.prefix})"
@@ -1 +1,77 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .models import LauncherToken, User
+
+
+class LauncherTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="steve", password="secret")
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post(
+            "/api/auth/launcher/login/",
+            {"username": "steve", "password": "secret"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data["token"]
+
+    def me(self, token):
+        return self.client.get(
+            "/api/auth/launcher/me/", HTTP_AUTHORIZATION=f"Launcher {token}"
+        )
+
+    def test_only_the_digest_is_stored(self):
+        raw = self.login()
+
+        token = LauncherToken.objects.get(user=self.user)
+        self.assertEqual(token.digest, LauncherToken.hash_token(raw))
+        self.assertEqual(token.prefix, raw[: LauncherToken.PREFIX_LENGTH])
+        self.assertNotIn(raw, [token.digest, token.prefix])
+        self.assertEqual(self.me(raw).data["username"], "steve")
+        self.assertEqual(self.me(raw + "x").status_code, 403)
+
+    def test_logout_revokes_cached_token(self):
+        raw = self.login()
+        self.assertEqual(self.me(raw).status_code, 200)
+
+        response = self.client.post(
+            "/api/auth/launcher/logout/", HTTP_AUTHORIZATION=f"Launcher {raw}"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.me(raw).status_code, 403)
+
+    def test_expired_token_is_rejected_and_purged(self):
+        raw = self.login()
+        LauncherToken.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.me(raw).status_code, 403)
+
+        fresh = self.login()
+        revoked = LauncherToken.issue(self.user)[0]
+        LauncherToken.objects.filter(id=revoked.id).update(is_active=False)
+        call_command("purge_launcher_tokens", stdout=StringIO())
+
+        self.assertEqual(
+            list(LauncherToken.objects.values_list("digest", flat=True)),
+            [LauncherToken.hash_token(fresh)],
+        )
+
+    def test_deactivated_user_is_rejected_despite_cache(self):
+        raw = self.login()
+        self.assertEqual(self.me(raw).status_code, 200)  # now cached
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.me(raw).status_code, 403)
+
+        cache.clear()
+        self.assertEqual(self.me(raw).status_code, 403)
@@ -12,7 +12,7 @@ from django.core.files.base import ContentFile
 
 from .models import LauncherToken
 from .auth_service import AuthService
-from .authentication import LauncherTokenAuthentication
+from .authentication import LauncherTokenAuthentication, invalidate_tokens
 from .serializers import (
     LauncherLoginSerializer,
     UserSerializer,
@@ -98,7 +98,7 @@ def launcher_login(request):
     serializer = LauncherLoginSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
 
-    user, token = AuthService.launcher_login(
+    user, _, raw_token = AuthService.launcher_login(
         request,
         serializer.validated_data["username"],
         serializer.validated_data["password"],
@@ -106,7 +106,7 @@ def launcher_login(request):
 
     return Response(
         {
-            "token": token.token,
+            "token": raw_token,
             "user": UserSerializer(user).data,
         }
     )
@@ -121,10 +121,12 @@ def launcher_me(request):
 @api_view(["POST"])
 @authentication_classes([LauncherTokenAuthentication])
 def launcher_logout(request):
-    LauncherToken.objects.filter(
+    tokens = LauncherToken.objects.filter(
         user=request.user,
         is_active=True,
-    ).update(is_active=False)
+    )
+    invalidate_tokens(list(tokens.values_list("digest", flat=True)))
+    tokens.update(is_active=False)
 
     return Response({"detail": "launcher_logged_out"})
 
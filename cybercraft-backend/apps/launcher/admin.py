@@ -1,16 +1,19 @@
 from django.contrib import admin
 from .models import LauncherBuild
-from .services import sha256_file
+from django.conf import settings
+from .services import hash_file
 
 
 @admin.register(LauncherBuild)
 class LauncherBuildAdmin(admin.ModelAdmin):
     list_display = ("version", "build_number", "is_active", "created_at")
-    readonly_fields = ("sha256",)
+    readonly_fields = ("sha256", "chunks")
 
     def save_model(self, request, obj, form, change):
         if obj.asar_file:
-            obj.sha256 = sha256_file(obj.asar_file)
+            obj.sha256, obj.chunks = hash_file(
+                obj.asar_file, settings.DOWNLOAD_CHUNK_SIZE
+            )
 
         if obj.is_active:
             LauncherBuild.objects.exclude(pk=obj.pk).update(is_active=False)
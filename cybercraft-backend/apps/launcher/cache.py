@@ -0,0 +1,224 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from apps.modpacks.services import generate_manifest, manifest_delta, read_manifest
+from apps.server.models import Server
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_fill_locks = {}
+_fill_locks_guard = threading.Lock()
+
+
+def _fill_lock(key: str) -> threading.Lock:
+    with _fill_locks_guard:
+        return _fill_locks.setdefault(key, threading.Lock())
+
+
+def build_payload(body: bytes, **extra) -> dict:
+    payload = {
+        **extra,
+        "etag": hashlib.sha256(body).hexdigest()[:32],
+        "identity": body,
+        "gzip": gzip.compress(body, compresslevel=6),
+    }
+    if brotli is not None:
+        payload["br"] = brotli.compress(body)
+    return payload
+
+
+def cached_payload(key: str, build, timeout=None):
+    """Return the payload cached under ``key``, building it once on a miss."""
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+
+    with _fill_lock(key):
+        payload = cache.get(key)
+        if payload is None:
+            payload = build()
+            cache.set(key, payload, timeout=timeout)
+    return payload
+
+
+def etag_matches(request, etag: str) -> bool:
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"').split("-", 1)[0] == etag:
+            return True
+    return False
+
+
+def accepts(header: str, coding: str) -> bool:
+    """Whether an Accept-Encoding ``header`` allows ``coding`` (q > 0)."""
+    wildcard = False
+    for item in header.split(","):
+        name, *params = item.split(";")
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        name = name.strip().lower()
+        if name == coding:
+            return q > 0
+        if name == "*":
+            wildcard = q > 0
+    return wildcard
+
+
+def payload_response(request, payload: dict) -> HttpResponse:
+    etag = payload["etag"]
+
+    accept = request.headers.get("Accept-Encoding", "")
+    encoding = None
+    if "br" in payload and accepts(accept, "br"):
+        encoding = "br"
+    elif accepts(accept, "gzip"):
+        encoding = "gzip"
+
+    if etag_matches(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(
+            payload[encoding or "identity"], content_type="application/json"
+        )
+        if encoding:
+            response["Content-Encoding"] = encoding
+
+    response["ETag"] = f'"{etag}-{encoding}"' if encoding else f'"{etag}"'
+    response["Vary"] = "Accept-Encoding"
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+def manifest_stamp(modpack_path: str) -> int:
+    """mtime of the modpack's manifest.json, 0 if it is missing."""
+    try:
+        return os.stat(Path(modpack_path) / "manifest.json").st_mtime_ns
+    except OSError:
+        return 0
+
+
+def manifest_key(modpack_id: int, stamp: int) -> str:
+    # the file's mtime is part of the key, so a manifest regenerated by
+    # another process (manage.py generate_manifest) is picked up even when
+    # the cache is not shared
+    return f"launcher:manifest:{modpack_id}:{stamp}"
+
+
+def server_modpack_key(server_id: int) -> str:
+    return f"launcher:server_modpack:{server_id}"
+
+
+def server_modpack(server_id: int):
+    """(modpack id, modpack path) of a server, or None if it does not exist."""
+    key = server_modpack_key(server_id)
+    row = cache.get(key)
+    if row is None:
+        row = (
+            Server.objects.filter(pk=server_id)
+            .values_list("modpack_id", "modpack__path")
+            .first()
+        )
+        if row is None:
+            return None
+        # the TTL bounds staleness when another process moved the server to
+        # another modpack and the cache is not shared (locmem)
+        cache.set(key, row, timeout=settings.LAUNCHER_SERVERS_TTL)
+    return row
+
+
+def compact_json(data) -> bytes:
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def manifest_payload(modpack) -> dict:
+    def build():
+        manifest = read_manifest(modpack)
+        if manifest is None:
+            manifest = generate_manifest(modpack)
+        return build_payload(compact_json(manifest), version=manifest.get("version"))
+
+    return cached_payload(
+        manifest_key(modpack.id, manifest_stamp(modpack.path)), build, timeout=86400
+    )
+
+
+def delta_payload(modpack, since: int, current: int):
+    """Payload with the changes since ``since``, or None if a full sync is needed."""
+
+    def build():
+        delta = manifest_delta(modpack, since)
+        if delta is None or delta["version"] != current:
+            return {}
+        return build_payload(compact_json(delta), version=current)
+
+    payload = cached_payload(
+        f"launcher:manifest:{modpack.id}:v{current}:since:{since}", build, timeout=86400
+    )
+    return payload or None
+
+
+def invalidate_manifest(modpack):
+    cache.delete(manifest_key(modpack.id, manifest_stamp(modpack.path)))
+
+
+SERVERS_KEY = "launcher:servers"
+
+
+def servers_payload() -> dict:
+    def build():
+        rows = Server.objects.order_by("name").values_list(
+            "id",
+            "name",
+            "modpack__mc_version",
+            "modpack__loader",
+            "is_running",
+            "online_player",
+        )
+        return build_payload(
+            compact_json(
+                [
+                    {
+                        "id": pk,
+                        "name": name,
+                        "mc_version": mc_version,
+                        "loader": loader,
+                        "is_running": is_running,
+                        "online_player": online_player,
+                    }
+                    for pk, name, mc_version, loader, is_running, online_player in rows
+                ]
+            )
+        )
+
+    # the TTL bounds staleness when another process changed status and the
+    # cache is not shared (locmem)
+    return cached_payload(SERVERS_KEY, build, timeout=settings.LAUNCHER_SERVERS_TTL)
+
+
+def invalidate_servers():
+    cache.delete(SERVERS_KEY)
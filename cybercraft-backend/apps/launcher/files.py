@@ -0,0 +1,155 @@
+import os
+import secrets
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+
+STREAM_BLOCK = 256 * 1024
+
+
+class RangeFile:
+    """
+    Read-only view of ``length`` bytes of a file starting at ``start``.
+
+    Exposes ``fileno``/``tell`` so WSGI servers can still use sendfile for it.
+    """
+
+    def __init__(self, fh, start: int, length: int):
+        self.fh = fh
+        self.remaining = length
+        fh.seek(start)
+
+    def read(self, size: int = -1) -> bytes:
+        if self.remaining <= 0:
+            return b""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.fh.fileno()
+
+    def tell(self):
+        return self.fh.tell()
+
+    def close(self):
+        self.fh.close()
+
+
+def file_etag(st: os.stat_result) -> str:
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def parse_ranges(header: str, size: int):
+    """
+    Parse a ``Range: bytes=...`` header into (start, end) pairs, inclusive.
+
+    Returns None for a malformed header (serve the whole file) and an empty
+    list when no range is satisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or not spec:
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        first, sep, last = part.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else size - 1
+            else:
+                length = int(last)
+                if length == 0:
+                    continue
+                start, end = max(size - length, 0), size - 1
+        except ValueError:
+            return None
+
+        if start > end and last:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+    return ranges
+
+
+def sendfile_response(path: Path, content_type: str):
+    backend = settings.SENDFILE_BACKEND
+    if backend in ("apache", "lighttpd"):
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = str(path)
+        return response
+
+    if backend == "nginx" and settings.SENDFILE_ROOT:
+        try:
+            rel = path.resolve().relative_to(Path(settings.SENDFILE_ROOT).resolve())
+        except ValueError:
+            return None
+        response = HttpResponse(content_type=content_type)
+        prefix = settings.SENDFILE_URL.rstrip("/")
+        response["X-Accel-Redirect"] = f"{prefix}/{rel.as_posix()}"
+        return response
+
+    return None
+
+
+def _multipart(path: Path, ranges, size: int, content_type: str, boundary: str):
+    with open(path, "rb") as fh:
+        for start, end in ranges:
+            yield (
+                f"\r\n--{boundary}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+            ).encode("ascii")
+
+            part = RangeFile(fh, start, end - start + 1)
+            for block in iter(lambda: part.read(STREAM_BLOCK), b""):
+                yield block
+        yield f"\r\n--{boundary}--\r\n".encode("ascii")
+
+
+def serve_file(request, path: Path, content_type="application/octet-stream"):
+    response = sendfile_response(path, content_type)
+    if response is not None:
+        return response
+
+    st = path.stat()
+    size = st.st_size
+    etag = file_etag(st)
+
+    ranges = None
+    header = request.headers.get("Range")
+    if header and request.headers.get("If-Range", etag) == etag:
+        ranges = parse_ranges(header, size)
+
+    if ranges == []:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+    elif not ranges:
+        response = FileResponse(open(path, "rb"), content_type=content_type)
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        length = end - start + 1
+        response = FileResponse(
+            RangeFile(open(path, "rb"), start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Length"] = length
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    else:
+        boundary = secrets.token_hex(16)
+        response = StreamingHttpResponse(
+            _multipart(path, ranges, size, content_type, boundary),
+            status=206,
+            content_type=f"multipart/byteranges; boundary={boundary}",
+        )
+
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    return response
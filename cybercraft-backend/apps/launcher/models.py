@@ -6,6 +6,7 @@ class LauncherBuild(models.Model):
     build_number = models.PositiveIntegerField(unique=True)
     asar_file = models.FileField(upload_to="launcher/")
     sha256 = models.CharField(max_length=64, blank=True)
+    chunks = models.JSONField(default=list, blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
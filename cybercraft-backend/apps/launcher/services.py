@@ -6,3 +6,36 @@ def sha256_file(file):
     for chunk in file.chunks():
         h.update(chunk)
     return h.hexdigest()
+
+
+def read_block(file, size: int) -> bytes:
+    """Read exactly ``size`` bytes unless the file ends first."""
+    parts = []
+    remaining = size
+    while remaining:
+        data = file.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b"".join(parts)
+
+
+def hash_file(file, chunk_size: int):
+    """
+    Return the sha256 of ``file`` and of each ``chunk_size`` block.
+
+    Reads fixed-size blocks itself: ``File.chunks()`` hands back in-memory
+    uploads in one piece whatever ``chunk_size`` is.
+    """
+    h = hashlib.sha256()
+    chunks = []
+    file.seek(0)
+    while True:
+        block = read_block(file, chunk_size)
+        if not block:
+            break
+        h.update(block)
+        chunks.append(hashlib.sha256(block).hexdigest())
+    file.seek(0)
+    return h.hexdigest(), chunks
@@ -0,0 +1,32 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.modpacks.models import ModPack
+from apps.modpacks.signals import manifest_generated
+from apps.server.models import Server
+from apps.server.signals import server_status_changed
+
+from .cache import invalidate_manifest, invalidate_servers, server_modpack_key
+
+
+@receiver([post_save, post_delete], sender=ModPack)
+def modpack_changed(sender, instance, **kwargs):
+    invalidate_manifest(instance)
+    invalidate_servers()
+
+
+@receiver(manifest_generated)
+def manifest_regenerated(sender, modpack, **kwargs):
+    invalidate_manifest(modpack)
+
+
+@receiver([post_save, post_delete], sender=Server)
+def server_changed(sender, instance, **kwargs):
+    cache.delete(server_modpack_key(instance.id))
+    invalidate_servers()
+
+
+@receiver(server_status_changed)
+def server_status_updated(sender, server_ids, **kwargs):
+    invalidate_servers()
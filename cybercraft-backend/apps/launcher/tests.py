@@ -1,3 +1,169 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from apps.modpacks.models import ModPack
+from apps.modpacks.services import write_manifest
+from apps.server.models import Server
+from apps.server.signals import server_status_changed
+
+from .cache import accepts
+from .services import hash_file
+
+
+class HashFileTests(SimpleTestCase):
+    def test_blocks_of_in_memory_upload(self):
+        data = os.urandom(2 * 1024 * 1024 + 123)
+        upload = SimpleUploadedFile("app.asar", data)
+
+        digest, chunks = hash_file(upload, 1024 * 1024)
+
+        self.assertEqual(digest, hashlib.sha256(data).hexdigest())
+        self.assertEqual(
+            chunks,
+            [
+                hashlib.sha256(data[i:i + 1024 * 1024]).hexdigest()
+                for i in range(0, len(data), 1024 * 1024)
+            ],
+        )
+        self.assertEqual(upload.read(), data)
+
+
+class AcceptEncodingTests(SimpleTestCase):
+    def test_q_values(self):
+        self.assertTrue(accepts("gzip, deflate, br", "br"))
+        self.assertTrue(accepts("br;q=0.5, gzip", "br"))
+        self.assertFalse(accepts("br;q=0, gzip", "br"))
+        self.assertFalse(accepts("gzip; q=0.0", "gzip"))
+        self.assertTrue(accepts("*", "gzip"))
+        self.assertFalse(accepts("*;q=0, identity", "gzip"))
+        self.assertFalse(accepts("", "gzip"))
+        self.assertFalse(accepts("gzipped", "gzip"))
+
+
+class ServerManifestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.modpack_dir = Path(tmp.name)
+        self.write_manifest(1, ["mods/a.jar"])
+
+        self.modpack = modpack = ModPack.objects.create(
+            name="pack", mc_version="1.20.1", loader="forge", path=str(self.modpack_dir)
+        )
+        self.server = Server.objects.create(
+            name="s", version="1.20.1", port=31000, path="/tmp/s", modpack=modpack
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(username="player", password="x")
+        )
+        self.url = f"/api/servers/{self.server.id}/manifest/"
+
+    def write_manifest(self, version, paths):
+        path = self.modpack_dir / "manifest.json"
+        path.write_text(
+            json.dumps({"version": version, "files": [{"path": p} for p in paths]})
+        )
+        # another process regenerating it: no signal reaches this one
+        stamp = version * 10**9
+        os.utime(path, ns=(stamp, stamp))
+
+    def test_manifest_regenerated_elsewhere_is_served(self):
+        first = self.client.get(self.url)
+        self.assertEqual(json.loads(first.content)["version"], 1)
+
+        self.write_manifest(2, ["mods/a.jar", "mods/b.jar"])
+        second = self.client.get(self.url)
+        self.assertEqual(json.loads(second.content)["version"], 2)
+        self.assertNotEqual(first["ETag"], second["ETag"])
+
+    def test_refused_encoding_is_not_used(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="br;q=0, gzip;q=0")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(json.loads(response.content)["version"], 1)
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_matching_etag_is_not_modified(self):
+        first = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(first.status_code, 200)
+
+        for header in (first["ETag"], f'W/{first["ETag"]}', '"other", ' + first["ETag"]):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=header
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b"")
+                self.assertEqual(response["ETag"], first["ETag"])
+
+        stale = self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(stale.status_code, 200)
+
+    def test_delta_since_version_honours_etag(self):
+        for n, files in enumerate(([{"path": "mods/a.jar"}], [{"path": "mods/b.jar"}])):
+            write_manifest(self.modpack, {"files": files})
+            stamp = (n + 2) * 10**9
+            os.utime(self.modpack_dir / "manifest.json", ns=(stamp, stamp))
+
+        delta = self.client.get(f"{self.url}?since=1")
+        self.assertEqual(
+            json.loads(delta.content),
+            {"version": 2, "added": [{"path": "mods/b.jar"}], "changed": [],
+             "removed": ["mods/a.jar"]},
+        )
+
+        response = self.client.get(
+            f"{self.url}?since=1", HTTP_IF_NONE_MATCH=delta["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class LauncherServersTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        modpack = ModPack.objects.create(
+            name="pack", mc_version="1.20.1", loader="forge", path="/tmp/pack"
+        )
+        self.server = Server.objects.create(
+            name="s", version="1.20.1", port=31000, path="/tmp/s", modpack=modpack
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(username="player", password="x")
+        )
+
+    def servers(self):
+        response = self.client.get("/api/launcher/servers/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        return json.loads(gzip.decompress(response.content))
+
+    def test_snapshot_is_rebuilt_on_status_change(self):
+        self.assertEqual(
+            self.servers(),
+            [{"id": self.server.id, "name": "s", "mc_version": "1.20.1",
+              "loader": "forge", "is_running": False, "online_player": 0}],
+        )
+
+        # a bulk update sends no post_save: the snapshot stays
+        Server.objects.filter(id=self.server.id).update(is_running=True)
+        self.assertFalse(self.servers()[0]["is_running"])
+
+        server_status_changed.send(sender=Server, server_ids=[self.server.id])
+        self.assertTrue(self.servers()[0]["is_running"])
+
+        self.server.name = "renamed"
+        self.server.save()
+        self.assertEqual(self.servers()[0]["name"], "renamed")
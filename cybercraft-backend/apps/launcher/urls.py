@@ -1,8 +1,20 @@
 from django.urls import path
-from .views import launcher_manifest, LauncherServers, ServerManifest
+from .views import (
+    launcher_asar,
+    launcher_manifest,
+    LauncherServers,
+    ModPackFile,
+    ServerManifest,
+)
 
 urlpatterns = [
     path("launcher/manifest.json", launcher_manifest),
+    path("launcher/launcher.asar", launcher_asar, name="launcher-asar"),
     path("launcher/servers/", LauncherServers.as_view(), name="launcher-servers"),
     path("servers/<int:pk>/manifest/", ServerManifest.as_view(), name="server-manifest"),
+    path(
+        "modpacks/<int:pk>/files/<path:path>",
+        ModPackFile.as_view(),
+        name="modpack-file",
+    ),
 ]
@@ -1,11 +1,24 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from apps.server.models import Server
-from apps.modpacks.services import generate_manifest
-import json
+from apps.modpacks.models import ModPack
+from apps.modpacks.services import ALLOWED_DIRS
 from pathlib import Path
+from django.conf import settings
+from django.core.cache import cache
 from django.http import JsonResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from .cache import (
+    delta_payload,
+    manifest_key,
+    manifest_payload,
+    manifest_stamp,
+    payload_response,
+    server_modpack,
+    servers_payload,
+)
+from .files import serve_file
 from .models import LauncherBuild
 
 
@@ -19,40 +32,74 @@ def launcher_manifest(request):
             "version": build.version,
             "buildNumber": build.build_number,
             "asar": {
-                "url": request.build_absolute_uri(build.asar_file.url),
+                "url": request.build_absolute_uri(reverse("launcher-asar")),
                 "sha256": build.sha256,
+                "chunkSize": settings.DOWNLOAD_CHUNK_SIZE,
+                "chunks": build.chunks,
             },
         }
     )
 
 
+def launcher_asar(request):
+    build = LauncherBuild.objects.filter(is_active=True).first()
+    if not build or not build.asar_file:
+        raise Http404("Launcher build not found")
+
+    return serve_file(request, Path(build.asar_file.path))
+
+
 class LauncherServers(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        servers = Server.objects.all()
-        return Response(
-            [
-                {
-                    "id": s.id,
-                    "name": s.name,
-                    "mc_version": s.modpack.mc_version,
-                    "loader": s.modpack.loader,
-                }
-                for s in servers
-            ]
-        )
+        return payload_response(request, servers_payload())
 
 
 class ServerManifest(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk):
-        server = Server.objects.get(pk=pk)
-        base = Path(server.modpack.path)
-        manifest_path = base / "manifest.json"
+        row = server_modpack(pk)
+        if row is None:
+            raise Http404("Server not found")
+        modpack_id, modpack_path = row
+
+        modpack = None
+        payload = cache.get(manifest_key(modpack_id, manifest_stamp(modpack_path)))
+        if payload is None:
+            modpack = get_object_or_404(ModPack, pk=modpack_id)
+            payload = manifest_payload(modpack)
+
+        since = request.query_params.get("since")
+        current = payload.get("version")
+        if since and since.isdigit() and current is not None:
+            if int(since) == current:
+                return Response(
+                    {"version": current, "added": [], "changed": [], "removed": []}
+                )
+
+            modpack = modpack or get_object_or_404(ModPack, pk=modpack_id)
+            delta = delta_payload(modpack, int(since), current)
+            if delta is not None:
+                return payload_response(request, delta)
+
+        return payload_response(request, payload)
+
+
+class ModPackFile(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, path):
+        modpack = get_object_or_404(ModPack, pk=pk)
+        base = Path(modpack.path).resolve()
+        target = (base / path).resolve()
 
-        if not manifest_path.exists():
-            generate_manifest(server.modpack)
+        if target == base or not target.is_relative_to(base):
+            raise Http404("File not found")
+        if target.relative_to(base).parts[0] not in ALLOWED_DIRS:
+            raise Http404("File not found")
+        if not target.is_file():
+            raise Http404("File not found")
 
-        return Response(json.loads(manifest_path.read_text()))
+        return serve_file(request, target)
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.modpacks.models import ModPack
+from apps.modpacks.services import build_manifest, write_manifest
+
+
+class Command(BaseCommand):
+    help = "Generate manifest.json for modpacks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "modpacks",
+            nargs="*",
+            help="Modpack names or ids (default: all)",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only rehash files whose size, mtime or inode changed",
+        )
+
+    def handle(self, *args, **options):
+        modpacks = ModPack.objects.all()
+        if options["modpacks"]:
+            ids = [m for m in options["modpacks"] if m.isdigit()]
+            names = [m for m in options["modpacks"] if not m.isdigit()]
+            modpacks = modpacks.filter(id__in=ids) | modpacks.filter(name__in=names)
+            if not modpacks.exists():
+                raise CommandError("No matching modpacks")
+
+        for modpack in modpacks:
+            started = time.monotonic()
+            manifest, stats = build_manifest(
+                modpack, incremental=options["incremental"]
+            )
+            write_manifest(modpack, manifest)
+
+            self.stdout.write(
+                f"{modpack.name}: scanned={stats['scanned']} "
+                f"hashed={stats['hashed']} bytes_read={stats['bytes_read']} "
+                f"({time.monotonic() - started:.2f}s)"
+            )
+
+        self.stdout.write(self.style.SUCCESS("Manifests generated"))
@@ -15,3 +15,26 @@ class ModPack(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class ManifestVersion(models.Model):
+    modpack = models.ForeignKey(
+        ModPack, on_delete=models.CASCADE, related_name="manifest_versions"
+    )
+    number = models.PositiveIntegerField()
+    is_full = models.BooleanField(default=False)
+    added = models.JSONField(default=list)
+    changed = models.JSONField(default=list)
+    removed = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.modpack.name} v{self.number}"
+
+    class Meta:
+        ordering = ["modpack", "number"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["modpack", "number"], name="unique_modpack_manifest_version"
+            )
+        ]
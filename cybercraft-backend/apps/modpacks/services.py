@@ -1,22 +1,75 @@
 import hashlib
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+
+from .models import ManifestVersion
+from .signals import manifest_generated
 
 ALLOWED_DIRS = ["mods", "resourcepacks", "shaderpacks"]
 
+HASH_INDEX_NAME = ".hashindex.json"
+READ_SIZE = 1024 * 1024
 
-def sha1(path: Path):
+
+def hash_file(path: Path, chunk_size: int = None):
+    """Return the file's sha1 and the sha1 of each ``chunk_size`` block."""
+    chunk_size = chunk_size or settings.DOWNLOAD_CHUNK_SIZE
     h = hashlib.sha1()
-    with path.open("rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
-    return h.hexdigest()
+    chunks = []
+    chunk = hashlib.sha1()
+    chunk_fill = 0
 
+    buf = bytearray(READ_SIZE)
+    view = memoryview(buf)
+    with path.open("rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
 
-def generate_manifest(modpack):
-    base = Path(modpack.path)
-    files = []
+            pos = 0
+            while pos < n:
+                take = min(n - pos, chunk_size - chunk_fill)
+                chunk.update(view[pos:pos + take])
+                chunk_fill += take
+                pos += take
+                if chunk_fill == chunk_size:
+                    chunks.append(chunk.hexdigest())
+                    chunk = hashlib.sha1()
+                    chunk_fill = 0
+
+    if chunk_fill:
+        chunks.append(chunk.hexdigest())
+    return h.hexdigest(), chunks
+
+
+def sha1(path: Path):
+    return hash_file(path)[0]
+
+
+def load_hash_index(base: Path) -> dict:
+    try:
+        data = json.loads((base / HASH_INDEX_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data.get("files", {})
 
+
+def save_hash_index(base: Path, files: dict):
+    path = base / HASH_INDEX_NAME
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"files": files}), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def scan_files(base: Path):
     for folder in ALLOWED_DIRS:
         d = base / folder
         if not d.exists():
@@ -24,23 +77,162 @@ def generate_manifest(modpack):
 
         for f in d.rglob("*"):
             if f.is_file():
-                files.append(
-                    {
-                        "path": str(f.relative_to(base)).replace("\\", "/"),
-                        "sha1": sha1(f),
-                        "size": f.stat().st_size,
-                    }
-                )
+                yield str(f.relative_to(base)).replace("\\", "/"), f
+
+
+def manifest_entry(rel: str, entry: list) -> dict:
+    size, _, _, _, digest, chunks = entry
+    data = {"path": rel, "sha1": digest, "size": size}
+    if len(chunks) > 1:
+        data["chunks"] = chunks
+    return data
+
+
+def build_manifest(modpack, incremental: bool = True):
+    base = Path(modpack.path)
+    index = load_hash_index(base) if incremental else {}
+    chunk_size = settings.DOWNLOAD_CHUNK_SIZE
+
+    entries = {}
+    to_hash = []
+    for rel, f in scan_files(base):
+        st = f.stat()
+        # block hashes are only reusable for the same chunk size
+        key = [st.st_size, st.st_mtime_ns, st.st_ino, chunk_size]
+        cached = index.get(rel)
+        if cached and len(cached) == 6 and cached[:4] == key:
+            entries[rel] = cached
+        else:
+            entries[rel] = key + [None, None]
+            to_hash.append((rel, f))
+
+    workers = max(1, settings.MODPACK_HASH_WORKERS)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hash_blocks = partial(hash_file, chunk_size=chunk_size)
+        results = pool.map(hash_blocks, [f for _, f in to_hash])
+        for (rel, _), (digest, chunks) in zip(to_hash, results):
+            entries[rel][4:] = [digest, chunks]
+
+    save_hash_index(base, entries)
 
     manifest = {
         "name": modpack.name,
         "minecraft": modpack.mc_version,
         "loader": modpack.loader,
-        "files": files,
+        "chunk_size": chunk_size,
+        "files": [manifest_entry(rel, e) for rel, e in sorted(entries.items())],
     }
 
-    (base / "manifest.json").write_text(
-        json.dumps(manifest, indent=2), encoding="utf-8"
+    stats = {
+        "scanned": len(entries),
+        "hashed": len(to_hash),
+        "bytes_read": sum(entries[rel][0] for rel, _ in to_hash),
+    }
+
+    return manifest, stats
+
+
+def read_manifest(modpack) -> Optional[dict]:
+    try:
+        return json.loads(
+            (Path(modpack.path) / "manifest.json").read_text(encoding="utf-8")
+        )
+    except (OSError, ValueError):
+        return None
+
+
+def diff_files(old: list, new: list):
+    old_by_path = {f["path"]: f for f in old}
+    new_by_path = {f["path"]: f for f in new}
+
+    added = [f for p, f in new_by_path.items() if p not in old_by_path]
+    changed = [
+        f
+        for p, f in new_by_path.items()
+        if p in old_by_path and old_by_path[p] != f
+    ]
+    removed = sorted(p for p in old_by_path if p not in new_by_path)
+    return added, changed, removed
+
+
+def record_manifest_version(modpack, manifest: dict) -> int:
+    latest = modpack.manifest_versions.order_by("-number").first()
+    previous = read_manifest(modpack)
+
+    if latest is None or not previous or previous.get("version") != latest.number:
+        added, changed, removed = manifest["files"], [], []
+        is_full = True
+    else:
+        added, changed, removed = diff_files(previous["files"], manifest["files"])
+        if not (added or changed or removed):
+            return latest.number
+        is_full = False
+
+    version = ManifestVersion.objects.create(
+        modpack=modpack,
+        number=latest.number + 1 if latest else 1,
+        is_full=is_full,
+        added=added,
+        changed=changed,
+        removed=removed,
     )
+    return version.number
+
+
+def manifest_delta(modpack, since: int) -> Optional[dict]:
+    """
+    Net changes between version ``since`` and the latest version, or None
+    when the client has to fetch the full manifest instead.
+    """
+    versions = list(
+        modpack.manifest_versions.filter(number__gt=since).order_by("number")
+    )
+    if not versions:
+        current = modpack.manifest_versions.order_by("-number").first()
+        if current is None or current.number != since:
+            return None
+        return {"version": since, "added": [], "changed": [], "removed": []}
+
+    if versions[0].number != since + 1 or any(v.is_full for v in versions):
+        return None
+
+    existed = {}
+    state = {}
+    for v in versions:
+        for entry in v.added:
+            existed.setdefault(entry["path"], False)
+            state[entry["path"]] = entry
+        for entry in v.changed:
+            existed.setdefault(entry["path"], True)
+            state[entry["path"]] = entry
+        for path in v.removed:
+            existed.setdefault(path, True)
+            state[path] = None
+
+    delta = {"version": versions[-1].number, "added": [], "changed": [], "removed": []}
+    for path, entry in sorted(state.items()):
+        if entry is None:
+            if existed[path]:
+                delta["removed"].append(path)
+        elif existed[path]:
+            delta["changed"].append(entry)
+        else:
+            delta["added"].append(entry)
+    return delta
+
+
+def write_manifest(modpack, manifest: dict):
+    manifest["version"] = record_manifest_version(modpack, manifest)
+
+    # replaced atomically: other processes read it while it is rewritten
+    path = Path(modpack.path) / "manifest.json"
+    tmp = path.with_name(f"manifest.json.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+    manifest_generated.send(sender=modpack.__class__, modpack=modpack, manifest=manifest)
+
 
+def generate_manifest(modpack, incremental: bool = True):
+    manifest, _ = build_manifest(modpack, incremental=incremental)
+    write_manifest(modpack, manifest)
     return manifest
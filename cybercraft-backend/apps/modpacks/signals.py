@@ -0,0 +1,4 @@
+from django.dispatch import Signal
+
+# Sent with ``modpack`` and ``manifest`` whenever manifest.json is rewritten.
+manifest_generated = Signal()
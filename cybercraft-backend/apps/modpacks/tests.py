@@ -1,3 +1,87 @@
+import os
+import tempfile
+from pathlib import Path
+
 from django.test import TestCase
 
-# Create your tests here.
+from .models import ModPack
+from .services import build_manifest, manifest_delta, write_manifest
+
+
+def entry(path, sha256):
+    return {"path": path, "sha256": sha256}
+
+
+class ManifestDeltaTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.modpack = ModPack.objects.create(
+            name="pack", mc_version="1.20.1", loader="forge", path=tmp.name
+        )
+        for files in (
+            [entry("mods/a.jar", "1"), entry("mods/b.jar", "1"), entry("mods/c.jar", "1")],
+            [entry("mods/a.jar", "2"), entry("mods/b.jar", "1"), entry("mods/d.jar", "1")],
+            [entry("mods/a.jar", "2"), entry("mods/b.jar", "2"), entry("mods/e.jar", "1")],
+        ):
+            write_manifest(self.modpack, {"files": files})
+
+    def test_net_changes_over_several_versions(self):
+        self.assertEqual(
+            manifest_delta(self.modpack, 1),
+            {
+                "version": 3,
+                "added": [entry("mods/e.jar", "1")],
+                "changed": [entry("mods/a.jar", "2"), entry("mods/b.jar", "2")],
+                "removed": ["mods/c.jar"],
+            },
+        )
+
+    def test_changes_since_previous_version(self):
+        self.assertEqual(
+            manifest_delta(self.modpack, 2),
+            {
+                "version": 3,
+                "added": [entry("mods/e.jar", "1")],
+                "changed": [entry("mods/b.jar", "2")],
+                "removed": ["mods/d.jar"],
+            },
+        )
+
+    def test_current_base_is_unchanged(self):
+        self.assertEqual(
+            manifest_delta(self.modpack, 3),
+            {"version": 3, "added": [], "changed": [], "removed": []},
+        )
+
+    def test_unknown_or_full_base_needs_full_manifest(self):
+        self.assertIsNone(manifest_delta(self.modpack, 0))
+        self.assertIsNone(manifest_delta(self.modpack, 7))
+
+    def test_unchanged_files_record_no_version(self):
+        files = [entry("mods/a.jar", "2"), entry("mods/b.jar", "2"), entry("mods/e.jar", "1")]
+        write_manifest(self.modpack, {"files": files})
+        self.assertEqual(self.modpack.manifest_versions.count(), 3)
+
+
+class BuildManifestTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        (Path(tmp.name) / "mods").mkdir()
+        (Path(tmp.name) / "mods" / "a.jar").write_bytes(os.urandom(3000))
+        self.modpack = ModPack.objects.create(
+            name="pack", mc_version="1.20.1", loader="forge", path=tmp.name
+        )
+
+    def build(self, chunk_size):
+        with self.settings(DOWNLOAD_CHUNK_SIZE=chunk_size):
+            manifest, stats = build_manifest(self.modpack)
+        [entry] = manifest["files"]
+        return manifest["chunk_size"], len(entry["chunks"]), stats["hashed"]
+
+    def test_index_is_reused_only_for_the_same_chunk_size(self):
+        self.assertEqual(self.build(1024), (1024, 3, 1))
+        self.assertEqual(self.build(1024), (1024, 3, 0))
+        self.assertEqual(self.build(2048), (2048, 2, 1))
+        self.assertEqual(self.build(2048), (2048, 2, 0))
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from .models import Server
+from .rcon import RconError, run_command
+
+logger = logging.getLogger(__name__)
+
+
+def _users(**filters):
+    User = get_user_model()
+    return (
+        User.objects.filter(uuid__isnull=False, **filters)
+        .order_by("id")
+        .values_list("uuid", "username")
+        .iterator(chunk_size=2000)
+    )
+
+
+def whitelist_document() -> bytes:
+    entries = [{"uuid": str(uuid), "name": name} for uuid, name in _users()]
+    return json.dumps(entries, indent=2).encode("utf-8")
+
+
+def ops_document() -> bytes:
+    entries = [
+        {
+            "uuid": str(uuid),
+            "name": name,
+            "level": 4,
+            "bypassesPlayerLimit": True,
+        }
+        for uuid, name in _users(is_staff=True)
+    ]
+    return json.dumps(entries, indent=2).encode("utf-8")
+
+
+def write_if_changed(path: Path, data: bytes) -> bool:
+    """Atomically replace ``path`` with ``data`` unless it already holds it."""
+    try:
+        # the server itself may have rewritten the file, so compare
+        # against what is on disk rather than what we wrote last
+        current = hashlib.sha256(path.read_bytes()).digest()
+        if current == hashlib.sha256(data).digest():
+            return False
+    except OSError:
+        pass
+
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return True
+
+
+def sync_access(server_ids=None) -> dict:
+    """
+    Write whitelist.json and ops.json to every server (or ``server_ids``).
+
+    Both documents are built once; servers whose whitelist changed and are
+    running get ``whitelist reload`` on their console, or over RCON when
+    this panel did not start them. Returns counts for logging.
+    """
+    from .supervisor import SupervisorError, send_input
+
+    whitelist = whitelist_document()
+    ops = ops_document()
+
+    servers = Server.objects.values_list("id", "path", "is_running")
+    if server_ids is not None:
+        servers = servers.filter(id__in=server_ids)
+
+    stats = {"servers": 0, "whitelist": 0, "ops": 0, "reloaded": 0}
+    for server_id, path, is_running in servers.iterator():
+        server_dir = Path(path)
+        if not server_dir.is_dir():
+            continue
+        stats["servers"] += 1
+
+        try:
+            whitelist_changed = write_if_changed(server_dir / "whitelist.json", whitelist)
+            ops_changed = write_if_changed(server_dir / "ops.json", ops)
+        except OSError:
+            logger.exception("Could not sync access lists of server %s", server_id)
+            continue
+
+        stats["whitelist"] += whitelist_changed
+        stats["ops"] += ops_changed
+
+        if whitelist_changed and is_running:
+            try:
+                send_input(server_id, "whitelist reload")
+            except SupervisorError:
+                # not our process (e.g. started before a panel restart)
+                try:
+                    run_command(server_id, "whitelist reload")
+                except (RconError, TimeoutError) as e:
+                    # the file is read again on the next start
+                    logger.warning(
+                        "Could not reload the whitelist of server %s: %s",
+                        server_id,
+                        e,
+                    )
+                    continue
+            stats["reloaded"] += 1
+
+    return stats
+
+
+class AccessSync:
+    """Coalesces bursts of user changes into one sync_access pass."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def schedule(self):
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.delay, self._run)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run(self):
+        with self._lock:
+            self._timer = None
+
+        try:
+            stats = sync_access()
+            logger.info("Access lists synced: %s", stats)
+        except Exception:
+            logger.exception("Access list sync failed")
+        finally:
+            connection.close()
+
+
+access_sync = AccessSync(settings.ACCESS_SYNC_DELAY)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Server, ServerImage
+from .models import Job, PortAllocation, Server, ServerImage, ServerStop, WorldSnapshot
 
 
 @admin.register(Server)
@@ -9,4 +9,29 @@ class MinecraftServerAdmin(admin.ModelAdmin):
     search_fields = ("name", "uuid")
 
 
+@admin.register(PortAllocation)
+class PortAllocationAdmin(admin.ModelAdmin):
+    list_display = ("host", "port", "server")
+    list_filter = ("host",)
+    search_fields = ("port", "server__name")
+
+
+@admin.register(ServerStop)
+class ServerStopAdmin(admin.ModelAdmin):
+    list_display = ("server", "outcome", "duration", "exit_code", "created_at")
+    list_filter = ("outcome",)
+
+
+@admin.register(WorldSnapshot)
+class WorldSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("server", "name", "archived", "size", "save_off_seconds", "created_at")
+    list_filter = ("archived",)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "server", "host", "status", "attempts", "created_at")
+    list_filter = ("status", "kind", "host")
+
+
 admin.site.register(ServerImage)
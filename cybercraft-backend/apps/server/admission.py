@@ -0,0 +1,170 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+import psutil
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Server
+
+MB = 1024 * 1024
+
+
+class Overcommit(Exception):
+    def __init__(self, reason: str, headroom: dict):
+        super().__init__(reason)
+        self.headroom = headroom
+
+
+def read_meminfo() -> dict:
+    """MemTotal and MemAvailable in MB, from /proc or psutil."""
+    try:
+        values = {}
+        with open("/proc/meminfo", encoding="ascii") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("MemTotal", "MemAvailable"):
+                    values[key] = int(rest.split()[0]) // 1024
+        return {"total": values["MemTotal"], "available": values["MemAvailable"]}
+    except (OSError, KeyError, ValueError):
+        vm = psutil.virtual_memory()
+        return {"total": vm.total // MB, "available": vm.available // MB}
+
+
+def read_load() -> dict:
+    """1-minute load average and CPU count, from /proc or psutil."""
+    try:
+        with open("/proc/loadavg", encoding="ascii") as f:
+            load1 = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        load1 = psutil.getloadavg()[0]
+    return {"load1": load1, "cpus": os.cpu_count() or 1}
+
+
+def footprint(ram_mb: int) -> int:
+    """Memory a server with ``ram_mb`` of heap is expected to take."""
+    return ram_mb + settings.ADMISSION_JVM_OVERHEAD_MB
+
+
+def _running(host: str):
+    servers = Server.objects.filter(is_running=True)
+    if host == settings.SERVER_HOST:
+        # servers from before the port pool have no allocation row
+        return servers.filter(
+            Q(port_allocation__host=host) | Q(port_allocation__isnull=True)
+        )
+    return servers.filter(port_allocation__host=host)
+
+
+def _resident_mb(pid: Optional[int]) -> int:
+    if not pid:
+        return 0
+    try:
+        return psutil.Process(pid).memory_info().rss // MB
+    except (psutil.Error, OSError):
+        return 0
+
+
+class AdmissionController:
+    """
+    Decides whether this host can take another JVM.
+
+    A start is admitted when the committed footprint (heap plus
+    ADMISSION_JVM_OVERHEAD_MB) of all running servers and the new one fits
+    in physical memory minus ADMISSION_RESERVED_MB, and when what the
+    kernel reports as available still covers the new server plus the heap
+    the running ones have reserved but not touched yet. Starts are also
+    refused while the load per CPU is above ADMISSION_MAX_LOAD.
+
+    Starts admitted in this process count as committed until the server
+    shows up as running.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._starting = {}
+
+    def headroom(self, host: str = None) -> dict:
+        host = host or settings.SERVER_HOST
+        running = list(_running(host).values_list("id", "ram", "pid"))
+        running_ids = {server_id for server_id, _, _ in running}
+        starting = {
+            server_id: mb
+            for server_id, mb in dict(self._starting).items()
+            if server_id not in running_ids
+        }
+        committed = sum(footprint(ram) for _, ram, _ in running) + sum(
+            starting.values()
+        )
+        report = {
+            "host": host,
+            "running": len(running),
+            "starting": len(starting),
+            "committed_mb": committed,
+        }
+        if host != settings.SERVER_HOST:
+            # only the local host's memory and load can be read here
+            return report
+
+        memory = read_meminfo()
+        load = read_load()
+        reserved = settings.ADMISSION_RESERVED_MB
+        untouched = sum(
+            max(0, footprint(ram) - _resident_mb(pid)) for _, ram, pid in running
+        ) + sum(starting.values())
+
+        report.update(
+            memory_total_mb=memory["total"],
+            memory_available_mb=memory["available"],
+            reserved_mb=reserved,
+            headroom_mb=max(
+                0,
+                min(
+                    memory["total"] - reserved - committed,
+                    memory["available"] - reserved - untouched,
+                ),
+            ),
+            load1=load["load1"],
+            cpus=load["cpus"],
+            load_per_cpu=round(load["load1"] / load["cpus"], 2),
+        )
+        return report
+
+    def check(self, server: Server) -> dict:
+        """Raise Overcommit if ``server`` cannot start now; returns headroom."""
+        report = self.headroom()
+        need = footprint(server.ram)
+        if need > report["headroom_mb"]:
+            raise Overcommit(
+                f"Not enough memory: needs {need} MB, "
+                f"{report['headroom_mb']} MB free for servers",
+                report,
+            )
+        if report["load_per_cpu"] > settings.ADMISSION_MAX_LOAD:
+            raise Overcommit(
+                f"Host is busy: load {report['load1']:.1f} on {report['cpus']} CPUs",
+                report,
+            )
+        return report
+
+    def fits(self, ram_mb: int) -> bool:
+        """Whether a server of ``ram_mb`` could ever run on an idle host."""
+        total = read_meminfo()["total"]
+        return footprint(ram_mb) <= total - settings.ADMISSION_RESERVED_MB
+
+    @contextmanager
+    def admit(self, server: Server):
+        """Check and hold ``server``'s footprint while it is being started."""
+        with self._lock:
+            self.check(server)
+            self._starting[server.id] = footprint(server.ram)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._starting.pop(server.id, None)
+
+
+admission = AdmissionController()
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+
+class BackgroundLoop:
+    """An asyncio event loop running in a daemon thread, started on first use."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._loop = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(
+                        target=self._run, args=(loop,), name=self.name, daemon=True
+                    ).start()
+                    self._loop = loop
+        return self._loop
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        return self.submit(coro).result(timeout)
+
+    @staticmethod
+    def _run(loop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+
+background_loop = BackgroundLoop("server-loop")
@@ -8,8 +8,18 @@ router.register(r"", views.ServerViewSet, basename="server")
 
 
 urlpatterns = [
+    path("versions/", views.ServerVersionsAPIView.as_view(), name="server-versions"),
+    path("command/", views.ServerBatchCommandAPIView.as_view(), name="server-batch-command"),
+    path("stop-all/", views.ServerStopAllAPIView.as_view(), name="server-stop-all"),
+    path("import/", views.ServerImportAPIView.as_view(), name="server-import"),
+    path("jobs/", views.JobListAPIView.as_view(), name="server-jobs"),
+    path("headroom/", views.HostHeadroomAPIView.as_view(), name="server-headroom"),
     path("", include(router.urls)),
     path("create/", views.ServerCreateAPIView.as_view(), name="server-create"),
     path("<int:pk>/control/<str:action>/", views.ServerControlAPIView.as_view(), name="server-control"),
+    path("<int:pk>/command/", views.ServerCommandAPIView.as_view(), name="server-command"),
     path("<int:pk>/logs/", views.ServerLogsAPIView.as_view(), name="server-logs"),
+    path("<int:pk>/logs/segments/", views.ServerLogSegmentsAPIView.as_view(), name="server-log-segments"),
+    path("<int:pk>/snapshots/", views.ServerSnapshotAPIView.as_view(), name="server-snapshots"),
+    path("<int:pk>/export/", views.ServerExportAPIView.as_view(), name="server-export"),
 ]
@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ArcadiaManifestClient:
+    """
+    Arcadia jar manifest, cached in memory and on disk.
+
+    The document is revalidated with ETag / If-Modified-Since once ``ttl``
+    seconds have passed; if the upstream is unreachable the cached copy keeps
+    being served.
+    """
+
+    def __init__(self, url: str, cache_dir: Path, ttl: int = 600, timeout: int = 10):
+        self.url = url
+        self.cache_path = Path(cache_dir) / "arcadia_manifest.json"
+        self.ttl = ttl
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._document = None
+        self._index = {}
+        self._etag = None
+        self._last_modified = None
+        self._checked_at = 0.0
+
+    def manifest(self) -> dict:
+        self.refresh()
+        return self._document
+
+    def entry(self, server_type: str, version: str) -> dict:
+        self.refresh()
+
+        entry = self._index.get((server_type, version))
+        if entry is None:
+            if not any(t == server_type for t, _ in self._index):
+                raise ValueError("Invalid server type")
+            raise ValueError("Invalid version")
+        return entry
+
+    def find(self, server_type: str, version: str) -> str:
+        url = self.entry(server_type, version).get("url")
+        return url[0] if isinstance(url, list) else url
+
+    def catalog(self) -> dict:
+        self.refresh()
+
+        types = {}
+        for server_type, version in self._index:
+            types.setdefault(server_type, []).append(version)
+        return types
+
+    def refresh(self, force: bool = False):
+        if not force and self._fresh():
+            return
+
+        with self._lock:
+            if not force and self._fresh():
+                return
+
+            if self._document is None:
+                self._load_disk()
+
+            headers = {}
+            if self._document is not None:
+                if self._etag:
+                    headers["If-None-Match"] = self._etag
+                if self._last_modified:
+                    headers["If-Modified-Since"] = self._last_modified
+
+            try:
+                r = requests.get(self.url, headers=headers, timeout=self.timeout)
+                if r.status_code != 304:
+                    r.raise_for_status()
+                    document = r.json()
+            except (requests.RequestException, ValueError):
+                if self._document is None:
+                    raise
+                logger.warning("Arcadia manifest refresh failed, using cached copy")
+                self._checked_at = time.monotonic()
+                return
+
+            if r.status_code != 304:
+                self._etag = r.headers.get("ETag")
+                self._last_modified = r.headers.get("Last-Modified")
+                self._set_document(document)
+                self._save_disk()
+
+            self._checked_at = time.monotonic()
+
+    def _fresh(self) -> bool:
+        return (
+            self._document is not None
+            and time.monotonic() - self._checked_at < self.ttl
+        )
+
+    def _set_document(self, document: dict):
+        index = {}
+        types = document.get("mc_java_servers", {}).get("types", {})
+        for server_type, t in types.items():
+            for version, v in t.get("versions", {}).items():
+                index[(server_type, version)] = v
+
+        self._document = document
+        self._index = index
+
+    def _load_disk(self):
+        try:
+            cached = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if not isinstance(cached, dict) or not isinstance(cached.get("document"), dict):
+            logger.warning("Ignoring malformed Arcadia cache %s", self.cache_path)
+            return
+
+        self._etag = cached.get("etag")
+        self._last_modified = cached.get("last_modified")
+        self._set_document(cached["document"])
+
+    def _save_disk(self):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps(
+                {
+                    "etag": self._etag,
+                    "last_modified": self._last_modified,
+                    "document": self._document,
+                }
+            ),
+            encoding="utf-8",
+        )
+        os.replace(tmp, self.cache_path)
+
+
+arcadia = ArcadiaManifestClient(
+    settings.ARCADIA_MANIFEST_URL,
+    settings.CACHE_DIR,
+    ttl=settings.ARCADIA_MANIFEST_TTL,
+)
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Optional
+
+import requests
+from django.conf import settings
+
+from .fsutil import clone_file, file_lock
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for downloaded server jars.
+
+    Objects live under ``objects/<sha256[:2]>/<sha256>`` and ``urls/`` maps the
+    sha256 of a download URL to the digest of its content. Concurrent fetches
+    of one URL share a single download; partial downloads resume with Range.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def object_path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / digest
+
+    def lookup(self, url: str, sha256: Optional[str] = None) -> Optional[Path]:
+        try:
+            record = json.loads(self._url_path(url).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+        digest = record.get("sha256")
+        if not digest or (sha256 and digest != sha256.lower()):
+            return None
+
+        path = self.object_path(digest)
+        return path if path.exists() else None
+
+    def fetch(
+        self,
+        url: str,
+        sha256: Optional[str] = None,
+        on_progress: Optional[Callable[[str], None]] = None,
+    ) -> Path:
+        path = self.lookup(url, sha256)
+        if path is not None:
+            return path
+
+        with self._lock:
+            future = self._inflight.get(url)
+            owner = future is None
+            if owner:
+                future = self._inflight[url] = Future()
+
+        if not owner:
+            if on_progress:
+                on_progress("Waiting for download in progress")
+            return future.result()
+
+        try:
+            with file_lock(self._part_path(url).with_suffix(".lock")):
+                path = self.lookup(url, sha256) or self._download(
+                    url, sha256, on_progress
+                )
+            future.set_result(path)
+            return path
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(url, None)
+
+    def link_into(self, url: str, dest: Path, sha256: Optional[str] = None, **kwargs):
+        return clone_file(self.fetch(url, sha256, **kwargs), dest)
+
+    def _download(self, url, sha256, on_progress) -> Path:
+        part = self._part_path(url)
+        part.parent.mkdir(parents=True, exist_ok=True)
+
+        h = hashlib.sha256()
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        with requests.get(url, stream=True, headers=headers, timeout=(10, 60)) as r:
+            if r.status_code == 416 and offset:
+                mode = None
+            else:
+                r.raise_for_status()
+                mode = "ab" if r.status_code == 206 else "wb"
+
+            if mode == "wb":
+                offset = 0
+            elif offset:
+                if on_progress:
+                    on_progress(f"Resuming at {offset} bytes")
+                with open(part, "rb") as fh:
+                    for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+                        h.update(chunk)
+
+            if mode is not None:
+                with open(part, mode) as fh:
+                    for chunk in r.iter_content(CHUNK_SIZE):
+                        if chunk:
+                            fh.write(chunk)
+                            h.update(chunk)
+
+        digest = h.hexdigest()
+        if sha256 and digest != sha256.lower():
+            part.unlink()
+            raise ChecksumMismatch(f"Checksum mismatch for {url}")
+
+        path = self.object_path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            part.unlink()
+        else:
+            if os.name != "nt":
+                os.chmod(part, 0o444)
+            os.replace(part, path)
+
+        record = self._url_path(url)
+        record.parent.mkdir(parents=True, exist_ok=True)
+        tmp = record.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"url": url, "sha256": digest, "size": path.stat().st_size}),
+            encoding="utf-8",
+        )
+        os.replace(tmp, record)
+
+        return path
+
+    def _url_key(self, url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _url_path(self, url: str) -> Path:
+        return self.root / "urls" / f"{self._url_key(url)}.json"
+
+    def _part_path(self, url: str) -> Path:
+        return self.root / "tmp" / f"{self._url_key(url)}.part"
+
+
+artifact_store = ArtifactStore(settings.ARTIFACTS_DIR)
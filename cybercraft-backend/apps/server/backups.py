@@ -0,0 +1,412 @@
+import functools
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from itertools import repeat
+from pathlib import Path
+
+from .fsutil import file_lock
+
+# Content-defined chunking (gear hash). Boundaries depend only on content,
+# so an insert or rewrite inside a file only changes the chunks around it.
+MIN_CHUNK = 128 * 1024
+AVG_BITS = 17  # ~128 KiB past MIN_CHUNK on average
+MAX_CHUNK = 1024 * 1024
+READ_SIZE = 4 * MAX_CHUNK
+
+_GEAR = [random.Random(0x43594243 + i).getrandbits(31) for i in range(256)]
+_MASK = ((1 << AVG_BITS) - 1) << (31 - AVG_BITS)
+
+# caches under MINECRAFT_DIR that are rebuilt on demand: downloads,
+# shared jars (ARTIFACTS_DIR) and installer templates (INSTALL_TEMPLATES_DIR)
+EXCLUDE_DIRS = {".cache", ".artifacts", ".templates"}
+
+
+def cut_point(data, start: int, end: int) -> int:
+    """End offset of the chunk starting at ``start`` within ``data[:end]``."""
+    if end - start <= MIN_CHUNK:
+        return end
+
+    gear = _GEAR
+    mask = _MASK
+    h = 0
+    i = start + MIN_CHUNK
+    limit = min(end, start + MAX_CHUNK)
+    for byte in data[i:limit]:
+        h = ((h << 1) + gear[byte]) & 0x7FFFFFFF
+        i += 1
+        if not h & mask:
+            return i
+    return limit
+
+
+def iter_chunks(f):
+    """Yield content-defined chunks of a binary file object."""
+    buf = b""
+    eof = False
+    while True:
+        if not eof and len(buf) < MAX_CHUNK:
+            block = f.read(READ_SIZE)
+            eof = not block
+            buf += block
+        if not buf:
+            return
+
+        pos = 0
+        # only cut where a whole MAX_CHUNK window is available, unless at EOF
+        while pos < len(buf) and (eof or len(buf) - pos >= MAX_CHUNK):
+            end = cut_point(buf, pos, len(buf))
+            yield buf[pos:end]
+            pos = end
+        buf = buf[pos:]
+
+
+class ChunkStore:
+    """Chunks stored once under ``root/<2 hex>/<sha256>``."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def has(self, digest: str) -> bool:
+        return self.path(digest).exists()
+
+    def put(self, data: bytes) -> tuple:
+        """Store ``data``; returns (digest, bytes newly written)."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if path.exists():
+            return digest, 0
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        try:
+            # unlike a rename, fails when another worker stored it first
+            os.link(tmp, path)
+        except FileExistsError:
+            return digest, 0
+        finally:
+            tmp.unlink()
+        return digest, len(data)
+
+    def get(self, digest: str) -> bytes:
+        return self.path(digest).read_bytes()
+
+    def all(self):
+        if not self.root.exists():
+            return
+        for sub in self.root.iterdir():
+            if sub.is_dir():
+                for path in sub.iterdir():
+                    if not path.name.endswith(".tmp"):
+                        yield path.name, path
+
+
+def store_stream(store: ChunkStore, f) -> tuple:
+    """Chunk ``f`` into ``store``; returns (digests, bytes read, bytes new)."""
+    chunks = []
+    read = new = 0
+    for chunk in iter_chunks(f):
+        digest, written = store.put(chunk)
+        chunks.append(digest)
+        read += len(chunk)
+        new += written
+    return chunks, read, new
+
+
+def store_file(root: str, path: str):
+    """
+    store_stream for the file at ``path`` into the store at ``root``, or
+    None if the file is gone. Module level so pool processes can run it.
+    """
+    try:
+        with open(path, "rb") as f:
+            return store_stream(ChunkStore(root), f)
+    except FileNotFoundError:
+        return None
+
+
+def _exclusive(method):
+    """Run a BackupRepository method under the repository's file lock."""
+
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with file_lock(self.root / "repository.lock"):
+            return method(self, *args, **kwargs)
+
+    return locked
+
+
+class BackupRepository:
+    """
+    Deduplicated backups: a chunk store plus one gzipped JSON manifest per
+    snapshot listing every file's metadata and chunk digests.
+
+    A file whose size and mtime match the previous snapshot reuses its
+    chunk list without being read, so a backup costs time proportional to
+    what changed. Changed files are chunked on ``workers`` processes,
+    since the chunker is pure Python and holds the GIL.
+
+    create, restore, prune and verify hold an exclusive lock on the
+    repository, so a prune cannot delete chunks a running backup is about
+    to reference.
+    """
+
+    def __init__(self, root: Path, workers: int = 4):
+        self.root = Path(root)
+        self.store = ChunkStore(self.root / "chunks")
+        self.snapshots_dir = self.root / "snapshots"
+        self.workers = max(1, workers)
+
+    # snapshots
+
+    def snapshot_ids(self) -> list:
+        if not self.snapshots_dir.exists():
+            return []
+        return sorted(
+            p.name[: -len(".json.gz")] for p in self.snapshots_dir.glob("*.json.gz")
+        )
+
+    def load(self, snapshot_id: str) -> dict:
+        path = self.snapshots_dir / f"{snapshot_id}.json.gz"
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self, manifest: dict):
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+        path = self.snapshots_dir / f"{manifest['id']}.json.gz"
+        tmp = path.with_suffix(".tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(manifest, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def _new_id(self) -> str:
+        base = datetime.now().strftime("%Y%m%d-%H%M%S")
+        existing = set(self.snapshot_ids())
+        snapshot_id, n = base, 1
+        while snapshot_id in existing:
+            snapshot_id, n = f"{base}-{n}", n + 1
+        return snapshot_id
+
+    # create
+
+    @_exclusive
+    def create(self, sources: dict, db_path: Path = None) -> tuple:
+        """
+        Back up each ``name -> directory`` in ``sources`` and, if given, the
+        SQLite database at ``db_path`` (through the online backup API).
+        Returns (snapshot id, stats).
+        """
+        started = time.monotonic()
+        ids = self.snapshot_ids()
+        previous = self.load(ids[-1])["files"] if ids else {}
+
+        stats = {"files": 0, "unchanged": 0, "read_bytes": 0, "new_bytes": 0}
+        files = {}
+        to_store = []
+
+        for name, base in sources.items():
+            base = Path(base)
+            if not base.exists():
+                continue
+            for path in self._walk(base):
+                rel = f"{name}/{path.relative_to(base).as_posix()}"
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+
+                stats["files"] += 1
+                entry = {
+                    "size": st.st_size,
+                    "mtime_ns": st.st_mtime_ns,
+                    "mode": st.st_mode & 0o7777,
+                }
+                old = previous.get(rel)
+                if old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns:
+                    entry["chunks"] = old["chunks"]
+                    stats["unchanged"] += 1
+                else:
+                    to_store.append((rel, path))
+                files[rel] = entry
+
+        results = self._store_files([str(path) for _, path in to_store])
+        for (rel, _), result in zip(to_store, results):
+            if result is None:
+                files.pop(rel)
+                stats["files"] -= 1
+                continue
+            chunks, read, new = result
+            files[rel]["chunks"] = chunks
+            stats["read_bytes"] += read
+            stats["new_bytes"] += new
+
+        manifest = {
+            "id": self._new_id(),
+            "created_at": datetime.now().isoformat(),
+            "files": files,
+        }
+
+        if db_path is not None and Path(db_path).exists():
+            chunks, read, new = self._store_database(Path(db_path))
+            manifest["database"] = {"name": Path(db_path).name, "chunks": chunks}
+            stats["read_bytes"] += read
+            stats["new_bytes"] += new
+
+        stats["size"] = sum(f["size"] for f in files.values())
+        stats["seconds"] = round(time.monotonic() - started, 2)
+        manifest["stats"] = stats
+        self._save(manifest)
+        return manifest["id"], stats
+
+    @staticmethod
+    def _walk(base: Path):
+        for root, dirs, names in os.walk(base):
+            dirs[:] = [d for d in dirs if d not in EXCLUDE_DIRS]
+            for name in names:
+                if not name.endswith((".tmp", ".part")):
+                    yield Path(root) / name
+
+    def _store_files(self, paths: list) -> list:
+        root = str(self.store.root)
+        workers = min(self.workers, len(paths))
+        if workers <= 1:
+            return [store_file(root, path) for path in paths]
+
+        # backups.py does not use Django, so spawned workers start quickly
+        # and inherit none of the caller's threads or connections
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            chunksize = max(1, min(16, len(paths) // (workers * 8)))
+            return list(pool.map(store_file, repeat(root), paths, chunksize=chunksize))
+
+    def _store_database(self, db_path: Path) -> tuple:
+        fd, tmp = tempfile.mkstemp(suffix=".sqlite3", dir=self.root)
+        os.close(fd)
+        try:
+            src = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+            dst = sqlite3.connect(tmp)
+            try:
+                # copies a consistent snapshot while the panel keeps writing
+                src.backup(dst, pages=1024)
+            finally:
+                dst.close()
+                src.close()
+            with open(tmp, "rb") as f:
+                return store_stream(self.store, f)
+        finally:
+            os.unlink(tmp)
+
+    # restore
+
+    @_exclusive
+    def restore(self, snapshot_id: str, target: Path, include: str = None) -> dict:
+        """
+        Rebuild a snapshot's files (optionally only paths under ``include``)
+        and its database below ``target``.
+        """
+        manifest = self.load(snapshot_id)
+        target = Path(target)
+        restored = 0
+
+        for rel, entry in manifest["files"].items():
+            if include and not (rel == include or rel.startswith(include.rstrip("/") + "/")):
+                continue
+            dst = target / rel
+            self._write_chunks(dst, entry["chunks"])
+            os.chmod(dst, entry["mode"])
+            os.utime(dst, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+            restored += 1
+
+        database = manifest.get("database")
+        if database and not include:
+            self._write_chunks(target / database["name"], database["chunks"])
+
+        return {"files": restored, "database": bool(database and not include)}
+
+    def _write_chunks(self, dst: Path, chunks: list):
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_name(dst.name + ".restore")
+        with open(tmp, "wb") as f:
+            for digest in chunks:
+                f.write(self.store.get(digest))
+        os.replace(tmp, dst)
+
+    # prune / verify
+
+    @_exclusive
+    def prune(self, keep_last: int = None, keep_days: int = None) -> dict:
+        """Drop snapshots outside both limits, then unreferenced chunks."""
+        ids = self.snapshot_ids()
+        keep = set(ids[-keep_last:]) if keep_last else set()
+        if keep_days:
+            cutoff = datetime.now().timestamp() - keep_days * 86400
+            for snapshot_id in ids:
+                created = datetime.fromisoformat(self.load(snapshot_id)["created_at"])
+                if created.timestamp() >= cutoff:
+                    keep.add(snapshot_id)
+        if not keep_last and not keep_days:
+            keep = set(ids)
+
+        removed = [s for s in ids if s not in keep]
+        for snapshot_id in removed:
+            (self.snapshots_dir / f"{snapshot_id}.json.gz").unlink()
+
+        referenced = self._referenced(sorted(keep))
+        freed = deleted = 0
+        for digest, path in list(self.store.all()):
+            if digest not in referenced:
+                freed += path.stat().st_size
+                path.unlink()
+                deleted += 1
+
+        return {"snapshots": len(removed), "chunks": deleted, "bytes": freed}
+
+    def _referenced(self, snapshot_ids) -> set:
+        referenced = set()
+        for snapshot_id in snapshot_ids:
+            manifest = self.load(snapshot_id)
+            for entry in manifest["files"].values():
+                referenced.update(entry["chunks"])
+            if manifest.get("database"):
+                referenced.update(manifest["database"]["chunks"])
+        return referenced
+
+    @_exclusive
+    def verify(self, snapshot_ids=None, full: bool = False) -> dict:
+        """
+        Check that every chunk the snapshots reference exists; with ``full``
+        also rehash each chunk (in parallel) against its digest.
+        """
+        snapshot_ids = snapshot_ids or self.snapshot_ids()
+        referenced = self._referenced(snapshot_ids)
+
+        def check(digest):
+            path = self.store.path(digest)
+            if not path.exists():
+                return digest, "missing"
+            if full and hashlib.sha256(path.read_bytes()).hexdigest() != digest:
+                return digest, "corrupt"
+            return digest, None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            problems = {d: p for d, p in pool.map(check, referenced) if p}
+
+        return {
+            "snapshots": len(snapshot_ids),
+            "chunks": len(referenced),
+            "problems": problems,
+        }
@@ -1,17 +1,164 @@
+import asyncio
 import json
+import re
+from collections import deque
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+from .logbuffer import log_buffer, replay
+from .logfilter import LogFilter, parse_level
 
 
 class ProgressConsumer(AsyncWebsocketConsumer):
+    """
+    Streams a server's log lines.
+
+    Frames carry ``seq`` and ``last``, the sequence numbers of their first
+    and last line. Clients reconnect with ``?since=<last>`` to resume without
+    gaps or duplicates; ``?tail=<n>`` sets how many lines a fresh connection
+    gets. ``?level=WARN`` and ``?regex=`` filter lines server-side.
+
+    Lines wait in a bounded per-connection queue and are sent as one frame
+    per drain. Every frame has an id in ``frame`` which the client acks by
+    sending ``{"ack": <frame>}``; the server's send buffer does not fill
+    up, so those acks are what tells a slow client apart. Once
+    LOG_WS_WINDOW_BYTES are unacked sending pauses, the queue fills and
+    its oldest lines are dropped; the next frame reports how many in
+    ``dropped``. A client that sends no ack for LOG_WS_ACK_TIMEOUT while
+    paused is disconnected (code 4408) and can resume with ``since``.
+    """
+
     async def connect(self):
         self.server_id = self.scope["url_route"]["kwargs"]["server_id"]
         self.group = f"progress_{self.server_id}"
+        self.last_seq = 0
+        self.queue = deque()
+        self.dropped = 0
+        self.wakeup = asyncio.Event()
+        self.sender = None
+        self.frame_id = 0
+        self.unacked = deque()
+        self.unacked_bytes = 0
+        self.acked = asyncio.Event()
+
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        try:
+            since = int(params["since"][0]) if "since" in params else None
+            tail = int(params["tail"][0]) if "tail" in params else None
+            level = parse_level(params["level"][0]) if "level" in params else None
+            regex = re.compile(params["regex"][0]) if "regex" in params else None
+            if "level" in params and level is None:
+                raise ValueError("unknown level")
+            if (since is not None and since < 0) or (tail is not None and tail < 1):
+                raise ValueError("negative since or tail")
+        except (ValueError, re.error):
+            await self.close(code=4400)
+            return
+        self.filter = LogFilter(level, regex)
 
+        # join first so nothing sent during the replay is missed;
+        # send_logs drops whatever the replay already covered
         await self.channel_layer.group_add(self.group, self.channel_name)
         await self.accept()
 
+        backlog = await sync_to_async(replay)(log_buffer, self.server_id, since, tail)
+        self.last_seq = backlog["seq"] + len(backlog["logs"]) - 1
+        if self.filter.active:
+            backlog["logs"] = [line for line in backlog["logs"] if self.filter(line)]
+        await self._send_frame({**backlog, "last": self.last_seq, "backfill": True})
+
+        self.sender = asyncio.create_task(self._send_loop())
+
     async def disconnect(self, code):
+        if self.sender is not None:
+            self.sender.cancel()
         await self.channel_layer.group_discard(self.group, self.channel_name)
 
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            ack = int(json.loads(text_data)["ack"])
+        except (TypeError, ValueError, KeyError):
+            return
+        while self.unacked and self.unacked[0][0] <= ack:
+            self.unacked_bytes -= self.unacked.popleft()[1]
+        self.acked.set()
+
     async def send_log(self, event):
-        await self.send(text_data=json.dumps({"log": event["log"]}))
+        self._enqueue(None, [event["log"]])
+
+    async def send_logs(self, event):
+        lines = event["logs"]
+        seq = event.get("seq")
+
+        if seq is not None:
+            if seq == 1:
+                # the sequence restarted (buffer was cleared)
+                self.last_seq = 0
+            skip = max(self.last_seq - seq + 1, 0)
+            if skip >= len(lines):
+                return
+            lines = lines[skip:]
+            seq += skip
+            self.last_seq = seq + len(lines) - 1
+
+        self._enqueue(seq, lines)
+
+    def _enqueue(self, seq, lines):
+        for i, line in enumerate(lines):
+            if self.filter(line):
+                self.queue.append((None if seq is None else seq + i, line))
+
+        overflow = len(self.queue) - settings.LOG_WS_QUEUE_LINES
+        if overflow > 0:
+            for _ in range(overflow):
+                self.queue.popleft()
+            self.dropped += overflow
+
+        if self.queue:
+            self.wakeup.set()
+
+    async def _send_frame(self, frame: dict):
+        self.frame_id += 1
+        text = json.dumps({**frame, "frame": self.frame_id})
+        size = len(text.encode("utf-8"))
+        self.unacked.append((self.frame_id, size))
+        self.unacked_bytes += size
+        await self.send(text_data=text)
+
+    async def _wait_for_window(self) -> bool:
+        while self.unacked_bytes > settings.LOG_WS_WINDOW_BYTES:
+            self.acked.clear()
+            try:
+                await asyncio.wait_for(self.acked.wait(), settings.LOG_WS_ACK_TIMEOUT)
+            except asyncio.TimeoutError:
+                await self.close(code=4408)
+                return False
+        return True
+
+    async def _send_loop(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+
+            while self.queue:
+                # lines keep queueing (and dropping) while the client catches up
+                if not await self._wait_for_window():
+                    return
+
+                n = min(len(self.queue), settings.LOG_WS_FRAME_LINES)
+                batch = [self.queue.popleft() for _ in range(n)]
+                frame = {
+                    "logs": [line for _, line in batch],
+                    "seq": batch[0][0],
+                    "last": batch[-1][0],
+                }
+                if self.dropped:
+                    frame["dropped"] = self.dropped
+                    self.dropped = 0
+
+                # lines arriving while this send is in flight are coalesced
+                # into the next frame
+                await self._send_frame(frame)
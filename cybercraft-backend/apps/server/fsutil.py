@@ -0,0 +1,60 @@
+import contextlib
+import os
+import shutil
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+FICLONE = 0x40049409
+
+
+def reflink(src: Path, dst: Path) -> bool:
+    if fcntl is None:
+        return False
+
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.unlink(dst)
+        return False
+
+    shutil.copystat(src, dst)
+    return True
+
+
+def clone_file(src: Path, dst: Path, allow_hardlink: bool = True) -> str:
+    """Copy ``src`` to ``dst`` as cheaply as the filesystem allows."""
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(dst)
+
+    if reflink(src, dst):
+        return "reflink"
+
+    if allow_hardlink:
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass
+
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+@contextlib.contextmanager
+def file_lock(path: Path):
+    """Exclusive advisory lock shared between processes (no-op without fcntl)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,100 @@
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+from django.conf import settings
+
+from .fsutil import clone_file, file_lock
+from .utils import normalize
+
+COMPLETE_MARKER = ".complete"
+
+
+def shareable(rel: Path) -> bool:
+    return rel.parts[0] == "libraries" or rel.suffix == ".jar"
+
+
+class InstallTemplateStore:
+    """
+    Immutable results of Forge/NeoForge ``--installServer`` runs.
+
+    Each template is installed once in a staging directory, renamed into
+    place when the installer succeeds and then cloned into new servers.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._locks = {}
+
+    def key(self, loader: str, version: str, digest: str) -> str:
+        return normalize(f"{loader}-{version}-{digest[:12]}")
+
+    def ensure(
+        self,
+        key: str,
+        installer: Path,
+        run_installer: Callable[[Path, Path], bool],
+    ) -> Optional[Path]:
+        template = self.root / key
+        if (template / COMPLETE_MARKER).exists():
+            return template
+
+        with self._key_lock(key), file_lock(self.root / f".{key}.lock"):
+            if (template / COMPLETE_MARKER).exists():
+                return template
+
+            staging = self.root / f".{key}.staging"
+            shutil.rmtree(staging, ignore_errors=True)
+            staging.mkdir(parents=True)
+
+            staged_installer = staging / "installer.jar"
+            shutil.copy2(installer, staged_installer)
+
+            if not run_installer(staged_installer, staging):
+                shutil.rmtree(staging, ignore_errors=True)
+                return None
+
+            staged_installer.unlink()
+            for leftover in staging.glob("installer.jar.log"):
+                leftover.unlink()
+
+            self._freeze(staging)
+            (staging / COMPLETE_MARKER).write_text(
+                json.dumps({"installer": installer.name}), encoding="utf-8"
+            )
+
+            shutil.rmtree(template, ignore_errors=True)
+            os.replace(staging, template)
+
+        return template
+
+    def clone_into(self, template: Path, dest: Path):
+        for dirpath, dirnames, filenames in os.walk(template):
+            src_dir = Path(dirpath)
+            rel_dir = src_dir.relative_to(template)
+            (dest / rel_dir).mkdir(parents=True, exist_ok=True)
+
+            for name in filenames:
+                rel = rel_dir / name
+                if rel == Path(COMPLETE_MARKER):
+                    continue
+                clone_file(src_dir / name, dest / rel, allow_hardlink=shareable(rel))
+
+    def _freeze(self, staging: Path):
+        if os.name == "nt":
+            return
+
+        for path in staging.rglob("*"):
+            if path.is_file() and shareable(path.relative_to(staging)):
+                os.chmod(path, 0o444)
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+
+install_templates = InstallTemplateStore(settings.INSTALL_TEMPLATES_DIR)
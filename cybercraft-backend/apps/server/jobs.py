@@ -0,0 +1,282 @@
+import logging
+import os
+import random
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+import psutil
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Func, Subquery
+from django.db.models.lookups import LessThan
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job, JobHostLock
+from .utils import ws_log
+
+logger = logging.getLogger(__name__)
+
+# kind -> dotted path of a function taking the Job
+HANDLERS = {
+    "create_server": "apps.server.services.provision_server",
+    "start_server": "apps.server.services.start_server_job",
+    "stop_server": "apps.server.services.stop_server_job",
+    "snapshot_world": "apps.server.snapshots.snapshot_job",
+}
+
+HEARTBEAT_INTERVAL = 15
+MAX_RETRY_DELAY = 15 * 60
+
+_stage_slots = {}
+_stage_guard = threading.Lock()
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Hold one of the JOB_STAGE_LIMITS slots for ``name`` ("download",
+    "install", "disk") while a job does that kind of work.
+    """
+    with _stage_guard:
+        slots = _stage_slots.get(name)
+        if slots is None:
+            slots = threading.BoundedSemaphore(settings.JOB_STAGE_LIMITS.get(name, 1))
+            _stage_slots[name] = slots
+    with slots:
+        yield
+
+
+def enqueue(kind: str, payload: dict = None, server=None, max_attempts=None) -> Job:
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    job = Job.objects.create(
+        kind=kind,
+        payload=payload or {},
+        server=server,
+        host=settings.SERVER_HOST,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_after=timezone.now(),
+    )
+    if server is not None:
+        ahead = Job.objects.filter(
+            host=job.host, status=Job.QUEUED, created_at__lt=job.created_at
+        ).count()
+        ws_log(server.id, f"[Job] Queued ({ahead} ahead)")
+
+    runner = _local_runner
+    if runner is not None:
+        transaction.on_commit(runner.wake)
+    return job
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter: base, 2x base, 4x base, ..."""
+    delay = settings.JOB_RETRY_DELAY * 2 ** max(attempts - 1, 0)
+    return min(delay, MAX_RETRY_DELAY) * random.uniform(0.8, 1.2)
+
+
+class JobRunner:
+    """
+    Runs queued jobs of this host on a pool of JOB_WORKERS threads.
+
+    Jobs are claimed with a conditional UPDATE that also re-counts the
+    host's running jobs, so several runners can share the table and
+    JOB_HOST_CONCURRENCY caps running jobs per host across all of them.
+    Where the database has row locks, claims for a host are serialized on
+    its JobHostLock row so the count sees every earlier claim. Running jobs
+    send heartbeats; a job whose runner died is queued again (or failed
+    when out of attempts).
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or settings.JOB_WORKERS
+        self.host = settings.SERVER_HOST
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="job"
+        )
+        self._running = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._last_heartbeat = 0.0
+
+    def wake(self):
+        self._wake.set()
+
+    def run_forever(self, poll: float = 5.0):
+        while True:
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Job runner tick failed")
+            finally:
+                close_old_connections()
+            self._wake.wait(poll)
+            self._wake.clear()
+
+    def run_until_idle(self):
+        """Run jobs until none is queued or running (``runjobs --once``)."""
+        while True:
+            self.tick()
+            with self._lock:
+                busy = bool(self._running)
+            if not busy and not self._due().exists():
+                return
+            self._wake.wait(1.0)
+            self._wake.clear()
+
+    def tick(self):
+        now = timezone.now()
+        if now.timestamp() - self._last_heartbeat >= HEARTBEAT_INTERVAL:
+            self._heartbeat(now)
+            self.recover(now)
+
+        while True:
+            with self._lock:
+                if len(self._running) >= self.workers:
+                    return
+            job = self._claim()
+            if job is None:
+                return
+            with self._lock:
+                self._running.add(job.id)
+            self._pool.submit(self._execute, job)
+
+    def _due(self):
+        return Job.objects.filter(
+            host=self.host, status=Job.QUEUED, run_after__lte=timezone.now()
+        )
+
+    def _claim(self):
+        limit = settings.JOB_HOST_CONCURRENCY
+        running = Job.objects.filter(host=self.host, status=Job.RUNNING)
+        if running.count() >= limit:
+            return None
+
+        below_limit = LessThan(
+            Subquery(
+                running.order_by()
+                .annotate(n=Func(F("id"), function="COUNT"))
+                .values("n")
+            ),
+            limit,
+        )
+        for job in self._due().order_by("created_at")[:10]:
+            now = timezone.now()
+            with transaction.atomic():
+                self._lock_host()
+                claimed = Job.objects.filter(
+                    below_limit, id=job.id, status=Job.QUEUED
+                ).update(
+                    status=Job.RUNNING,
+                    worker=self.name,
+                    attempts=F("attempts") + 1,
+                    started_at=now,
+                    heartbeat_at=now,
+                )
+            if claimed:
+                job.refresh_from_db()
+                return job
+            if running.count() >= limit:
+                return None
+        return None
+
+    def _lock_host(self):
+        # SQLite has no row locks, but runs each UPDATE alone anyway
+        if connection.features.has_select_for_update:
+            JobHostLock.objects.get_or_create(host=self.host)
+            JobHostLock.objects.select_for_update().get(host=self.host)
+
+    def _heartbeat(self, now):
+        self._last_heartbeat = now.timestamp()
+        with self._lock:
+            ids = list(self._running)
+        if ids:
+            Job.objects.filter(id__in=ids, status=Job.RUNNING).update(heartbeat_at=now)
+
+    def recover(self, now=None):
+        """Requeue running jobs whose runner stopped sending heartbeats."""
+        now = now or timezone.now()
+        stale = now - timedelta(seconds=settings.JOB_STALE_AFTER)
+        hostname = socket.gethostname()
+
+        for job in Job.objects.filter(host=self.host, status=Job.RUNNING).exclude(
+            worker=self.name
+        ):
+            worker_host, _, pid = job.worker.rpartition(":")
+            dead = (
+                worker_host == hostname
+                and pid.isdigit()
+                and not psutil.pid_exists(int(pid))
+            )
+            if dead or job.heartbeat_at is None or job.heartbeat_at < stale:
+                self._finish_attempt(job, "Worker lost")
+
+    def _execute(self, job: Job):
+        close_old_connections()
+        try:
+            if job.server_id:
+                ws_log(
+                    job.server_id,
+                    f"[Job] Started (attempt {job.attempts}/{job.max_attempts})",
+                )
+            import_string(HANDLERS[job.kind])(job)
+        except Exception as e:
+            logger.exception("Job %s failed", job.id)
+            self._finish_attempt(job, str(e) or type(e).__name__)
+        else:
+            Job.objects.filter(id=job.id).update(
+                status=Job.SUCCEEDED, error="", finished_at=timezone.now()
+            )
+        finally:
+            with self._lock:
+                self._running.discard(job.id)
+            close_old_connections()
+            self.wake()
+
+    @staticmethod
+    def _finish_attempt(job: Job, error: str):
+        current = Job.objects.filter(id=job.id, status=Job.RUNNING, worker=job.worker)
+        if job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            current.update(
+                status=Job.QUEUED,
+                error=error,
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+            message = (
+                f"[Job] Attempt {job.attempts} failed: {error}; "
+                f"retrying in {delay:.0f}s"
+            )
+        else:
+            current.update(status=Job.FAILED, error=error, finished_at=timezone.now())
+            message = f"[Error] {error}"
+        if job.server_id:
+            ws_log(job.server_id, message)
+
+
+_local_runner = None
+_local_guard = threading.Lock()
+
+
+def start_local_runner():
+    """
+    Start the in-process runner when JOB_RUNNER is "local". Called from the
+    ASGI/WSGI application, so only web processes run jobs; management
+    commands and scripts that merely enqueue leave them to it.
+    """
+    global _local_runner
+    if settings.JOB_RUNNER != "local":
+        return None
+    with _local_guard:
+        if _local_runner is None:
+            _local_runner = JobRunner()
+            threading.Thread(
+                target=_local_runner.run_forever, daemon=True, name="job-runner"
+            ).start()
+    return _local_runner
@@ -0,0 +1,310 @@
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_NAME = "panel.log"
+INDEX_NAME = "index.json"
+
+# "[12:34:56]" (vanilla) or "[18Oct2026 12:34:56.789]" (Forge debug)
+LINE_TIME_RE = re.compile(r"\[(?:(\d{2}[A-Za-z]{3}\d{4}) )?(\d{2}):(\d{2}):(\d{2})")
+
+_compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-compress")
+_index_locks = {}
+_index_locks_guard = threading.Lock()
+
+
+def panel_log_dir(server_path) -> Path:
+    """Directory for panel-written logs, kept apart from the JVM's ``logs/``."""
+    return Path(server_path) / "panel_logs"
+
+
+def default_codec() -> str:
+    codec = settings.LOG_COMPRESSION
+    if codec == "zstd" and zstandard is None:
+        return "gzip"
+    return codec
+
+
+def _index_lock(directory: Path) -> threading.Lock:
+    with _index_locks_guard:
+        return _index_locks.setdefault(str(directory), threading.Lock())
+
+
+def open_segment(path: Path):
+    """Open a plain, gzip or zstd segment as a binary stream."""
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    if path.suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read .zst log segments")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+class LineClock:
+    """
+    Timestamps for the lines of one segment. Server output only carries the
+    time of day, so the date is carried forward from the segment's start
+    and advanced when the clock goes back by more than half a day; lines
+    without a time (panel messages, stack traces) get the previous one's.
+    """
+
+    def __init__(self, start: float):
+        self.current = start
+
+    def __call__(self, line: str) -> float:
+        m = LINE_TIME_RE.match(line)
+        if m is None:
+            return self.current
+
+        date, hour, minute, second = m.groups()
+        if date:
+            try:
+                day = time.strptime(date, "%d%b%Y")
+            except ValueError:
+                return self.current
+        else:
+            day = time.localtime(self.current)
+        fields = (day.tm_year, day.tm_mon, day.tm_mday, int(hour), int(minute), int(second))
+        stamp = time.mktime(fields + (0, 0, -1))
+        if not date and stamp + 43200 < self.current:
+            stamp = time.mktime(fields[:2] + (fields[2] + 1,) + fields[3:] + (0, 0, -1))
+
+        self.current = stamp
+        return stamp
+
+
+class LogArchive:
+    """
+    Rotated panel logs of one server.
+
+    ``index.json`` keeps the start/end time of every segment and of the
+    active file, so history searches only open the segments they need.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.active = self.directory / ACTIVE_NAME
+        self.index_path = self.directory / INDEX_NAME
+        self._lock = _index_lock(self.directory)
+
+    def load(self) -> dict:
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        data.setdefault("segments", [])
+        data.setdefault("active_started", None)
+        return data
+
+    def _save(self, data: dict):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+    def active_started(self) -> float:
+        """Start time of the active file, recorded on first use."""
+        with self._lock:
+            data = self.load()
+            if data["active_started"] is None:
+                data["active_started"] = time.time()
+                self._save(data)
+            return data["active_started"]
+
+    def rotate(self, retention_days: int = None, retention_mb: int = None):
+        """
+        Move the active file into a new segment and compress it in the
+        background. The caller must have closed its handle to the file.
+        """
+        now = time.time()
+        with self._lock:
+            data = self.load()
+            try:
+                size = self.active.stat().st_size
+            except FileNotFoundError:
+                size = 0
+
+            if size:
+                started = data["active_started"] or now
+                stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime(started))
+                name = f"panel-{stamp}-{len(data['segments']):05d}.log"
+                os.replace(self.active, self.directory / name)
+                data["segments"].append(
+                    {"name": name, "start": started, "end": now, "size": size}
+                )
+            data["active_started"] = now
+            self._save(data)
+
+        if size:
+            _compressor.submit(self._compress, name, retention_days, retention_mb)
+
+    def _compress(self, name: str, retention_days=None, retention_mb=None):
+        codec = default_codec()
+        src = self.directory / name
+        suffix = ".zst" if codec == "zstd" else ".gz"
+        dst = src.with_name(name + suffix)
+        tmp = dst.with_name(f"{dst.name}.{os.getpid()}.tmp")
+        if not src.exists():
+            # already compressed (by another process, or before a restart
+            # that came ahead of the index update)
+            if not dst.exists():
+                return
+        else:
+            try:
+                self._write_compressed(src, tmp, codec)
+                os.replace(tmp, dst)
+            except OSError:
+                logger.exception("Could not compress log segment %s", src)
+                tmp.unlink(missing_ok=True)
+                return
+
+        with self._lock:
+            data = self.load()
+            for segment in data["segments"]:
+                if segment["name"] == name:
+                    segment["name"] = dst.name
+                    segment["compressed_size"] = dst.stat().st_size
+            self._save(data)
+        src.unlink(missing_ok=True)
+
+        self.prune(retention_days, retention_mb)
+
+    @staticmethod
+    def _write_compressed(src: Path, tmp: Path, codec: str):
+        with open(src, "rb") as f_in, open(tmp, "wb") as f_out:
+            if codec == "zstd":
+                cctx = zstandard.ZstdCompressor(level=settings.LOG_COMPRESSION_LEVEL)
+                cctx.copy_stream(f_in, f_out)
+            else:
+                with gzip.GzipFile(
+                    fileobj=f_out,
+                    mode="wb",
+                    compresslevel=settings.LOG_COMPRESSION_LEVEL,
+                ) as gz:
+                    while block := f_in.read(1024 * 1024):
+                        gz.write(block)
+
+    def compress_pending(self, retention_days: int = None, retention_mb: int = None):
+        """
+        Queue compression of rotated segments that are still plain, e.g.
+        because the process stopped before their background compression ran.
+        """
+        with self._lock:
+            names = [
+                s["name"] for s in self.load()["segments"] if s["name"].endswith(".log")
+            ]
+        for name in names:
+            _compressor.submit(self._compress, name, retention_days, retention_mb)
+
+    def prune(self, retention_days: int = None, retention_mb: int = None):
+        """
+        Drop segments older than the age limit, and, newest first, every
+        segment from the one that no longer fits the size limit on.
+        """
+        now = time.time()
+        with self._lock:
+            data = self.load()
+            keep = []
+            budget = retention_mb * 1024 * 1024 if retention_mb else None
+            full = False
+
+            for segment in reversed(data["segments"]):
+                stored = segment.get("compressed_size", segment["size"])
+                expired = retention_days and now - segment["end"] > retention_days * 86400
+                full = full or (budget is not None and stored > budget)
+                if expired or full:
+                    (self.directory / segment["name"]).unlink(missing_ok=True)
+                    continue
+                if budget is not None:
+                    budget -= stored
+                keep.append(segment)
+
+            keep.reverse()
+            if len(keep) != len(data["segments"]):
+                data["segments"] = keep
+                self._save(data)
+
+    def segments(self, since: float = None, until: float = None) -> list:
+        """Index entries overlapping [since, until], the active file last."""
+        data = self.load()
+        entries = list(data["segments"])
+        if self.active.exists():
+            entries.append(
+                {
+                    "name": ACTIVE_NAME,
+                    "start": data["active_started"] or time.time(),
+                    "end": time.time(),
+                    "size": self.active.stat().st_size,
+                }
+            )
+
+        return [
+            s
+            for s in entries
+            if (since is None or s["end"] >= since)
+            and (until is None or s["start"] <= until)
+        ]
+
+    def search(self, since=None, until=None, match=None, limit=500) -> dict:
+        """
+        Return the newest ``limit`` matching lines logged within [since,
+        until]. Segments are read newest first and only until the limit is
+        reached; lines of segments reaching past either bound are dated
+        with LineClock and filtered one by one.
+        """
+        found = deque()
+        searched = []
+
+        for segment in reversed(self.segments(since, until)):
+            remaining = limit - len(found)
+            if remaining <= 0:
+                break
+
+            lines = deque(maxlen=remaining)
+            boundary = (since is not None and segment["start"] < since) or (
+                until is not None and segment["end"] > until
+            )
+            clock = LineClock(segment["start"]) if boundary else None
+            try:
+                with open_segment(self.directory / segment["name"]) as raw:
+                    for line in io.TextIOWrapper(raw, encoding="utf-8", errors="ignore"):
+                        line = line.rstrip("\r\n")
+                        if clock is not None:
+                            logged = clock(line)
+                            if since is not None and logged < since:
+                                continue
+                            if until is not None and logged > until:
+                                continue
+                        if match is None or match(line):
+                            lines.append(line)
+            except FileNotFoundError:
+                # pruned or renamed by the compressor while we were listing
+                continue
+
+            found.extendleft(reversed(lines))
+            searched.append(segment["name"])
+
+        return {"logs": list(found), "segments": searched}
+
+
+def archive_for(server_path) -> Optional[LogArchive]:
+    return LogArchive(panel_log_dir(server_path)) if server_path else None
@@ -0,0 +1,116 @@
+import threading
+from collections import deque
+
+from django.conf import settings
+
+
+class MemoryLogBuffer:
+    """
+    Last ``size`` lines per server, numbered with a per-server sequence.
+
+    Only shared with consumers in the same process, i.e. when the supervisor
+    runs inside the web process.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._lines = {}
+        self._seq = {}
+        self._lock = threading.Lock()
+
+    def append(self, server_id: int, lines) -> int:
+        """Store ``lines`` and return the sequence number of the first one."""
+        with self._lock:
+            first = self._seq.get(server_id, 0) + 1
+            self._seq[server_id] = first + len(lines) - 1
+            buf = self._lines.get(server_id)
+            if buf is None:
+                buf = self._lines[server_id] = deque(maxlen=self.size)
+            buf.extend(lines)
+            return first
+
+    def read(self, server_id: int, limit: int):
+        """Return (seq of first line, lines) for the newest ``limit`` lines."""
+        with self._lock:
+            last = self._seq.get(server_id, 0)
+            buf = self._lines.get(server_id) or ()
+            lines = list(buf)[-limit:] if limit > 0 else []
+        return last - len(lines) + 1, lines
+
+
+class RedisLogBuffer:
+    """Same as MemoryLogBuffer, kept in a capped Redis list per server."""
+
+    def __init__(self, size: int, url: str):
+        import redis
+
+        self.size = size
+        self.client = redis.Redis.from_url(url)
+
+    def _keys(self, server_id: int):
+        return f"logbuf:{server_id}:seq", f"logbuf:{server_id}:lines"
+
+    def append(self, server_id: int, lines) -> int:
+        seq_key, lines_key = self._keys(server_id)
+        # one writer per server (its supervisor), so incr-then-push is safe
+        last = self.client.incrby(seq_key, len(lines))
+        pipe = self.client.pipeline()
+        pipe.rpush(lines_key, *lines)
+        pipe.ltrim(lines_key, -self.size, -1)
+        pipe.execute()
+        return last - len(lines) + 1
+
+    def read(self, server_id: int, limit: int):
+        if limit <= 0:
+            return 0, []
+
+        seq_key, lines_key = self._keys(server_id)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.get(seq_key)
+        pipe.lrange(lines_key, -limit, -1)
+        last, raw = pipe.execute()
+
+        lines = [line.decode("utf-8", errors="ignore") for line in raw]
+        return int(last or 0) - len(lines) + 1, lines
+
+
+def replay(buffer, server_id: int, since=None, limit: int = None):
+    """
+    Lines a (re)connecting client is missing.
+
+    With ``since`` (last sequence number the client saw) only newer lines
+    are returned; ``gap`` is set when some of them already fell out of the
+    buffer and ``reset`` when the sequence restarted below ``since``.
+    """
+    limit = limit or settings.LOG_BACKFILL_LINES
+    first, lines = buffer.read(server_id, buffer.size if since is not None else limit)
+    last = first + len(lines) - 1
+    result = {"seq": first, "logs": lines, "gap": False, "reset": False}
+
+    if since is None:
+        return result
+
+    if since > last:
+        # sequence restarted (panel restart or in-memory buffer): send the tail
+        result["reset"] = True
+        result["logs"] = lines[-limit:]
+        result["seq"] = last - len(result["logs"]) + 1
+        return result
+
+    skip = since - first + 1
+    if skip < 0:
+        result["gap"] = True
+    else:
+        result["logs"] = lines[skip:]
+        result["seq"] = since + 1
+    return result
+
+
+def _create_buffer():
+    size = settings.LOG_BUFFER_SIZE
+    if settings.LOG_BUFFER_BACKEND == "redis":
+        return RedisLogBuffer(size, settings.LOG_BUFFER_REDIS_URL)
+    return MemoryLogBuffer(size)
+
+
+log_buffer = _create_buffer()
@@ -0,0 +1,49 @@
+import re
+
+LEVELS = ["TRACE", "DEBUG", "INFO", "WARN", "ERROR", "FATAL"]
+ALIASES = {"WARNING": "WARN", "SEVERE": "ERROR"}
+
+# "[Server thread/WARN]", "[12:00:00 ERROR]", "[Error] ..." (panel messages)
+LEVEL_RE = re.compile(
+    r"[\[/ ](TRACE|DEBUG|INFO|WARN(?:ING)?|ERROR|SEVERE|FATAL)\]", re.IGNORECASE
+)
+
+
+def parse_level(name: str):
+    name = name.upper()
+    name = ALIASES.get(name, name)
+    return LEVELS.index(name) if name in LEVELS else None
+
+
+def line_level(line: str):
+    m = LEVEL_RE.search(line)
+    return parse_level(m.group(1)) if m else None
+
+
+class LogFilter:
+    """
+    Keeps lines at or above ``level`` that match ``regex``.
+
+    Lines without a level of their own (stack traces, wrapped output)
+    take the level of the line before them.
+    """
+
+    def __init__(self, level: int = None, regex: re.Pattern = None):
+        self.level = level
+        self.regex = regex
+        self._current = None
+
+    @property
+    def active(self) -> bool:
+        return self.level is not None or self.regex is not None
+
+    def __call__(self, line: str) -> bool:
+        if self.level is not None:
+            level = line_level(line)
+            if level is None:
+                level = self._current
+            else:
+                self._current = level
+            if level is None or level < self.level:
+                return False
+        return self.regex is None or self.regex.search(line) is not None
@@ -0,0 +1,198 @@
+import atexit
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .logarchive import LogArchive, archive_for
+from .logbuffer import log_buffer
+from .models import Server
+
+logger = logging.getLogger(__name__)
+
+
+def server_log_path(server_path) -> Path:
+    return archive_for(server_path).active
+
+
+class ServerLog:
+    def __init__(
+        self,
+        server_id: int,
+        archive: Optional[LogArchive],
+        retention_days: int = None,
+        retention_mb: int = None,
+    ):
+        self.server_id = server_id
+        self.archive = archive
+        self.path = archive.active if archive else None
+        self.retention_days = retention_days
+        self.retention_mb = retention_mb
+        self.handle = None
+        self.started = None
+        self.pending = []
+
+    def write(self, lines):
+        if self.path is None:
+            return
+
+        if self.handle is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.started = self.archive.active_started()
+            self.handle = open(
+                self.path, "a", encoding="utf-8", buffering=1024 * 64
+            )
+
+        self.handle.write("\n".join(lines) + "\n")
+        self.handle.flush()
+
+        if (
+            self.handle.tell() >= settings.LOG_ROTATE_BYTES
+            or time.time() - self.started >= settings.LOG_ROTATE_AGE
+        ):
+            self.rotate()
+
+    def rotate(self):
+        self.close()
+        self.archive.rotate(self.retention_days, self.retention_mb)
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+class LogSink:
+    """
+    Buffers server output and ships it every ``interval`` seconds or
+    ``batch_size`` lines: one file append and one group_send per batch.
+    """
+
+    def __init__(self, interval: float = 0.05, batch_size: int = 256):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._logs = {}
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def open(self, server_id: int):
+        if server_id not in self._logs:
+            self._open(server_id)
+
+    def write(self, server_id: int, line: str):
+        log = self._logs.get(server_id)
+        if log is None:
+            log = self._open(server_id)
+
+        with self._lock:
+            log.pending.append(line)
+            full = len(log.pending) >= self.batch_size
+
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def flush(self, server_id: Optional[int] = None):
+        with self._lock:
+            if server_id is None:
+                logs = list(self._logs.values())
+            else:
+                logs = [self._logs[server_id]] if server_id in self._logs else []
+
+            batches = []
+            for log in logs:
+                if log.pending:
+                    batches.append((log, log.pending))
+                    log.pending = []
+
+        with self._io_lock:
+            for log, lines in batches:
+                self._ship(log, lines)
+
+    def close(self, server_id: int):
+        self.flush(server_id)
+
+        with self._lock:
+            log = self._logs.pop(server_id, None)
+
+        if log is not None:
+            with self._io_lock:
+                log.close()
+
+    def close_all(self):
+        self.flush()
+
+        with self._lock:
+            logs = list(self._logs.values())
+            self._logs.clear()
+
+        with self._io_lock:
+            for log in logs:
+                log.close()
+
+    def _open(self, server_id: int) -> ServerLog:
+        path, days, mb = (
+            Server.objects.filter(id=server_id)
+            .values_list("path", "log_retention_days", "log_retention_mb")
+            .first()
+        ) or (None, None, None)
+        log = ServerLog(server_id, archive_for(path), days, mb)
+        if log.archive is not None:
+            # segments rotated just before the last restart
+            log.archive.compress_pending(days, mb)
+
+        with self._lock:
+            return self._logs.setdefault(server_id, log)
+
+    def _ship(self, log: ServerLog, lines):
+        try:
+            log.write(lines)
+        except OSError:
+            log.close()
+
+        try:
+            seq = log_buffer.append(log.server_id, lines)
+        except Exception:
+            logger.exception("Could not buffer log of server %s", log.server_id)
+            seq = None
+
+        async_to_sync(get_channel_layer().group_send)(
+            f"progress_{log.server_id}",
+            {"type": "send_logs", "logs": lines, "seq": seq},
+        )
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="log-sink", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Log sink flush failed")
+
+
+log_sink = LogSink(
+    interval=getattr(settings, "LOG_FLUSH_INTERVAL", 0.05),
+    batch_size=getattr(settings, "LOG_BATCH_SIZE", 256),
+)
+
+atexit.register(log_sink.close_all)
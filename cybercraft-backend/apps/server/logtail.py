@@ -0,0 +1,118 @@
+import os
+import time
+from pathlib import Path
+
+BLOCK_SIZE = 64 * 1024
+MAX_SCAN = 16 * 1024 * 1024
+
+
+def _decode(raw: bytes) -> str:
+    return raw.decode("utf-8", errors="ignore").rstrip("\r")
+
+
+def read_backward(path: Path, before=None, limit=500, match=None, max_scan=MAX_SCAN):
+    """
+    Return up to ``limit`` lines that end before byte offset ``before``
+    (default: end of file), reading the file backwards in blocks.
+
+    The result holds the lines in file order, ``start`` (cursor to pass as
+    ``before`` for the previous page) and ``end``. At most ``max_scan`` bytes
+    are read, so a rarely matching filter cannot make a request unbounded.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        end = size if before is None else max(0, min(int(before), size))
+
+        stop = end
+        if stop > 0:
+            f.seek(stop - 1)
+            if f.read(1) == b"\n":
+                stop -= 1
+
+        lines = []
+        pos = stop
+        carry = b""
+        start = end
+        scanned = 0
+
+        while len(lines) < limit and scanned < max_scan:
+            if pos == 0 and not carry:
+                start = 0
+                break
+
+            step = min(BLOCK_SIZE, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step) + carry
+            scanned += step
+            idx = len(chunk)
+
+            while len(lines) < limit:
+                nl = chunk.rfind(b"\n", 0, idx)
+                if nl == -1:
+                    break
+                line = _decode(chunk[nl + 1:idx])
+                start = pos + nl + 1
+                if match is None or match(line):
+                    lines.append(line)
+                idx = nl
+
+            if len(lines) >= limit:
+                break
+
+            carry = chunk[:idx]
+            if pos == 0:
+                line = _decode(carry)
+                if match is None or match(line):
+                    lines.append(line)
+                start = 0
+                carry = b""
+                break
+
+    lines.reverse()
+    return {"logs": lines, "start": start, "end": end}
+
+
+def read_forward(path: Path, after: int, limit=500, match=None, max_scan=MAX_SCAN):
+    """
+    Return complete lines that start at byte offset ``after`` or later.
+
+    ``end`` is the cursor for the next call. If the file shrank below
+    ``after`` (truncated or rotated) reading restarts at 0 and ``reset`` is set.
+    """
+    reset = False
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if after > size:
+            after, reset = 0, True
+
+        f.seek(after)
+        data = f.read(min(size - after, max_scan))
+
+    cut = data.rfind(b"\n")
+    if cut == -1:
+        return {"logs": [], "start": after, "end": after, "reset": reset}
+
+    lines = []
+    offset = after
+    for raw in data[:cut].split(b"\n"):
+        offset += len(raw) + 1
+        line = _decode(raw)
+        if match is None or match(line):
+            lines.append(line)
+            if len(lines) >= limit:
+                break
+
+    return {"logs": lines, "start": after, "end": offset, "reset": reset}
+
+
+def wait_for_growth(path: Path, after: int, timeout: float, interval: float = 0.25):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if path.stat().st_size != after:
+                return True
+        except FileNotFoundError:
+            pass
+        time.sleep(interval)
+    return False
@@ -1,14 +1,17 @@
-import os
-import shutil
-from datetime import datetime
+import json
 from pathlib import Path
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.server.backups import BackupRepository
 
 
 class Command(BaseCommand):
-    help = 'Backup database and server files'
+    help = (
+        "Deduplicated backups of the database and server files "
+        "(create, restore, prune, verify, list; default: create)"
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -17,25 +20,105 @@ class Command(BaseCommand):
             default='backups',
             help='Directory to store backups',
         )
+        sub = parser.add_subparsers(dest="action")
+
+        sub.add_parser("create", help="Create a snapshot")
+
+        restore = sub.add_parser("restore", help="Restore a snapshot")
+        restore.add_argument("snapshot", help="Snapshot id or 'latest'")
+        restore.add_argument(
+            "--target",
+            help="Directory to restore into (default: <backup-dir>/restore-<id>)",
+        )
+        restore.add_argument(
+            "--path",
+            help="Only restore files under this path, e.g. server_files/<server>",
+        )
+
+        prune = sub.add_parser("prune", help="Delete old snapshots and unused chunks")
+        prune.add_argument("--keep-last", type=int, default=None)
+        prune.add_argument("--keep-days", type=int, default=None)
+
+        verify = sub.add_parser("verify", help="Check snapshots' chunks")
+        verify.add_argument("snapshots", nargs="*", help="Snapshot ids (default: all)")
+        verify.add_argument("--full", action="store_true", help="Rehash every chunk")
+
+        sub.add_parser("list", help="List snapshots")
 
     def handle(self, *args, **options):
         backup_dir = Path(settings.BASE_DIR) / options['backup_dir']
         backup_dir.mkdir(exist_ok=True)
+        repo = BackupRepository(backup_dir, workers=settings.BACKUP_WORKERS)
+
+        action = options.get("action") or "create"
+        getattr(self, f"handle_{action}")(repo, options)
+
+    def handle_create(self, repo, options):
+        db = settings.DATABASES['default']
+        db_path = None
+        if db["ENGINE"] == "django.db.backends.sqlite3":
+            db_path = Path(db["NAME"])
+        else:
+            self.stdout.write(
+                self.style.WARNING("Database is not SQLite; back it up with its own tools")
+            )
 
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        snapshot_id, stats = repo.create(
+            {"server_files": Path(settings.MINECRAFT_DIR)}, db_path=db_path
+        )
+        self.stdout.write(
+            f"Snapshot {snapshot_id}: {stats['files']} files "
+            f"({stats['unchanged']} unchanged), read {stats['read_bytes']} bytes, "
+            f"stored {stats['new_bytes']} new bytes in {stats['seconds']}s"
+        )
+        self.stdout.write(self.style.SUCCESS('Backup completed successfully'))
+
+    def handle_restore(self, repo, options):
+        ids = repo.snapshot_ids()
+        snapshot_id = ids[-1] if options["snapshot"] == "latest" and ids else options["snapshot"]
+        if snapshot_id not in ids:
+            raise CommandError(f"Unknown snapshot {options['snapshot']}")
+
+        target = Path(options["target"] or repo.root / f"restore-{snapshot_id}")
+        result = repo.restore(snapshot_id, target, include=options["path"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Restored {result['files']} files"
+                + (" and the database" if result["database"] else "")
+                + f" to {target}"
+            )
+        )
 
-        # Backup database
-        db_path = Path(settings.DATABASES['default']['NAME'])
-        if db_path.exists():
-            db_backup = backup_dir / f"db_{timestamp}.sqlite3"
-            shutil.copy2(db_path, db_backup)
-            self.stdout.write(f"Database backed up to {db_backup}")
+    def handle_prune(self, repo, options):
+        if not options["keep_last"] and not options["keep_days"]:
+            raise CommandError("Give --keep-last and/or --keep-days")
 
-        # Backup server files
-        server_dir = Path(settings.MINECRAFT_DIR)
-        if server_dir.exists():
-            server_backup = backup_dir / f"servers_{timestamp}"
-            shutil.copytree(server_dir, server_backup, dirs_exist_ok=True)
-            self.stdout.write(f"Server files backed up to {server_backup}")
+        result = repo.prune(options["keep_last"], options["keep_days"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {result['snapshots']} snapshots and {result['chunks']} "
+                f"chunks ({result['bytes']} bytes)"
+            )
+        )
+
+    def handle_verify(self, repo, options):
+        unknown = set(options["snapshots"]) - set(repo.snapshot_ids())
+        if unknown:
+            raise CommandError(f"Unknown snapshots: {', '.join(sorted(unknown))}")
+
+        result = repo.verify(options["snapshots"], full=options["full"])
+        for digest, problem in sorted(result["problems"].items()):
+            self.stderr.write(f"{problem}: {digest}")
+        if result["problems"]:
+            raise CommandError(f"{len(result['problems'])} bad chunks")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{result['snapshots']} snapshots, {result['chunks']} chunks OK"
+            )
+        )
 
-        self.stdout.write(self.style.SUCCESS('Backup completed successfully'))
\ No newline at end of file
+    def handle_list(self, repo, options):
+        for snapshot_id in repo.snapshot_ids():
+            stats = repo.load(snapshot_id).get("stats", {})
+            self.stdout.write(f"{snapshot_id} {json.dumps(stats)}")
@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.server.models import Server
+from apps.server.transfer import archive_suffix, export_codec, export_stream
+
+
+class Command(BaseCommand):
+    help = "Stream a server directory as a compressed tar archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument("server", help="Server id or name")
+        parser.add_argument(
+            "-o",
+            "--output",
+            help="Archive path, or - for stdout (default: <name>.tar.zst)",
+        )
+
+    def handle(self, *args, **options):
+        ref = options["server"]
+        servers = Server.objects.select_related("modpack")
+        server = (
+            servers.filter(id=int(ref)).first() if ref.isdigit() else None
+        ) or servers.filter(name=ref).first()
+        if server is None:
+            raise CommandError(f"Server {ref} not found")
+        if server.is_running:
+            self.stderr.write("Warning: server is running; world files may change mid-export")
+
+        codec = export_codec()
+        output = options["output"] or f"{server.name}{archive_suffix(codec)}"
+        if output == "-":
+            for block in export_stream(server, codec):
+                sys.stdout.buffer.write(block)
+            sys.stdout.buffer.flush()
+            return
+
+        size = 0
+        with open(output, "wb") as f:
+            for block in export_stream(server, codec):
+                f.write(block)
+                size += len(block)
+        self.stdout.write(self.style.SUCCESS(f"Exported {server.name} to {output} ({size} bytes)"))
@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.server.ports import NoFreePort
+from apps.server.transfer import TransferError, import_stream
+
+
+class Command(BaseCommand):
+    help = "Create a server from an archive made by exportserver"
+
+    def add_arguments(self, parser):
+        parser.add_argument("archive", help="Archive path, or - for stdin")
+        parser.add_argument("--name", help="Server name (default: the exported one)")
+        parser.add_argument("--modpack", help="Modpack id or name")
+        parser.add_argument("--mc-version", dest="mc_version", help="Minecraft version")
+        parser.add_argument("--loader")
+        parser.add_argument("--ram", type=int)
+
+    def handle(self, *args, **options):
+        overrides = {
+            "version": options["mc_version"],
+            "loader": options["loader"],
+            "ram": options["ram"],
+            "modpack": options["modpack"],
+        }
+        try:
+            if options["archive"] == "-":
+                server = import_stream(sys.stdin.buffer, name=options["name"], **overrides)
+            else:
+                with open(options["archive"], "rb") as f:
+                    server = import_stream(f, name=options["name"], **overrides)
+        except (TransferError, NoFreePort, OSError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {server.name} (id {server.id}) on port {server.port}"
+            )
+        )
@@ -0,0 +1,25 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from apps.server.poller import StatusPoller
+
+
+class Command(BaseCommand):
+    help = "Poll running servers with Server List Ping and store their status"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Poll every server once and exit",
+        )
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            changed = asyncio.run(StatusPoller().poll_once(force=True))
+            self.stdout.write(self.style.SUCCESS(f"{len(changed)} servers updated"))
+            return
+
+        self.stdout.write("Polling server status")
+        asyncio.run(StatusPoller().run())
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.server.jobs import JobRunner
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (server provisioning) for this host"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Worker threads (default JOB_WORKERS)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no job is queued or running",
+        )
+
+    def handle(self, *args, **options):
+        runner = JobRunner(workers=options["workers"])
+        if settings.JOB_RUNNER == "local":
+            self.stderr.write(
+                "Warning: JOB_RUNNER is 'local'; web processes also run jobs"
+            )
+
+        if options["once"]:
+            runner.run_until_idle()
+            self.stdout.write(self.style.SUCCESS("No jobs left"))
+            return
+
+        self.stdout.write(f"Running jobs for host '{runner.host}' as {runner.name}")
+        runner.run_forever()
@@ -0,0 +1,38 @@
+import asyncio
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.server.supervisor import supervisor
+
+
+class Command(BaseCommand):
+    help = "Run the process supervisor that owns all server and installer processes"
+
+    def handle(self, *args, **options):
+        channel = settings.SUPERVISOR_CHANNEL
+        if not channel:
+            raise CommandError(
+                "SUPERVISOR_CHANNEL is not set; the supervisor runs in-process"
+            )
+
+        self.stdout.write(f"Supervisor listening on '{channel}'")
+        asyncio.run(self.serve(channel))
+
+    async def serve(self, channel: str):
+        layer = get_channel_layer()
+        await supervisor.reconcile()
+
+        tasks = set()
+        while True:
+            message = await layer.receive(channel)
+            task = asyncio.create_task(self.dispatch(layer, message))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    async def dispatch(self, layer, message: dict):
+        result = await supervisor.handle(message)
+        reply_channel = message.get("reply_channel")
+        if reply_channel:
+            await layer.send(reply_channel, result)
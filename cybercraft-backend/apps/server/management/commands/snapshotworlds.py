@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.db.models import Q
+
+from apps.server.models import Server
+from apps.server.snapshots import snapshot_world
+
+
+class Command(BaseCommand):
+    help = "Snapshot the worlds of servers, pausing saves only briefly on running ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument("servers", nargs="*", help="Server ids or names")
+        parser.add_argument("--all", action="store_true", help="Snapshot every server")
+        parser.add_argument("--tar", action="store_true", help="Store each snapshot as a tar")
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            servers = list(Server.objects.all())
+        elif options["servers"]:
+            query = Q()
+            for ref in options["servers"]:
+                query |= Q(id=int(ref)) if ref.isdigit() else Q(name=ref)
+            servers = list(Server.objects.filter(query))
+        else:
+            raise CommandError("Give server ids or names, or --all")
+
+        if not servers:
+            raise CommandError("No matching servers")
+
+        def run(server):
+            close_old_connections()
+            try:
+                return server, snapshot_world(server, archive=options["tar"]), None
+            except Exception as e:
+                return server, None, e
+            finally:
+                close_old_connections()
+
+        failed = 0
+        with ThreadPoolExecutor(max_workers=settings.WORLD_SNAPSHOT_CONCURRENCY) as pool:
+            for server, snapshot, error in pool.map(run, servers):
+                if error is not None:
+                    failed += 1
+                    self.stderr.write(f"{server.name}: {error}")
+                    continue
+
+                paused = (
+                    f", saves paused {snapshot.save_off_seconds * 1000:.0f} ms"
+                    if snapshot.save_off_seconds is not None
+                    else ""
+                )
+                self.stdout.write(
+                    f"{server.name}: {snapshot.path} "
+                    f"({snapshot.files} files, {snapshot.size} bytes{paused})"
+                )
+
+        if failed:
+            raise CommandError(f"{failed} snapshots failed")
+        self.stdout.write(self.style.SUCCESS(f"{len(servers)} snapshots created"))
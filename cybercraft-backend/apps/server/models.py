@@ -8,6 +8,9 @@ class Server(models.Model):
     name = models.CharField(max_length=255)
     server_image = models.ImageField(upload_to="server_image", blank=True)
     online_player = models.IntegerField(default=0)
+    max_players = models.IntegerField(default=0)
+    motd = models.CharField(max_length=255, blank=True)
+    latency_ms = models.IntegerField(null=True, blank=True)
     description = models.TextField(blank=True, null=True)
     repo = models.URLField(blank=True, null=True)
     version = models.CharField(max_length=20)
@@ -21,6 +24,10 @@ class Server(models.Model):
     path = models.CharField(max_length=500)
     is_running = models.BooleanField(default=False)
     pid = models.IntegerField(null=True, blank=True)
+    log_retention_days = models.IntegerField(default=30)
+    log_retention_mb = models.IntegerField(default=1024)
+    rcon_port = models.IntegerField(null=True, blank=True, unique=True)
+    rcon_password = models.CharField(max_length=64, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -32,6 +39,119 @@ class Server(models.Model):
         ordering = ["name"]
 
 
+class PortAllocation(models.Model):
+    host = models.CharField(max_length=100)
+    port = models.IntegerField()
+    server = models.OneToOneField(
+        Server,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="port_allocation",
+    )
+
+    def __str__(self):
+        return f"{self.host}:{self.port}"
+
+    class Meta:
+        ordering = ["host", "port"]
+        constraints = [
+            models.UniqueConstraint(fields=["host", "port"], name="unique_host_port")
+        ]
+        indexes = [models.Index(fields=["host", "server", "port"])]
+
+
+class ServerStop(models.Model):
+    GRACEFUL = "graceful"
+    TERMINATED = "terminated"
+    KILLED = "killed"
+    OUTCOME_CHOICES = [
+        (GRACEFUL, "Graceful"),
+        (TERMINATED, "Terminated"),
+        (KILLED, "Killed"),
+    ]
+
+    server = models.ForeignKey(Server, on_delete=models.CASCADE, related_name="stops")
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES)
+    duration = models.FloatField(help_text="Seconds from stop request to exit")
+    exit_code = models.IntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.server_id} {self.outcome} ({self.duration:.1f}s)"
+
+    class Meta:
+        ordering = ["-created_at"]
+
+
+class WorldSnapshot(models.Model):
+    server = models.ForeignKey(
+        Server, on_delete=models.CASCADE, related_name="snapshots"
+    )
+    name = models.CharField(max_length=50)
+    path = models.CharField(max_length=500)
+    archived = models.BooleanField(default=False)
+    files = models.IntegerField(default=0)
+    size = models.BigIntegerField(default=0)
+    save_off_seconds = models.FloatField(
+        null=True, blank=True, help_text="Seconds world saving was paused"
+    )
+    duration = models.FloatField(help_text="Seconds the whole snapshot took")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.server_id} {self.name}"
+
+    class Meta:
+        ordering = ["-created_at"]
+
+
+class Job(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    server = models.ForeignKey(
+        Server, on_delete=models.CASCADE, null=True, blank=True, related_name="jobs"
+    )
+    host = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField()
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["host", "status", "run_after"])]
+
+
+class JobHostLock(models.Model):
+    """Row a runner locks while claiming a job of ``host``."""
+
+    host = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.host
+
+
 class ServerImage(models.Model):
     server = models.ForeignKey(Server, on_delete=models.CASCADE, related_name="images")
     image = models.ImageField(upload_to="servers/%Y/%m/%d/")
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import Server
+from .signals import server_status_changed
+from .slp import SlpError, ping
+
+logger = logging.getLogger(__name__)
+
+STATUS_FIELDS = ["is_online", "online_player", "max_players", "motd", "latency_ms"]
+
+
+class PollState:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.due = 0.0
+
+
+class StatusPoller:
+    """
+    Pings running servers with Server List Ping from one event loop and
+    writes status back with bulk_update, touching only rows that changed.
+
+    Each server has its own interval: it drops to STATUS_POLL_MIN_INTERVAL
+    when the server's status changes and grows by half up to
+    STATUS_POLL_MAX_INTERVAL while it stays the same.
+    """
+
+    def __init__(self):
+        self.min_interval = settings.STATUS_POLL_MIN_INTERVAL
+        self.max_interval = settings.STATUS_POLL_MAX_INTERVAL
+        self.timeout = settings.STATUS_POLL_TIMEOUT
+        self.host = settings.SERVER_PING_HOST
+        self._semaphore = asyncio.Semaphore(settings.STATUS_POLL_CONCURRENCY)
+        self._state = {}
+
+    async def run(self, tick: float = 1.0):
+        while True:
+            try:
+                await self.poll_once()
+            except Exception:
+                logger.exception("Status poll failed")
+            await asyncio.sleep(tick)
+
+    async def poll_once(self, force: bool = False) -> list:
+        """Poll every due server (all if ``force``); returns changed ids."""
+        servers = await sync_to_async(self._load)()
+        now = time.monotonic()
+
+        due = []
+        for server in servers:
+            state = self._state.setdefault(server.id, PollState(self.min_interval))
+            if server.is_running and (force or state.due <= now):
+                due.append(server)
+
+        results = await asyncio.gather(*(self._ping(s) for s in due))
+        status = {s.id: r for s, r in zip(due, results)}
+
+        changed = []
+        for server in servers:
+            if server.is_running:
+                if server.id not in status:
+                    continue
+                new = status[server.id]
+            else:
+                new = self.offline()
+
+            moved = self._apply(server, new)
+            if server.id in status:
+                self._reschedule(server.id, now, bool(moved))
+            if moved:
+                changed.append(server)
+
+        if changed:
+            await sync_to_async(self._save)(changed)
+        self._state = {s.id: self._state[s.id] for s in servers if s.id in self._state}
+        return [s.id for s in changed]
+
+    @staticmethod
+    def offline() -> dict:
+        return {
+            "is_online": False,
+            "online_player": 0,
+            "max_players": 0,
+            "motd": "",
+            "latency_ms": None,
+        }
+
+    async def _ping(self, server: Server) -> dict:
+        async with self._semaphore:
+            try:
+                result = await ping(self.host, server.port, self.timeout)
+            except SlpError:
+                return self.offline()
+
+        return {
+            "is_online": True,
+            "online_player": result["online"],
+            "max_players": result["max"],
+            "motd": result["motd"][:255],
+            "latency_ms": result["latency"],
+        }
+
+    def _apply(self, server: Server, new: dict) -> list:
+        """Copy ``new`` onto ``server``; returns the fields that changed."""
+        moved = []
+        for field in STATUS_FIELDS:
+            old = getattr(server, field)
+            value = new[field]
+            if field == "latency_ms" and old is not None and value is not None:
+                # latency jitters on every ping; only store real moves
+                if abs(old - value) < settings.STATUS_POLL_LATENCY_DELTA:
+                    continue
+            if old != value:
+                setattr(server, field, value)
+                moved.append(field)
+        return moved
+
+    def _reschedule(self, server_id: int, now: float, moved: bool):
+        state = self._state[server_id]
+        if moved:
+            state.interval = self.min_interval
+        else:
+            state.interval = min(state.interval * 1.5, self.max_interval)
+        state.due = now + state.interval
+
+    @staticmethod
+    def _load() -> list:
+        return list(
+            Server.objects.only("id", "port", "is_running", *STATUS_FIELDS)
+        )
+
+    @staticmethod
+    def _save(servers: list):
+        Server.objects.bulk_update(servers, STATUS_FIELDS, batch_size=200)
+        server_status_changed.send(sender=Server, server_ids=[s.id for s in servers])
@@ -0,0 +1,116 @@
+import random
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+
+from .models import PortAllocation, Server
+
+_synced_hosts = set()
+
+CLAIM_ATTEMPTS = 50
+
+
+class NoFreePort(Exception):
+    pass
+
+
+class _LostRace(Exception):
+    pass
+
+
+def port_ranges(host: str):
+    return settings.SERVER_PORT_RANGES.get(host, [])
+
+
+def sync_port_pool(host: Optional[str] = None):
+    host = host or settings.SERVER_HOST
+    wanted = {
+        port
+        for first, last in port_ranges(host)
+        for port in range(first, last + 1)
+    }
+    existing = set(
+        PortAllocation.objects.filter(host=host).values_list("port", flat=True)
+    )
+
+    with transaction.atomic():
+        PortAllocation.objects.bulk_create(
+            [PortAllocation(host=host, port=port) for port in wanted - existing],
+            ignore_conflicts=True,
+            batch_size=500,
+        )
+        PortAllocation.objects.filter(
+            host=host, server__isnull=True, port__in=existing - wanted
+        ).delete()
+
+        for server_id, port in Server.objects.filter(
+            port_allocation__isnull=True
+        ).values_list("id", "port"):
+            PortAllocation.objects.filter(
+                host=host, port=port, server__isnull=True
+            ).update(server_id=server_id)
+
+    _synced_hosts.add(host)
+
+
+def ensure_port_pool(host: Optional[str] = None):
+    host = host or settings.SERVER_HOST
+    if host not in _synced_hosts:
+        sync_port_pool(host)
+
+
+def free_slot(host: str, skip=()) -> PortAllocation:
+    slot = (
+        PortAllocation.objects.filter(host=host, server__isnull=True)
+        .exclude(id__in=skip)
+        .order_by("port")
+        .first()
+    )
+    if slot is None:
+        raise NoFreePort("No free ports available")
+    return slot
+
+
+def create_server(host: Optional[str] = None, **fields) -> Server:
+    """
+    Create a Server on the lowest free port of ``host``.
+
+    The port is claimed with a conditional UPDATE (only while the row is
+    still free) inside the transaction that inserts the server. Losing the
+    race to another worker, a port already used by a server outside the
+    pool, or SQLite's "database is locked" rolls back and tries again;
+    other integrity errors are raised.
+    """
+    host = host or settings.SERVER_HOST
+    ensure_port_pool(host)
+
+    skip = set()
+    for attempt in range(CLAIM_ATTEMPTS):
+        try:
+            slot = free_slot(host, skip)
+            with transaction.atomic():
+                # the INSERT comes first so SQLite takes its write lock
+                # before the slot row is touched
+                server = Server.objects.create(port=slot.port, **fields)
+                claimed = PortAllocation.objects.filter(
+                    id=slot.id, server__isnull=True
+                ).update(server=server)
+                if not claimed:
+                    raise _LostRace
+            return server
+        except _LostRace:
+            pass
+        except IntegrityError:
+            # only a taken port is worth another try; a duplicate uuid or
+            # rcon_port would fail the same way every time
+            if not Server.objects.filter(port=slot.port).exists():
+                raise
+            if PortAllocation.objects.filter(id=slot.id, server__isnull=True).exists():
+                skip.add(slot.id)
+        except OperationalError:
+            pass
+        time.sleep(random.uniform(0, 0.005 * (attempt + 1)))
+
+    raise NoFreePort("Could not claim a port: too much contention")
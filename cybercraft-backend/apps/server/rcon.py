@@ -0,0 +1,306 @@
+import asyncio
+import itertools
+import logging
+import secrets
+import socket
+import struct
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Q
+
+from .aio import background_loop
+from .models import Server
+from .ports import port_ranges
+
+logger = logging.getLogger(__name__)
+
+TYPE_RESPONSE = 0
+TYPE_COMMAND = 2
+TYPE_LOGIN = 3
+
+HEADER = struct.Struct("<iii")
+MAX_BODY = 1446
+
+# candidates tried after game port + RCON_PORT_OFFSET
+RCON_PORT_SEARCH = 100
+
+
+class RconError(Exception):
+    pass
+
+
+class RconAuthError(RconError):
+    pass
+
+
+def encode_packet(request_id: int, packet_type: int, body: str) -> bytes:
+    payload = body.encode("utf-8") + b"\x00\x00"
+    return HEADER.pack(len(payload) + 8, request_id, packet_type) + payload
+
+
+async def read_packet(reader: asyncio.StreamReader):
+    header = await reader.readexactly(HEADER.size)
+    length, request_id, packet_type = HEADER.unpack(header)
+    body = await reader.readexactly(length - 8)
+    return request_id, packet_type, body[:-2].decode("utf-8", errors="replace")
+
+
+class RconConnection:
+    """
+    One authenticated RCON connection with pipelined requests.
+
+    Every command is followed by an empty marker packet. Servers answer in
+    order and split long output over several packets, so the marker's
+    reply tells where a command's output ends. Several commands can be in
+    flight at once.
+    """
+
+    def __init__(self, host: str, port: int, password: str, timeout: float = 5):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self._ids = itertools.count(2, 2)
+        self._pending = {}
+        self._write_lock = asyncio.Lock()
+        self._reader_task = None
+        self.closed = True
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+
+        self.writer.write(encode_packet(1, TYPE_LOGIN, self.password))
+        await self.writer.drain()
+        while True:
+            request_id, packet_type, _ = await asyncio.wait_for(
+                read_packet(self.reader), self.timeout
+            )
+            if packet_type == TYPE_COMMAND:
+                break
+        if request_id == -1:
+            self.writer.close()
+            raise RconAuthError("RCON authentication failed")
+
+        self.closed = False
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+    async def command(self, command: str, timeout: float = None) -> str:
+        if self.closed:
+            raise RconError("RCON connection is closed")
+        if len(command.encode("utf-8")) > MAX_BODY:
+            raise RconError("Command is too long")
+
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = (future, [])
+
+        try:
+            async with self._write_lock:
+                self.writer.write(
+                    encode_packet(request_id, TYPE_COMMAND, command)
+                    + encode_packet(request_id + 1, TYPE_RESPONSE, "")
+                )
+                await self.writer.drain()
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        except (ConnectionError, OSError) as e:
+            await self.close()
+            raise RconError(str(e)) from e
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def close(self):
+        self.closed = True
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if self.writer is not None:
+            self.writer.close()
+        self._fail_pending(RconError("RCON connection closed"))
+
+    def _fail_pending(self, exc):
+        for future, _ in self._pending.values():
+            if not future.done():
+                future.set_exception(exc)
+
+    async def _read_loop(self):
+        try:
+            while True:
+                request_id, _, body = await read_packet(self.reader)
+                if request_id in self._pending:
+                    self._pending[request_id][1].append(body)
+                elif request_id - 1 in self._pending:
+                    future, parts = self._pending[request_id - 1]
+                    if not future.done():
+                        future.set_result("".join(parts))
+        except (asyncio.IncompleteReadError, ConnectionError, OSError):
+            self.closed = True
+            self._fail_pending(RconError("RCON connection lost"))
+
+
+class RconPool:
+    """
+    Persistent connection per server, opened on first use and reopened
+    after it drops. Pipelining lets one connection serve concurrent callers.
+    """
+
+    def __init__(self):
+        self._connections = {}
+        self._locks = {}
+
+    async def connection(self, server_id: int) -> RconConnection:
+        conn = self._connections.get(server_id)
+        if conn is not None and not conn.closed:
+            return conn
+
+        lock = self._locks.setdefault(server_id, asyncio.Lock())
+        async with lock:
+            conn = self._connections.get(server_id)
+            if conn is not None and not conn.closed:
+                return conn
+
+            port, password = await sync_to_async(self._credentials)(server_id)
+            conn = RconConnection(
+                settings.RCON_HOST, port, password, timeout=settings.RCON_TIMEOUT
+            )
+            try:
+                await conn.connect()
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                raise RconError(f"Could not connect to RCON: {e}") from e
+            self._connections[server_id] = conn
+            return conn
+
+    async def command(self, server_id: int, command: str, timeout=None) -> str:
+        for attempt in range(2):
+            conn = await self.connection(server_id)
+            try:
+                return await conn.command(command, timeout)
+            except RconError:
+                # the server may have restarted; reconnect once
+                if attempt or not conn.closed:
+                    raise
+
+    async def broadcast(self, server_ids, command: str, timeout=None) -> dict:
+        results = await asyncio.gather(
+            *(self.command(sid, command, timeout) for sid in server_ids),
+            return_exceptions=True,
+        )
+        return dict(zip(server_ids, results))
+
+    async def discard(self, server_id: int):
+        conn = self._connections.pop(server_id, None)
+        if conn is not None:
+            await conn.close()
+
+    @staticmethod
+    def _credentials(server_id: int):
+        row = (
+            Server.objects.filter(id=server_id)
+            .values_list("rcon_port", "rcon_password")
+            .first()
+        )
+        if row is None or not row[0] or not row[1]:
+            raise RconError("RCON is not configured for this server")
+        return row
+
+
+rcon_pool = RconPool()
+
+
+def _in_pool(port: int) -> bool:
+    return any(
+        low <= port <= high for low, high in port_ranges(settings.SERVER_HOST)
+    )
+
+
+def _can_bind(port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        # the JVM sets SO_REUSEADDR as well, so TIME_WAIT is not a conflict
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind((settings.RCON_HOST, port))
+        except OSError:
+            return False
+    return True
+
+
+def _taken(server: Server, port: int) -> bool:
+    """Whether ``port`` is a game port or another server's RCON port."""
+    return (
+        _in_pool(port)
+        or Server.objects.filter(Q(port=port) | Q(rcon_port=port))
+        .exclude(id=server.id)
+        .exists()
+    )
+
+
+def reserve_rcon_port(server: Server):
+    """
+    Pick an RCON port for ``server``, starting at game port +
+    RCON_PORT_OFFSET. Ports of the game port pool, ports used by other
+    servers and ports something else on the host listens on are skipped;
+    the unique ``rcon_port`` column settles concurrent picks. Returns None
+    when no port is free.
+    """
+    start = server.port + settings.RCON_PORT_OFFSET
+    for port in range(start, min(start + RCON_PORT_SEARCH, 65536)):
+        if _taken(server, port) or not _can_bind(port):
+            continue
+        try:
+            Server.objects.filter(id=server.id).update(rcon_port=port)
+        except IntegrityError:
+            continue
+        server.rcon_port = port
+        return port
+    return None
+
+
+def rcon_properties(server: Server) -> dict:
+    """
+    server.properties entries enabling RCON; generates credentials once
+    and moves the port when it collides with something else. The server
+    must be stopped.
+    """
+    if not server.rcon_password:
+        server.rcon_password = secrets.token_urlsafe(24)
+        Server.objects.filter(id=server.id).update(rcon_password=server.rcon_password)
+
+    port = server.rcon_port
+    if not port or _taken(server, port) or not _can_bind(port):
+        port = reserve_rcon_port(server)
+    if port is None:
+        logger.error(
+            "No free RCON port for server %s in %d-%d; RCON is disabled",
+            server.id,
+            server.port + settings.RCON_PORT_OFFSET,
+            server.port + settings.RCON_PORT_OFFSET + RCON_PORT_SEARCH - 1,
+        )
+        server.rcon_port = None
+        Server.objects.filter(id=server.id).update(rcon_port=None)
+        return {"enable-rcon": "false"}
+
+    return {
+        "enable-rcon": "true",
+        "rcon.port": port,
+        "rcon.password": server.rcon_password,
+        "broadcast-rcon-to-ops": "false",
+    }
+
+
+def run_command(server_id: int, command: str, timeout: float = None) -> str:
+    timeout = timeout or settings.RCON_TIMEOUT
+    return background_loop.run(
+        rcon_pool.command(server_id, command, timeout), timeout * 3 + 5
+    )
+
+
+def broadcast_command(server_ids, command: str, timeout: float = None) -> dict:
+    timeout = timeout or settings.RCON_TIMEOUT
+    return background_loop.run(
+        rcon_pool.broadcast(list(server_ids), command, timeout), timeout * 3 + 5
+    )
@@ -20,6 +20,8 @@ class ServerSerializer(serializers.ModelSerializer):
             "description",
             "repo",
             "version",
+            "log_retention_days",
+            "log_retention_mb",
             "created_at",
             "updated_at",
             "images",
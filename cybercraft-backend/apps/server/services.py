@@ -1,15 +1,23 @@
-import os
 import subprocess
-import time
 from pathlib import Path
 from typing import Optional
-import json
 
-from django.contrib.auth import get_user_model
-from django.db import close_old_connections
+from django.conf import settings
 
+from .admission import Overcommit, admission
+from .access import ops_document, whitelist_document, write_if_changed
+from .artifacts import artifact_store
+from .fsutil import clone_file
+from .installs import install_templates
+from .jobs import enqueue, stage
+from .models import Job, Server
+from .rcon import rcon_properties
 from .utils import ws_log
-from .models import Server
+from .supervisor import start_process, stop_process, wait_process
+
+
+class ProvisionError(Exception):
+    pass
 
 
 def get_java_major_version() -> Optional[int]:
@@ -40,26 +48,20 @@ def run_installer_and_wait(
 ) -> bool:
     ws_log(server_id, f"[Installer] Starting installer: {installer_jar.name}")
 
-    proc = subprocess.Popen(
+    start_process(
+        server_id,
         ["java", "-jar", str(installer_jar), "--installServer"],
-        cwd=server_dir,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        bufsize=1,
+        server_dir,
+        kind="installer",
+        prefix="[Installer]",
     )
 
-    start = time.time()
-
-    for raw in proc.stdout:
-        line = raw.decode("utf-8", errors="ignore").rstrip()
-        ws_log(server_id, f"[Installer] {line}")
+    code = wait_process(server_id, timeout)
+    if code is None:
+        stop_process(server_id)
+        ws_log(server_id, "[Error] Installer timeout exceeded")
+        return False
 
-        if time.time() - start > timeout:
-            proc.kill()
-            ws_log(server_id, "[Error] Installer timeout exceeded")
-            return False
-
-    code = proc.wait()
     if code == 0:
         ws_log(server_id, "[Installer] Completed successfully")
         return True
@@ -75,7 +77,8 @@ def restart_with_fixed_port(
 ) -> int:
     ws_log(server_id, f"[Server] Starting: {jar_path.name}")
 
-    proc = subprocess.Popen(
+    return start_process(
+        server_id,
         [
             "java",
             f"-Xmx{ram_mb}M",
@@ -84,74 +87,22 @@ def restart_with_fixed_port(
             str(jar_path),
             "nogui",
         ],
-        cwd=jar_path.parent,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        bufsize=1,
+        jar_path.parent,
     )
 
-    def stream():
-        close_old_connections()
-        for raw in proc.stdout:
-            line = raw.decode("utf-8", errors="ignore").rstrip()
-            ws_log(server_id, f"[Server] {line}")
-
-    import threading
-
-    threading.Thread(target=stream, daemon=True).start()
-
-    ws_log(server_id, f"[Server] Process started (PID={proc.pid})")
-    return proc.pid
-
-
-def terminate_process(pid: int):
-    try:
-        if os.name == "nt":
-            subprocess.call(
-                ["taskkill", "/F", "/PID", str(pid)],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-        else:
-            os.kill(pid, 9)
-    except Exception:
-        pass
-
 
 def accept_eula(server_dir: Path):
     (server_dir / "eula.txt").write_text("eula=true\n", encoding="utf-8")
 
 
 def write_whitelist(server_dir: Path, server_id: int):
-    User = get_user_model()
-    entries = [{"uuid": str(u.uuid), "name": u.username} for u in User.objects.all()]
-
-    (server_dir / "whitelist.json").write_text(
-        json.dumps(entries, indent=2),
-        encoding="utf-8",
-    )
-
-    ws_log(server_id, f"[Whitelist] {len(entries)} users synced")
+    write_if_changed(server_dir / "whitelist.json", whitelist_document())
+    ws_log(server_id, "[Whitelist] Users synced")
 
 
 def write_ops(server_dir: Path, server_id: int):
-    User = get_user_model()
-    entries = [
-        {
-            "uuid": str(u.uuid),
-            "name": u.username,
-            "level": 4,
-            "bypassesPlayerLimit": True,
-        }
-        for u in User.objects.filter(is_staff=True)
-    ]
-
-    (server_dir / "ops.json").write_text(
-        json.dumps(entries, indent=2),
-        encoding="utf-8",
-    )
-
-    ws_log(server_id, f"[Ops] {len(entries)} users written")
+    write_if_changed(server_dir / "ops.json", ops_document())
+    ws_log(server_id, "[Ops] Admins written")
 
 
 def smart_update_properties(path: Path, updates: dict):
@@ -170,15 +121,12 @@ def smart_update_properties(path: Path, updates: dict):
             f.write(f"{k}={v}\n")
 
 
-def create_server_full(
-    server_id: int,
-    server_dir: Path,
-    server_type: str,
-    version: str,
-    jar_url: str,
-    port: int,
-    ram: int,
-):
+def create_server_full(server: Server, jar_url: str, sha256: Optional[str] = None):
+    server_id = server.id
+    server_dir = Path(server.path)
+    port = server.port
+    ram = server.ram
+
     ws_log(server_id, "[Info] Server yaratish boshlandi")
 
     server_dir.mkdir(parents=True, exist_ok=True)
@@ -186,29 +134,42 @@ def create_server_full(
     filename = jar_url.split("/")[-1]
     jar_path = server_dir / filename
 
-    ws_log(server_id, f"[Download] {filename}")
-    import requests
+    cached = artifact_store.lookup(jar_url, sha256) is not None
+    ws_log(server_id, f"[Download] {filename}" + (" (cached)" if cached else ""))
 
-    with requests.get(jar_url, stream=True) as r:
-        r.raise_for_status()
-        with open(jar_path, "wb") as fh:
-            for chunk in r.iter_content(1024 * 32):
-                if chunk:
-                    fh.write(chunk)
+    with stage("download"):
+        artifact = artifact_store.fetch(
+            jar_url,
+            sha256,
+            on_progress=lambda msg: ws_log(server_id, f"[Download] {msg}"),
+        )
 
     ws_log(server_id, "[Download] Completed")
 
     is_installer = "installer" in filename.lower()
 
     if is_installer:
-        ok = run_installer_and_wait(jar_path, server_dir, server_id)
-        if not ok:
-            return
+        key = install_templates.key(server.loader, server.version, artifact.name)
+        with stage("install"):
+            template = install_templates.ensure(
+                key,
+                artifact,
+                lambda jar, cwd: run_installer_and_wait(jar, cwd, server_id),
+            )
+        if template is None:
+            raise ProvisionError("Installer failed")
+
+        with stage("disk"):
+            install_templates.clone_into(template, server_dir)
+        ws_log(server_id, f"[Installer] Template {key} applied")
 
         jars = [
             p for p in server_dir.rglob("*.jar") if "installer" not in p.name.lower()
         ]
         jar_path = jars[0]
+    else:
+        with stage("disk"):
+            clone_file(artifact, jar_path)
 
     accept_eula(server_dir)
 
@@ -220,17 +181,82 @@ def create_server_full(
             "online-mode": "false",
             "white-list": "true",
             "motd": f"Server {server_id}",
+            **rcon_properties(server),
         },
     )
 
     write_whitelist(server_dir, server_id)
     write_ops(server_dir, server_id)
 
-    pid = restart_with_fixed_port(jar_path, ram, server_id)
-
-    srv = Server.objects.get(id=server_id)
-    srv.pid = pid
-    srv.is_running = True
-    srv.save()
+    try:
+        with admission.admit(server):
+            restart_with_fixed_port(jar_path, ram, server_id)
+    except Overcommit as e:
+        queue_start(server, str(e))
+        return
 
     ws_log(server_id, "[Info] Server fully ready")
+
+
+def start_server(server: Server) -> int:
+    """Start an installed server if the host has room for it (Overcommit)."""
+    jars = list(Path(server.path).glob("*.jar"))
+    if not jars:
+        raise ProvisionError("Server jar not found")
+
+    with admission.admit(server):
+        smart_update_properties(
+            Path(server.path) / "server.properties", rcon_properties(server)
+        )
+        return restart_with_fixed_port(jars[0], server.ram, server.id)
+
+
+def queue_start(server: Server, reason: str) -> Job:
+    """Retry the start in the background until the host has room."""
+    ws_log(server.id, f"[Server] Start queued: {reason}")
+    return enqueue(
+        "start_server",
+        server=server,
+        max_attempts=settings.ADMISSION_QUEUE_ATTEMPTS,
+    )
+
+
+def queue_stop(server: Server, graceful: bool = True) -> Job:
+    """Stop in the background; a graceful stop can take over a minute."""
+    pending = server.jobs.filter(
+        kind="stop_server", status__in=[Job.QUEUED, Job.RUNNING]
+    ).first()
+    if pending:
+        return pending
+    return enqueue("stop_server", payload={"graceful": graceful}, server=server)
+
+
+def stop_server_job(job: Job):
+    """Job handler for "stop_server"."""
+    server = Server.objects.get(id=job.server_id)
+    if not server.is_running or not server.pid:
+        return
+
+    result = stop_process(
+        server.id, server.pid, graceful=job.payload.get("graceful", True)
+    )
+    ws_log(
+        server.id,
+        f"[Server] Stopped ({result['outcome']}, {result['duration']:.1f}s)",
+    )
+
+
+def provision_server(job: Job):
+    """Job handler for "create_server"."""
+    create_server_full(
+        server=Server.objects.get(id=job.server_id),
+        jar_url=job.payload["jar_url"],
+        sha256=job.payload.get("sha256"),
+    )
+
+
+def start_server_job(job: Job):
+    """Job handler for "start_server"; Overcommit makes it retry later."""
+    server = Server.objects.get(id=job.server_id)
+    if not server.is_running:
+        start_server(server)
@@ -0,0 +1,18 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .access import access_sync
+
+# Sent with ``server_ids`` when servers' status changes through queryset
+# updates, which do not fire post_save.
+server_status_changed = Signal()
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # logins only touch last_login, which is not in the access lists
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    transaction.on_commit(access_sync.schedule)
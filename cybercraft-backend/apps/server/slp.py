@@ -0,0 +1,148 @@
+import asyncio
+import json
+import struct
+import time
+
+PROTOCOL_VERSION = -1  # "any": servers answer status requests regardless
+
+
+class SlpError(Exception):
+    pass
+
+
+def encode_varint(value: int) -> bytes:
+    value &= 0xFFFFFFFF
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+async def read_varint(reader: asyncio.StreamReader) -> int:
+    result = 0
+    for shift in range(0, 35, 7):
+        byte = (await reader.readexactly(1))[0]
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            if result & 0x80000000:
+                result -= 1 << 32
+            return result
+    raise SlpError("VarInt is too long")
+
+
+def encode_string(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return encode_varint(len(data)) + data
+
+
+def encode_packet(packet_id: int, payload: bytes = b"") -> bytes:
+    body = encode_varint(packet_id) + payload
+    return encode_varint(len(body)) + body
+
+
+async def read_packet(reader: asyncio.StreamReader):
+    length = await read_varint(reader)
+    if length <= 0 or length > 1 << 21:
+        raise SlpError(f"Bad packet length {length}")
+    data = await reader.readexactly(length)
+    packet_id, pos = decode_varint(data)
+    return packet_id, data[pos:]
+
+
+def decode_varint(data: bytes, pos: int = 0):
+    """Decode a VarInt at ``pos``; returns (value, position after it)."""
+    value = 0
+    for shift in range(0, 35, 7):
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+    raise SlpError("VarInt is too long")
+
+
+def decode_string(data: bytes) -> str:
+    length, pos = decode_varint(data)
+    return data[pos:pos + length].decode("utf-8", errors="replace")
+
+
+def motd_text(description) -> str:
+    """Flatten a chat component (or plain string) description to text."""
+    if isinstance(description, str):
+        return description
+    if not isinstance(description, dict):
+        return ""
+    text = description.get("text", "")
+    for extra in description.get("extra", []):
+        text += motd_text(extra)
+    return text
+
+
+async def ping(host: str, port: int, timeout: float = 2) -> dict:
+    """
+    Query a server with the Server List Ping protocol (1.7+).
+
+    Returns online/max players, MOTD, version name and round-trip latency
+    in milliseconds (measured with the ping/pong exchange).
+    """
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port), timeout
+        )
+    except (OSError, asyncio.TimeoutError) as e:
+        raise SlpError(f"connect failed: {e}") from e
+
+    try:
+        handshake = (
+            encode_varint(PROTOCOL_VERSION)
+            + encode_string(host)
+            + struct.pack(">H", port)
+            + encode_varint(1)
+        )
+        writer.write(encode_packet(0x00, handshake) + encode_packet(0x00))
+        await writer.drain()
+
+        packet_id, data = await asyncio.wait_for(read_packet(reader), timeout)
+        if packet_id != 0x00:
+            raise SlpError(f"Unexpected packet {packet_id:#x}")
+        status = json.loads(decode_string(data))
+        if not isinstance(status, dict):
+            raise SlpError("Status is not a JSON object")
+
+        token = time.monotonic_ns() & 0x7FFFFFFFFFFFFFFF
+        sent = time.perf_counter()
+        writer.write(encode_packet(0x01, struct.pack(">q", token)))
+        await writer.drain()
+        try:
+            packet_id, data = await asyncio.wait_for(read_packet(reader), timeout)
+            latency = (time.perf_counter() - sent) * 1000
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+            # some servers close instead of answering the ping
+            latency = None
+    except (
+        OSError,
+        ValueError,
+        IndexError,
+        asyncio.IncompleteReadError,
+        asyncio.TimeoutError,
+    ) as e:
+        raise SlpError(str(e) or type(e).__name__) from e
+    finally:
+        writer.close()
+
+    try:
+        players = status.get("players") or {}
+        return {
+            "online": int(players.get("online", 0)),
+            "max": int(players.get("max", 0)),
+            "motd": motd_text(status.get("description", "")),
+            "version": (status.get("version") or {}).get("name", ""),
+            "latency": None if latency is None else round(latency),
+        }
+    except (AttributeError, TypeError, ValueError) as e:
+        raise SlpError(f"Malformed status: {e}") from e
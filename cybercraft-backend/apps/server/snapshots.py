@@ -0,0 +1,205 @@
+import logging
+import os
+import re
+import shutil
+import tarfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+
+from .fsutil import clone_file
+from .logsink import log_sink, server_log_path
+from .logtail import read_forward
+from .models import Job, Server, WorldSnapshot
+from .rcon import RconError, run_command
+from .supervisor import SupervisorError, send_input
+from .utils import ws_log
+
+logger = logging.getLogger(__name__)
+
+SAVED_RE = re.compile(r"Saved the (game|world)")
+
+_slots = threading.BoundedSemaphore(settings.WORLD_SNAPSHOT_CONCURRENCY)
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def world_dirs(server_dir: Path) -> list:
+    """Top-level directories holding a level.dat (world, world_nether, ...)."""
+    return sorted(
+        p for p in Path(server_dir).iterdir() if p.is_dir() and (p / "level.dat").exists()
+    )
+
+
+def console_command(server_id: int, command: str, wait_saved: bool = False):
+    """
+    Run a console command, over RCON when possible (the reply arrives once
+    the command has finished) or else on stdin. On stdin, ``wait_saved``
+    waits for the "Saved the game" line in the server log.
+    """
+    try:
+        run_command(server_id, command, timeout=settings.WORLD_SNAPSHOT_SAVE_TIMEOUT)
+        return
+    except (RconError, TimeoutError):
+        pass
+
+    log_file = server_log_path(
+        Server.objects.values_list("path", flat=True).get(id=server_id)
+    )
+    log_sink.flush(server_id)
+    offset = log_file.stat().st_size if log_file.exists() else 0
+
+    try:
+        send_input(server_id, command)
+    except SupervisorError as e:
+        raise SnapshotError(f"Cannot reach the server console: {e}") from e
+
+    if not wait_saved:
+        return
+
+    deadline = time.monotonic() + settings.WORLD_SNAPSHOT_SAVE_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(0.2)
+        log_sink.flush(server_id)
+        if not log_file.exists():
+            continue
+        chunk = read_forward(log_file, offset, limit=1000, match=SAVED_RE.search)
+        if chunk["logs"]:
+            return
+        offset = chunk["end"]
+    raise SnapshotError("Timed out waiting for the world save")
+
+
+def sync_tree(src: Path, dst: Path, seen: dict) -> int:
+    """
+    Make ``dst`` mirror ``src``, copying only files whose size or mtime
+    differs from the last pass (``seen``). Returns the number copied.
+
+    Never hardlinks: the server rewrites region files in place, which would
+    change the snapshot too.
+    """
+    copied = 0
+    present = set()
+    for root, _, names in os.walk(src):
+        root = Path(root)
+        target_dir = dst / root.relative_to(src)
+        target_dir.mkdir(parents=True, exist_ok=True)
+
+        for name in names:
+            path = root / name
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+
+            rel = str(path.relative_to(src))
+            present.add(rel)
+            key = (st.st_size, st.st_mtime_ns)
+            if seen.get(rel) == key:
+                continue
+
+            clone_file(path, target_dir / name, allow_hardlink=False)
+            seen[rel] = key
+            copied += 1
+
+    for rel in set(seen) - present:
+        (dst / rel).unlink(missing_ok=True)
+        del seen[rel]
+    return copied
+
+
+def write_tar(src: Path, dst: Path, arcname: str):
+    tmp = dst.with_name(dst.name + ".partial")
+    with open(tmp, "wb", buffering=1024 * 1024) as fh:
+        with tarfile.open(fileobj=fh, mode="w|", bufsize=1024 * 1024) as tar:
+            tar.add(src, arcname=arcname)
+    os.replace(tmp, dst)
+
+
+def snapshot_world(server: Server, archive: bool = False) -> WorldSnapshot:
+    """
+    Copy the server's worlds while it keeps running.
+
+    The worlds are copied once while the server still saves, then saving is
+    paused (save-off, save-all flush) only long enough to copy the files
+    that changed in between, and resumed with save-on.
+    """
+    server_dir = Path(server.path)
+    worlds = world_dirs(server_dir)
+    if not worlds:
+        raise SnapshotError("No world found")
+
+    name = datetime.now().strftime("%Y%m%d-%H%M%S")
+    base = Path(settings.WORLD_SNAPSHOTS_DIR) / str(server.id)
+    staging = base / f"{name}.partial"
+
+    with _slots:
+        started = time.monotonic()
+        try:
+            seen, window = _copy_worlds(server, worlds, staging)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    files = sum(len(s) for s in seen.values())
+    size = sum(size for s in seen.values() for size, _ in s.values())
+
+    if archive:
+        path = base / f"{name}.tar"
+        write_tar(staging, path, name)
+        shutil.rmtree(staging)
+    else:
+        path = base / name
+        os.replace(staging, path)
+
+    snapshot = WorldSnapshot.objects.create(
+        server=server,
+        name=name,
+        path=str(path),
+        archived=archive,
+        files=files,
+        size=size,
+        save_off_seconds=window,
+        duration=time.monotonic() - started,
+    )
+    ws_log(server.id, f"[Snapshot] {name} done ({files} files, {size} bytes)")
+    return snapshot
+
+
+def snapshot_job(job: Job):
+    """Job handler for "snapshot_world"."""
+    snapshot_world(
+        Server.objects.get(id=job.server_id),
+        archive=job.payload.get("archive", False),
+    )
+
+
+def _copy_worlds(server: Server, worlds: list, staging: Path):
+    seen = {w.name: {} for w in worlds}
+    for world in worlds:
+        sync_tree(world, staging / world.name, seen[world.name])
+
+    running = Server.objects.filter(id=server.id, is_running=True).exists()
+    if not running:
+        return seen, None
+
+    window_started = time.monotonic()
+    console_command(server.id, "save-off")
+    try:
+        console_command(server.id, "save-all flush", wait_saved=True)
+        changed = sum(sync_tree(w, staging / w.name, seen[w.name]) for w in worlds)
+    finally:
+        console_command(server.id, "save-on")
+    window = time.monotonic() - window_started
+
+    ws_log(
+        server.id,
+        f"[Snapshot] Saving paused {window * 1000:.0f} ms "
+        f"({changed} files copied while paused)",
+    )
+    return seen, window
@@ -0,0 +1,396 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import psutil
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .aio import background_loop
+from .logsink import log_sink
+from .models import Server, ServerStop
+from .rcon import RconError, rcon_pool
+from .signals import server_status_changed
+
+logger = logging.getLogger(__name__)
+
+SUPERVISOR_CHANNEL = getattr(settings, "SUPERVISOR_CHANNEL", "")
+
+STREAM_LIMIT = 1024 * 1024
+
+
+class SupervisorError(Exception):
+    pass
+
+
+def wait_pid(pid: int, timeout: float) -> bool:
+    """Wait for a process we did not start to exit; True if it did."""
+    try:
+        psutil.Process(pid).wait(timeout)
+    except psutil.NoSuchProcess:
+        return True
+    except psutil.TimeoutExpired:
+        return False
+    return True
+
+
+def terminate_process(pid: int, timeout: float = None) -> str:
+    """SIGTERM ``pid``, then SIGKILL it if it is still alive after ``timeout``."""
+    timeout = settings.SERVER_TERM_TIMEOUT if timeout is None else timeout
+    try:
+        proc = psutil.Process(pid)
+        proc.terminate()
+        if wait_pid(pid, timeout):
+            return ServerStop.TERMINATED
+        proc.kill()
+        proc.wait(timeout)
+    except (psutil.NoSuchProcess, psutil.TimeoutExpired):
+        pass
+    except psutil.AccessDenied:
+        logger.warning("Not allowed to terminate process %s", pid)
+    return ServerStop.KILLED
+
+
+class ManagedProcess:
+    def __init__(self, server_id: int, kind: str, prefix: str, proc):
+        self.server_id = server_id
+        self.kind = kind
+        self.prefix = prefix
+        self.proc = proc
+        self.task = None
+
+    @property
+    def pid(self) -> int:
+        return self.proc.pid
+
+
+class ProcessSupervisor:
+    """
+    Owns every JVM and installer process of this host on one event loop.
+
+    Output of all processes is pumped into the log sink and ``Server.pid`` /
+    ``Server.is_running`` follow the real process state.
+    """
+
+    def __init__(self):
+        self.processes = {}
+        self.exit_codes = {}
+        self._ready = False
+
+    async def handle(self, message: dict) -> dict:
+        if not self._ready:
+            await self.reconcile()
+
+        action = message.get("action")
+        try:
+            if action == "start":
+                pid = await self.start(
+                    message["server_id"],
+                    message["argv"],
+                    message["cwd"],
+                    kind=message.get("kind", "server"),
+                    prefix=message.get("prefix", "[Server]"),
+                )
+                return {"pid": pid}
+
+            if action == "stop":
+                return await self.stop(
+                    message["server_id"],
+                    message.get("pid"),
+                    graceful=message.get("graceful", True),
+                )
+
+            if action == "stop_all":
+                return {
+                    "results": await self.stop_all(
+                        message["servers"], graceful=message.get("graceful", True)
+                    )
+                }
+
+            if action == "input":
+                await self.send_input(message["server_id"], message["line"])
+                return {}
+
+            if action == "wait":
+                code = await self.wait(message["server_id"], message.get("timeout"))
+                return {"code": code}
+
+            if action == "status":
+                return {
+                    "processes": {
+                        str(sid): {"pid": m.pid, "kind": m.kind}
+                        for sid, m in self.processes.items()
+                    }
+                }
+        except SupervisorError as e:
+            return {"error": str(e)}
+        except Exception as e:
+            logger.exception("Supervisor %s failed", action)
+            return {"error": str(e)}
+
+        return {"error": f"Unknown action: {action}"}
+
+    async def start(self, server_id, argv, cwd, kind="server", prefix="[Server]"):
+        if server_id in self.processes:
+            raise SupervisorError("Process already running")
+
+        await sync_to_async(log_sink.open)(server_id)
+
+        proc = await asyncio.create_subprocess_exec(
+            *argv,
+            cwd=cwd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            limit=STREAM_LIMIT,
+        )
+
+        managed = ManagedProcess(server_id, kind, prefix, proc)
+        self.processes[server_id] = managed
+        self.exit_codes.pop(server_id, None)
+
+        if kind == "server":
+            await sync_to_async(self._mark_running)(server_id, proc.pid)
+
+        managed.task = asyncio.create_task(self._pump(managed))
+        log_sink.write(server_id, f"{prefix} Process started (PID={proc.pid})")
+        return proc.pid
+
+    async def stop(self, server_id, pid: Optional[int] = None, graceful=True) -> dict:
+        """
+        Stop a server: ``save-all flush`` and ``stop`` on its console (stdin,
+        or RCON for a process this supervisor did not start), then SIGTERM
+        after SERVER_STOP_TIMEOUT and SIGKILL after SERVER_TERM_TIMEOUT.
+        """
+        started = time.monotonic()
+        managed = self.processes.get(server_id)
+        exit_code = None
+
+        if managed is not None:
+            outcome = await self._stop_managed(managed, graceful)
+            exit_code = self.exit_codes.get(server_id)
+        elif pid:
+            outcome = await self._stop_foreign(server_id, pid, graceful)
+            await sync_to_async(self._mark_stopped)(server_id, pid)
+        else:
+            await sync_to_async(self._mark_stopped)(server_id, pid)
+            return {"outcome": None, "duration": 0}
+
+        duration = time.monotonic() - started
+        if managed is None or managed.kind == "server":
+            await sync_to_async(ServerStop.objects.create)(
+                server_id=server_id,
+                outcome=outcome,
+                duration=duration,
+                exit_code=exit_code,
+            )
+        return {"outcome": outcome, "duration": duration, "exit_code": exit_code}
+
+    async def stop_all(self, servers, graceful=True) -> dict:
+        """Stop ``servers`` ((server_id, pid) pairs) in parallel."""
+        results = await asyncio.gather(
+            *(self.stop(sid, pid, graceful) for sid, pid in servers),
+            return_exceptions=True,
+        )
+        return {
+            str(sid): {"error": str(r)} if isinstance(r, Exception) else r
+            for (sid, _), r in zip(servers, results)
+        }
+
+    async def _stop_managed(self, managed: ManagedProcess, graceful: bool) -> str:
+        proc = managed.proc
+        if graceful and managed.kind == "server":
+            log_sink.write(managed.server_id, f"{managed.prefix} Saving and stopping")
+            try:
+                for line in ("save-all flush", "stop"):
+                    await self.send_input(managed.server_id, line)
+                await asyncio.wait_for(
+                    asyncio.shield(managed.task), settings.SERVER_STOP_TIMEOUT
+                )
+                return ServerStop.GRACEFUL
+            except (SupervisorError, asyncio.TimeoutError):
+                pass
+
+        if graceful:
+            try:
+                proc.terminate()
+                await asyncio.wait_for(
+                    asyncio.shield(managed.task), settings.SERVER_TERM_TIMEOUT
+                )
+                return ServerStop.TERMINATED
+            except ProcessLookupError:
+                pass
+            except asyncio.TimeoutError:
+                log_sink.write(
+                    managed.server_id, f"{managed.prefix} Not responding, killing"
+                )
+
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+        await managed.task
+        return ServerStop.KILLED
+
+    async def _stop_foreign(self, server_id, pid: int, graceful: bool) -> str:
+        if graceful:
+            try:
+                await rcon_pool.command(server_id, "save-all flush")
+                await rcon_pool.command(server_id, "stop")
+                if await asyncio.to_thread(wait_pid, pid, settings.SERVER_STOP_TIMEOUT):
+                    return ServerStop.GRACEFUL
+            except (RconError, asyncio.TimeoutError):
+                pass
+            finally:
+                await rcon_pool.discard(server_id)
+
+        timeout = settings.SERVER_TERM_TIMEOUT if graceful else 0
+        return await asyncio.to_thread(terminate_process, pid, timeout)
+
+    async def send_input(self, server_id, line: str):
+        managed = self.processes.get(server_id)
+        if managed is None or managed.proc.stdin is None:
+            raise SupervisorError("Process is not managed by this supervisor")
+
+        managed.proc.stdin.write(line.encode("utf-8") + b"\n")
+        try:
+            await managed.proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            raise SupervisorError("Process stdin is closed")
+
+    async def wait(self, server_id, timeout=None) -> Optional[int]:
+        managed = self.processes.get(server_id)
+        if managed is None:
+            return self.exit_codes.get(server_id)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(managed.task), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self.exit_codes.get(server_id)
+
+    async def reconcile(self):
+        self._ready = True
+        await sync_to_async(self._reconcile)()
+
+    async def _pump(self, managed: ManagedProcess):
+        stdout = managed.proc.stdout
+        while True:
+            try:
+                raw = await stdout.readline()
+            except ValueError:
+                continue
+            if not raw:
+                break
+            line = raw.decode("utf-8", errors="ignore").rstrip()
+            log_sink.write(managed.server_id, f"{managed.prefix} {line}")
+
+        code = await managed.proc.wait()
+        self.exit_codes[managed.server_id] = code
+        self.processes.pop(managed.server_id, None)
+
+        log_sink.write(
+            managed.server_id, f"{managed.prefix} Process exited (code={code})"
+        )
+        if managed.kind == "server":
+            await sync_to_async(self._mark_stopped)(managed.server_id, managed.pid)
+            await sync_to_async(log_sink.close)(managed.server_id)
+
+    @staticmethod
+    def _mark_running(server_id, pid):
+        Server.objects.filter(id=server_id).update(pid=pid, is_running=True)
+        server_status_changed.send(sender=Server, server_ids=[server_id])
+
+    @staticmethod
+    def _mark_stopped(server_id, pid):
+        qs = Server.objects.filter(id=server_id)
+        if pid:
+            qs = qs.filter(pid=pid)
+        if qs.update(pid=None, is_running=False):
+            server_status_changed.send(sender=Server, server_ids=[server_id])
+
+    def _reconcile(self):
+        owned = {m.pid for m in self.processes.values()}
+        for server_id, pid in Server.objects.filter(is_running=True).values_list(
+            "id", "pid"
+        ):
+            if pid in owned:
+                continue
+            if not pid or not psutil.pid_exists(pid):
+                self._mark_stopped(server_id, pid)
+
+
+supervisor = ProcessSupervisor()
+
+
+async def _channel_request(message: dict, timeout) -> dict:
+    layer = get_channel_layer()
+    reply_channel = await layer.new_channel()
+    await layer.send(
+        SUPERVISOR_CHANNEL,
+        {"type": "supervisor.command", "reply_channel": reply_channel, **message},
+    )
+    return await asyncio.wait_for(layer.receive(reply_channel), timeout)
+
+
+def call(message: dict, timeout: Optional[float] = 30) -> dict:
+    if SUPERVISOR_CHANNEL:
+        result = async_to_sync(_channel_request)(message, timeout)
+    else:
+        result = background_loop.run(supervisor.handle(message), timeout)
+
+    if result.get("error"):
+        raise SupervisorError(result["error"])
+    return result
+
+
+def start_process(server_id, argv, cwd, kind="server", prefix="[Server]") -> int:
+    return call(
+        {
+            "action": "start",
+            "server_id": server_id,
+            "argv": [str(a) for a in argv],
+            "cwd": str(cwd),
+            "kind": kind,
+            "prefix": prefix,
+        }
+    )["pid"]
+
+
+STOP_CALL_TIMEOUT = settings.SERVER_STOP_TIMEOUT + settings.SERVER_TERM_TIMEOUT + 30
+
+
+def stop_process(server_id, pid: Optional[int] = None, graceful=True) -> dict:
+    message = {
+        "action": "stop",
+        "server_id": server_id,
+        "pid": pid,
+        "graceful": graceful,
+    }
+    return call(message, timeout=STOP_CALL_TIMEOUT)
+
+
+def stop_all_processes(server_ids=None, graceful=True) -> dict:
+    """Stop all running servers (or ``server_ids``) in parallel."""
+    servers = Server.objects.filter(is_running=True)
+    if server_ids is not None:
+        servers = servers.filter(id__in=server_ids)
+
+    message = {
+        "action": "stop_all",
+        "servers": list(servers.values_list("id", "pid")),
+        "graceful": graceful,
+    }
+    return call(message, timeout=STOP_CALL_TIMEOUT)["results"]
+
+
+def send_input(server_id, line: str):
+    """Write ``line`` to the console (stdin) of a running server."""
+    call({"action": "input", "server_id": server_id, "line": line}, timeout=10)
+
+
+def wait_process(server_id, timeout: float) -> Optional[int]:
+    message = {"action": "wait", "server_id": server_id, "timeout": timeout}
+    return call(message, timeout=timeout + 10)["code"]
@@ -1 +1,1291 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import json
+import os
+import random
+import socket
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+import requests
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.db import IntegrityError, close_old_connections
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from apps.modpacks.models import ModPack
+
+from . import access, admission, backups, logarchive, services, slp, transfer
+from .arcadia import ArcadiaManifestClient
+from .artifacts import ArtifactStore, ChecksumMismatch
+from .backups import MAX_CHUNK, BackupRepository
+from .installs import COMPLETE_MARKER, InstallTemplateStore
+from .jobs import HANDLERS, JobRunner, enqueue
+from .logbuffer import MemoryLogBuffer, replay
+from .logsink import LogSink, server_log_path
+from .models import Job, PortAllocation, Server, ServerStop
+from .ports import NoFreePort, _synced_hosts, create_server
+from .rcon import (
+    TYPE_COMMAND,
+    TYPE_LOGIN,
+    TYPE_RESPONSE,
+    RconAuthError,
+    RconConnection,
+    RconError,
+    encode_packet,
+    rcon_properties,
+    read_packet,
+)
+from .routing import websocket_urlpatterns
+from .supervisor import SupervisorError, start_process, stop_process
+from .views import ServerCreateAPIView
+
+
+def make_modpack():
+    return ModPack.objects.create(
+        name="pack", mc_version="1.20.1", loader="forge", path="/tmp/pack"
+    )
+
+
+@override_settings(
+    SERVER_HOST="test", SERVER_PORT_RANGES={"test": [(30000, 30199)]}
+)
+class PortAllocationTests(TransactionTestCase):
+    def setUp(self):
+        _synced_hosts.clear()
+        self.modpack = make_modpack()
+
+    def create(self, name):
+        return create_server(
+            name=name, version="1.20.1", path=f"/tmp/{name}", modpack=self.modpack
+        )
+
+    def test_lowest_free_port_is_reused(self):
+        first = self.create("a")
+        second = self.create("b")
+        self.assertEqual((first.port, second.port), (30000, 30001))
+
+        first.delete()
+        self.assertEqual(self.create("c").port, 30000)
+
+    def test_exhausted_range(self):
+        with self.settings(SERVER_PORT_RANGES={"test": [(30000, 30001)]}):
+            self.create("a")
+            self.create("b")
+            with self.assertRaises(NoFreePort):
+                self.create("c")
+
+    def test_port_used_outside_the_pool_is_skipped(self):
+        Server.objects.create(
+            name="legacy", version="1.20.1", port=30000, path="/tmp/legacy",
+            modpack=self.modpack,
+        )
+        self.assertEqual(self.create("a").port, 30001)
+
+    def test_other_integrity_errors_are_raised(self):
+        first = self.create("a")
+        with self.assertRaises(IntegrityError):
+            create_server(
+                name="b", version="1.20.1", path="/tmp/b", modpack=self.modpack,
+                uuid=first.uuid,
+            )
+        self.assertEqual(
+            PortAllocation.objects.filter(server__isnull=False).count(), 1
+        )
+
+    def test_concurrent_creates_get_distinct_ports(self):
+        errors = []
+
+        def worker(n):
+            try:
+                for i in range(10):
+                    self.create(f"s{n}-{i}")
+            except Exception as e:
+                errors.append(e)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        ports = list(Server.objects.values_list("port", flat=True))
+        self.assertEqual(len(ports), 80)
+        self.assertEqual(len(set(ports)), 80)
+        self.assertEqual(
+            PortAllocation.objects.filter(server__isnull=False).count(), 80
+        )
+
+
+class ServerAPITests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create_superuser(
+            **{User.USERNAME_FIELD: "admin"}, password="x"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.server = Server.objects.create(
+            name="logs", version="1.20.1", port=31000,
+            path="/nonexistent/logs", modpack=make_modpack(),
+        )
+
+    def test_bad_log_parameters_are_rejected(self):
+        url = f"/api/servers/{self.server.id}/logs/"
+        for query in ("limit=abc", "limit=-5", "limit=0", "before=-1", "wait=nan"):
+            with self.subTest(query=query):
+                response = self.client.get(f"{url}?{query}")
+                self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(f"{url}?limit=999999")
+        self.assertEqual(response.status_code, 200)
+
+    def test_bad_ram_is_rejected(self):
+        for ram in ("lots", "-1", "inf"):
+            with self.subTest(ram=ram):
+                request = APIRequestFactory().post(
+                    "/api/servers/create/",
+                    {"name": "x", "version": "1.20.1", "server_type": "vanilla",
+                     "modpack": 1, "ram": ram},
+                    format="json",
+                )
+                force_authenticate(request, self.admin)
+                response = ServerCreateAPIView.as_view()(request)
+                self.assertEqual(response.status_code, 400)
+
+    @override_settings(JOB_RUNNER="external")
+    def test_snapshot_is_queued_as_a_job(self):
+        response = self.client.post(
+            f"/api/servers/{self.server.id}/snapshots/", {"archive": True},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get(id=response.data["job_id"])
+        self.assertEqual(
+            (job.kind, job.server_id, job.payload),
+            ("snapshot_world", self.server.id, {"archive": True}),
+        )
+
+    def test_stop_is_queued_as_a_job(self):
+        Server.objects.filter(id=self.server.id).update(is_running=True, pid=4242)
+        url = f"/api/servers/{self.server.id}/control/stop/"
+
+        response = self.client.post(url, {"force": True}, format="json")
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get(id=response.data["job_id"])
+        self.assertEqual((job.kind, job.payload), ("stop_server", {"graceful": False}))
+        # a second click while the stop is pending reuses the job
+        self.assertEqual(self.client.post(url).data["job_id"], job.id)
+
+        stopped = {"outcome": "graceful", "duration": 1.0}
+        with mock.patch.object(services, "stop_process", return_value=stopped) as stop:
+            services.stop_server_job(job)
+        stop.assert_called_once_with(self.server.id, 4242, graceful=False)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@override_settings(
+    SERVER_HOST="test",
+    SERVER_PORT_RANGES={"test": [(30000, 30199)]},
+    RCON_HOST="127.0.0.1",
+)
+class RconPortTests(TestCase):
+    def setUp(self):
+        self.modpack = make_modpack()
+
+    def server(self, name, port, **fields):
+        return Server.objects.create(
+            name=name, version="1.20.1", port=port, path=f"/tmp/{name}",
+            modpack=self.modpack, **fields,
+        )
+
+    def test_pool_and_other_servers_are_skipped(self):
+        # game port + offset lands in the pool, then on another server's port
+        base = free_port()
+        with self.settings(
+            SERVER_PORT_RANGES={"test": [(base, base)]}, RCON_PORT_OFFSET=0
+        ):
+            self.server("other", base + 1, rcon_port=base + 2)
+            server = self.server("a", base)
+            properties = rcon_properties(server)
+
+        self.assertEqual(properties["enable-rcon"], "true")
+        self.assertNotIn(properties["rcon.port"], (base, base + 1, base + 2))
+        server.refresh_from_db()
+        self.assertEqual(server.rcon_port, properties["rcon.port"])
+
+    def test_port_in_use_on_host_is_moved(self):
+        with socket.socket() as busy:
+            busy.bind(("127.0.0.1", 0))
+            busy.listen()
+            port = busy.getsockname()[1]
+            server = self.server("a", port - 10000, rcon_port=port)
+            properties = rcon_properties(server)
+
+        self.assertNotEqual(properties["rcon.port"], port)
+        self.assertEqual(server.rcon_port, properties["rcon.port"])
+
+
+class FakeRconServer:
+    """Answers each command with its text split over two packets."""
+
+    password = "secret"
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_id, packet_type, body = await read_packet(reader)
+                if packet_type == TYPE_LOGIN:
+                    ok = body == self.password
+                    writer.write(
+                        encode_packet(request_id if ok else -1, TYPE_COMMAND, "")
+                    )
+                elif packet_type == TYPE_COMMAND:
+                    # let the next request arrive before this one is answered
+                    await asyncio.sleep(0.01)
+                    half = len(body) // 2
+                    for part in (body[:half], body[half:]):
+                        writer.write(encode_packet(request_id, TYPE_RESPONSE, part))
+                else:
+                    writer.write(encode_packet(request_id, TYPE_RESPONSE, ""))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            writer.close()
+
+
+class RconConnectionTests(SimpleTestCase):
+    def test_pipelined_commands_get_their_own_output(self):
+        async def run():
+            async with FakeRconServer() as fake:
+                conn = RconConnection("127.0.0.1", fake.port, fake.password)
+                await conn.connect()
+                commands = [f"say {n} " + "x" * n for n in range(50)]
+                try:
+                    return commands, await asyncio.gather(
+                        *(conn.command(c) for c in commands)
+                    )
+                finally:
+                    await conn.close()
+
+        commands, outputs = asyncio.run(run())
+        self.assertEqual(outputs, commands)
+
+    def test_wrong_password(self):
+        async def run():
+            async with FakeRconServer() as fake:
+                conn = RconConnection("127.0.0.1", fake.port, "wrong")
+                await conn.connect()
+
+        with self.assertRaises(RconAuthError):
+            asyncio.run(run())
+
+
+def failing_handler(job):
+    raise RuntimeError("boom")
+
+
+@override_settings(
+    SERVER_HOST="test", JOB_RUNNER="external", JOB_HOST_CONCURRENCY=3,
+    JOB_MAX_ATTEMPTS=2, JOB_RETRY_DELAY=60,
+)
+@mock.patch.dict(HANDLERS, {"fail": "apps.server.tests.failing_handler"})
+class JobRunnerTests(TransactionTestCase):
+    def runner(self, name):
+        runner = JobRunner(workers=1)
+        runner.name = name
+        return runner
+
+    def test_host_concurrency_holds_across_runners(self):
+        for _ in range(12):
+            enqueue("fail")
+        barrier = threading.Barrier(6)
+        claimed = []
+
+        def worker(n):
+            runner = self.runner(f"runner-{n}")
+            try:
+                barrier.wait()
+                while (job := runner._claim()) is not None:
+                    claimed.append(job.id)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(claimed), 3)
+        self.assertEqual(len(set(claimed)), 3)
+        self.assertEqual(Job.objects.filter(status=Job.RUNNING).count(), 3)
+
+    def test_failed_job_is_retried_then_failed(self):
+        job = enqueue("fail")
+        runner = self.runner("runner")
+
+        with self.assertLogs("apps.server.jobs", "ERROR"):
+            runner._execute(runner._claim())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), (Job.QUEUED, 1, "boom"))
+        self.assertGreater(job.run_after, job.started_at)
+        self.assertIsNone(runner._claim())
+
+        Job.objects.filter(id=job.id).update(run_after=job.started_at)
+        with self.assertLogs("apps.server.jobs", "ERROR"):
+            runner._execute(runner._claim())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_lost_worker_is_requeued(self):
+        job = enqueue("fail")
+        self.runner(f"{socket.gethostname()}:999999999")._claim()
+
+        self.runner("runner").recover()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), (Job.QUEUED, "Worker lost"))
+
+
+class BackupRepositoryTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.src = self.tmp / "src"
+        self.repo = BackupRepository(self.tmp / "repo", workers=2)
+
+    def write(self, rel, data):
+        path = self.src / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return path
+
+    def test_round_trip(self):
+        rng = random.Random(1)
+        contents = {
+            "empty": b"",
+            "small.txt": b"hello",
+            "world/region/r.0.0.mca": rng.randbytes(5 * MAX_CHUNK + 123),
+        }
+        for rel, data in contents.items():
+            self.write(rel, data)
+        os.chmod(self.src / "small.txt", 0o600)
+
+        snapshot_id, stats = self.repo.create({"files": self.src})
+        self.assertEqual(stats["files"], 3)
+        self.assertEqual(stats["read_bytes"], sum(map(len, contents.values())))
+
+        target = self.tmp / "restore"
+        self.assertEqual(self.repo.restore(snapshot_id, target)["files"], 3)
+        for rel, data in contents.items():
+            self.assertEqual((target / "files" / rel).read_bytes(), data)
+        self.assertEqual((target / "files/small.txt").stat().st_mode & 0o777, 0o600)
+        self.assertEqual(self.repo.verify(full=True)["problems"], {})
+
+    def test_changed_file_only_stores_new_chunks(self):
+        data = random.Random(2).randbytes(8 * MAX_CHUNK)
+        path = self.write("world.dat", data)
+        self.write("copy.dat", data)
+        _, first = self.repo.create({"files": self.src})
+        self.assertEqual(first["new_bytes"], len(data))
+
+        changed = data[:4 * MAX_CHUNK] + b"inserted" + data[4 * MAX_CHUNK:]
+        path.write_bytes(changed)
+        os.utime(path, ns=(1, 1))
+        snapshot_id, second = self.repo.create({"files": self.src})
+
+        self.assertEqual(second["unchanged"], 1)
+        self.assertEqual(second["read_bytes"], len(changed))
+        self.assertLess(second["new_bytes"], 2 * MAX_CHUNK)
+        target = self.tmp / "restore"
+        self.repo.restore(snapshot_id, target, include="files/world.dat")
+        self.assertEqual((target / "files/world.dat").read_bytes(), changed)
+
+    def test_cache_dirs_are_skipped(self):
+        self.write("world/level.dat", b"level")
+        for cache_dir in (".cache", ".artifacts", ".templates"):
+            self.write(f"{cache_dir}/big.jar", b"jar")
+
+        snapshot_id, _ = self.repo.create({"files": self.src})
+        self.assertEqual(list(self.repo.load(snapshot_id)["files"]), ["files/world/level.dat"])
+
+    def test_prune_waits_for_running_create(self):
+        self.repo.workers = 1
+        self.write("a.dat", b"a" * 1000)
+        self.repo.create({"files": self.src})
+        self.write("b.dat", b"b" * 1000)
+
+        storing = threading.Event()
+        release = threading.Event()
+        store_file = backups.store_file
+
+        def slow_store_file(root, path):
+            storing.set()
+            release.wait(5)
+            return store_file(root, path)
+
+        with mock.patch.object(backups, "store_file", slow_store_file):
+            create = threading.Thread(target=self.repo.create, args=({"files": self.src},))
+            create.start()
+            self.assertTrue(storing.wait(5))
+            prune = threading.Thread(target=self.repo.prune, kwargs={"keep_last": 1})
+            prune.start()
+            prune.join(0.3)
+            self.assertTrue(prune.is_alive())
+
+            release.set()
+            create.join(5)
+            prune.join(5)
+
+        self.assertEqual(len(self.repo.snapshot_ids()), 1)
+        self.assertEqual(self.repo.verify()["problems"], {})
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    LOG_WS_WINDOW_BYTES=2000, LOG_WS_QUEUE_LINES=50, LOG_WS_ACK_TIMEOUT=0.5,
+)
+class ProgressConsumerTests(SimpleTestCase):
+    server_id = 4242
+
+    def communicator(self, query=""):
+        return WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns),
+            f"/ws/progress/{self.server_id}/{query}",
+        )
+
+    async def send_lines(self, start, count):
+        await get_channel_layer().group_send(
+            f"progress_{self.server_id}",
+            {
+                "type": "send_logs",
+                "seq": start,
+                "logs": [f"line {n} " + "x" * 40 for n in range(start, start + count)],
+            },
+        )
+
+    async def test_sending_pauses_until_acked_and_reports_drops(self):
+        ws = self.communicator("?since=0")
+        connected, _ = await ws.connect()
+        self.assertTrue(connected)
+        await ws.receive_json_from()
+
+        frames = []
+        for start in range(1, 200, 20):
+            await self.send_lines(start, 20)
+            frames.append(await ws.receive_json_from())
+            if sum(len(json.dumps(f)) for f in frames) > 2000:
+                break
+        # window full: nothing more until an ack, lines pile up and drop
+        for start in range(201, 400, 20):
+            await self.send_lines(start, 20)
+        self.assertTrue(await ws.receive_nothing(0.2))
+
+        await ws.send_json_to({"ack": frames[-1]["frame"]})
+        frame = await ws.receive_json_from()
+        self.assertGreater(frame["dropped"], 0)
+        self.assertEqual(frame["last"], 400)
+        await ws.disconnect()
+
+    async def test_client_without_acks_is_closed(self):
+        ws = self.communicator("?since=0")
+        await ws.connect()
+        await ws.receive_json_from()
+        for start in range(1, 400, 20):
+            await self.send_lines(start, 20)
+
+        while True:
+            message = await ws.receive_output(2)
+            if message["type"] == "websocket.close":
+                break
+        self.assertEqual(message["code"], 4408)
+
+    async def test_bad_tail_is_rejected(self):
+        for query in ("?tail=-5", "?tail=0", "?since=-1"):
+            with self.subTest(query=query):
+                ws = self.communicator(query)
+                connected, code = await ws.connect()
+                self.assertFalse(connected)
+                self.assertEqual(code, 4400)
+
+
+ARCADIA_DOCUMENT = {
+    "mc_java_servers": {
+        "types": {
+            "vanilla": {"versions": {"1.20.1": {"url": ["https://example/v.jar"]}}},
+            "forge": {"versions": {"1.20.1": {"url": "https://example/f.jar"}}},
+        }
+    }
+}
+
+
+class ArcadiaStandIn(BaseHTTPRequestHandler):
+    """Serves ARCADIA_DOCUMENT with an ETag, or fails when ``failing``."""
+
+    etag = '"v1"'
+    failing = False
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(dict(self.headers))
+        if self.failing:
+            self.send_error(503)
+            return
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps(ARCADIA_DOCUMENT).encode()
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ArcadiaManifestClientTests(SimpleTestCase):
+    def setUp(self):
+        ArcadiaStandIn.failing = False
+        ArcadiaStandIn.requests = []
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), ArcadiaStandIn)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.addCleanup(self.httpd.server_close)
+        self.addCleanup(self.httpd.shutdown)
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = Path(tmp.name)
+
+    def arcadia(self):
+        url = f"http://127.0.0.1:{self.httpd.server_port}/manifest.json"
+        return ArcadiaManifestClient(url, self.cache_dir, ttl=0, timeout=2)
+
+    def test_fresh_fetch(self):
+        client = self.arcadia()
+        self.assertEqual(client.find("vanilla", "1.20.1"), "https://example/v.jar")
+        self.assertEqual(client.find("forge", "1.20.1"), "https://example/f.jar")
+        self.assertEqual(client.catalog(), {"vanilla": ["1.20.1"], "forge": ["1.20.1"]})
+        with self.assertRaisesMessage(ValueError, "Invalid version"):
+            client.entry("vanilla", "0.1")
+        self.assertTrue((self.cache_dir / "arcadia_manifest.json").exists())
+
+    def test_conditional_request_gets_304(self):
+        client = self.arcadia()
+        client.refresh()
+        client.refresh()
+
+        self.assertNotIn("If-None-Match", ArcadiaStandIn.requests[0])
+        self.assertEqual(ArcadiaStandIn.requests[1]["If-None-Match"], '"v1"')
+        self.assertEqual(client.manifest(), ARCADIA_DOCUMENT)
+
+    def test_disk_cache_serves_when_upstream_fails(self):
+        self.arcadia().refresh()
+        ArcadiaStandIn.failing = True
+
+        client = self.arcadia()
+        with self.assertLogs("apps.server.arcadia", "WARNING"):
+            self.assertEqual(client.find("forge", "1.20.1"), "https://example/f.jar")
+        # revalidated with the ETag from disk
+        self.assertEqual(ArcadiaStandIn.requests[-1]["If-None-Match"], '"v1"')
+
+    def test_cache_without_document_is_ignored(self):
+        (self.cache_dir / "arcadia_manifest.json").write_text('{"etag": "\\"v1\\""}')
+        client = self.arcadia()
+        with self.assertLogs("apps.server.arcadia", "WARNING"):
+            client.refresh()
+
+        self.assertNotIn("If-None-Match", ArcadiaStandIn.requests[0])
+        self.assertEqual(client.manifest(), ARCADIA_DOCUMENT)
+
+        ArcadiaStandIn.failing = True
+        (self.cache_dir / "arcadia_manifest.json").write_text("[]")
+        with self.assertLogs("apps.server.arcadia", "WARNING"):
+            with self.assertRaises(requests.RequestException):
+                self.arcadia().refresh()
+
+
+class FakeSlpServer:
+    """Answers a status request with ``reply`` bytes, or never with None."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.handshake = None
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        try:
+            _, self.handshake = await slp.read_packet(reader)
+            await slp.read_packet(reader)  # status request
+            if self.reply is None:
+                await asyncio.sleep(10)
+            writer.write(self.reply)
+            await writer.drain()
+            packet_id, payload = await slp.read_packet(reader)
+            writer.write(slp.encode_packet(packet_id, payload))
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+def slp_status(document) -> bytes:
+    return slp.encode_packet(0x00, slp.encode_string(json.dumps(document)))
+
+
+class ServerListPingTests(SimpleTestCase):
+    def ping(self, reply, timeout=1):
+        async def run():
+            async with FakeSlpServer(reply) as fake:
+                try:
+                    return await slp.ping("127.0.0.1", fake.port, timeout=timeout), fake
+                except slp.SlpError as e:
+                    return e, fake
+
+        return asyncio.run(run())
+
+    def test_status(self):
+        result, fake = self.ping(
+            slp_status(
+                {
+                    "version": {"name": "1.20.1", "protocol": 763},
+                    "players": {"max": 20, "online": 3},
+                    "description": {"text": "Hello ", "extra": [{"text": "world"}]},
+                }
+            )
+        )
+        self.assertEqual(
+            {k: v for k, v in result.items() if k != "latency"},
+            {"online": 3, "max": 20, "motd": "Hello world", "version": "1.20.1"},
+        )
+        self.assertIsInstance(result["latency"], int)
+
+        # handshake: protocol -1, host, port, next state 1 (status)
+        protocol, pos = slp.decode_varint(fake.handshake)
+        self.assertEqual(protocol, 0xFFFFFFFF)
+        host_len, pos = slp.decode_varint(fake.handshake, pos)
+        self.assertEqual(fake.handshake[pos:pos + host_len], b"127.0.0.1")
+        pos += host_len
+        self.assertEqual(int.from_bytes(fake.handshake[pos:pos + 2], "big"), fake.port)
+        self.assertEqual(fake.handshake[pos + 2:], b"\x01")
+
+    def test_timeout(self):
+        result, _ = self.ping(None, timeout=0.2)
+        self.assertIsInstance(result, slp.SlpError)
+
+    def test_malformed_replies(self):
+        replies = {
+            "varint": b"\xff" * 6,
+            "json": slp.encode_packet(0x00, slp.encode_string("{not json")),
+            "not an object": slp_status(["x"]),
+            "bad players": slp_status({"players": {"online": "many"}}),
+        }
+        for name, reply in replies.items():
+            with self.subTest(name):
+                result, _ = self.ping(reply)
+                self.assertIsInstance(result, slp.SlpError)
+
+
+def local_time(*fields) -> float:
+    return time.mktime(fields + (0, 0, -1))
+
+
+@override_settings(LOG_COMPRESSION="gzip")
+class LogArchiveTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.archive = logarchive.LogArchive(Path(tmp.name))
+
+    def add_segment(self, name, start, end, lines=(), size=None):
+        path = self.archive.directory / name
+        path.write_text("".join(f"{line}\n" for line in lines))
+        data = self.archive.load()
+        data["segments"].append(
+            {"name": name, "start": start, "end": end, "size": size or path.stat().st_size}
+        )
+        self.archive._save(data)
+
+    def test_search_filters_lines_of_boundary_segments(self):
+        self.add_segment(
+            "panel-1.log",
+            local_time(2026, 10, 17, 23, 0, 0),
+            local_time(2026, 10, 18, 1, 0, 0),
+            [
+                "[23:30:00] [Server thread/INFO]: before",
+                "[Info] panel line",
+                "[00:10:00] [Server thread/ERROR]: after midnight",
+                "\tat net.minecraft.Foo",
+                "[01:00:00] [Server thread/INFO]: too late",
+            ],
+        )
+        result = self.archive.search(
+            since=local_time(2026, 10, 18, 0, 0, 0),
+            until=local_time(2026, 10, 18, 0, 30, 0),
+        )
+        self.assertEqual(
+            result["logs"],
+            ["[00:10:00] [Server thread/ERROR]: after midnight", "\tat net.minecraft.Foo"],
+        )
+
+    def test_prune_is_oldest_first(self):
+        mb = 1024 * 1024
+        for n, size in enumerate((1, 3, 1)):
+            self.add_segment(f"panel-{n}.log", n, n + 1, size=size * mb)
+
+        self.archive.prune(retention_mb=3)
+        self.assertEqual(
+            [s["name"] for s in self.archive.load()["segments"]], ["panel-2.log"]
+        )
+        self.assertFalse((self.archive.directory / "panel-0.log").exists())
+
+    def test_pending_segments_are_compressed(self):
+        self.add_segment("panel-1.log", 0, 1, ["left over"])
+
+        self.archive.compress_pending()
+        logarchive._compressor.submit(lambda: None).result()
+
+        [segment] = self.archive.load()["segments"]
+        self.assertEqual(segment["name"], "panel-1.log.gz")
+        self.assertFalse((self.archive.directory / "panel-1.log").exists())
+        self.assertEqual(self.archive.search()["logs"], ["left over"])
+
+
+def tar_with(*members) -> io.BytesIO:
+    """A gzipped tar of (TarInfo, data) pairs."""
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for info, data in members:
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    buf.seek(0)
+    return buf
+
+
+def tar_file(name, data=b"x"):
+    return tarfile.TarInfo(name), data
+
+
+def tar_link(name, target, kind=tarfile.SYMTYPE):
+    info = tarfile.TarInfo(name)
+    info.type = kind
+    info.linkname = target
+    return info, b""
+
+
+@override_settings(
+    SERVER_HOST="test", SERVER_PORT_RANGES={"test": [(30000, 30199)]}
+)
+class TransferTests(TransactionTestCase):
+    def setUp(self):
+        _synced_hosts.clear()
+        make_modpack()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.minecraft_dir = self.root / "servers"
+        override = override_settings(MINECRAFT_DIR=str(self.minecraft_dir))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_unsafe_members_are_rejected(self):
+        metadata = tar_file(
+            transfer.METADATA_NAME,
+            json.dumps({"name": "evil", "version": "1.20.1", "modpack": "pack"}).encode(),
+        )
+        cases = {
+            "parent": [tar_file("../escaped.txt")],
+            "nested parent": [tar_file("world/../../escaped.txt")],
+            "absolute": [tar_file(f"{self.root}/escaped.txt")],
+            "absolute symlink": [
+                tar_link("mods", str(self.root)), tar_file("mods/escaped.txt")
+            ],
+            "escaping symlink": [
+                tar_link("mods", ".."), tar_file("mods/escaped.txt")
+            ],
+            "absolute hardlink": [tar_link("passwd", "/etc/passwd", tarfile.LNKTYPE)],
+        }
+        for case, members in cases.items():
+            with self.subTest(case=case):
+                with self.assertRaises(transfer.TransferError):
+                    transfer.import_stream(tar_with(metadata, *members))
+
+                self.assertFalse(Server.objects.exists())
+                self.assertFalse((self.root / "escaped.txt").exists())
+                self.assertEqual(list(self.minecraft_dir.iterdir()), [])
+
+    def test_export_import_round_trip(self):
+        source = self.root / "source"
+        (source / "world" / "region").mkdir(parents=True)
+        (source / "world" / "level.dat").write_bytes(os.urandom(4096))
+        region = os.urandom(3 * transfer.BLOCK_SIZE)
+        (source / "world" / "region" / "r.0.0.mca").write_bytes(region)
+        (source / "server.properties").write_text("motd=hello\nserver-port=1\n")
+        (source / ".cache").mkdir()
+        (source / ".cache" / "skip.bin").write_bytes(b"x")
+        original = create_server(
+            name="original", version="1.20.1", path=str(source), ram=2048,
+            modpack=ModPack.objects.get(),
+        )
+
+        archive = b"".join(transfer.export_stream(original, "gzip"))
+        copy = transfer.import_stream(io.BytesIO(archive), name="copy")
+
+        target = Path(copy.path)
+        self.assertEqual(target.parent, self.minecraft_dir.resolve())
+        self.assertEqual(
+            (copy.version, copy.ram, copy.modpack_id),
+            ("1.20.1", 2048, original.modpack_id),
+        )
+        self.assertNotEqual(copy.port, original.port)
+        for name in ("world/level.dat", "world/region/r.0.0.mca"):
+            self.assertEqual((target / name).read_bytes(), (source / name).read_bytes())
+        self.assertFalse((target / ".cache").exists())
+        self.assertFalse((target / transfer.METADATA_NAME).exists())
+        properties = (target / "server.properties").read_text()
+        self.assertIn("motd=hello", properties)
+        self.assertIn(f"server-port={copy.port}", properties)
+
+
+FAKE_SERVER = """
+import signal, sys
+mode = sys.argv[1]
+if mode == "stubborn":
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+print("Done", flush=True)
+for line in sys.stdin:
+    if line.strip() == "stop" and mode == "obedient":
+        print("Stopping server", flush=True)
+        sys.exit(0)
+"""
+
+
+@override_settings(SERVER_STOP_TIMEOUT=1, SERVER_TERM_TIMEOUT=1)
+class SupervisorTests(TransactionTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.server = Server.objects.create(
+            name="fake", version="1.20.1", port=31000, path=tmp.name,
+            modpack=make_modpack(),
+        )
+
+    def start(self, mode):
+        pid = start_process(
+            self.server.id, [sys.executable, "-c", FAKE_SERVER, mode], self.server.path
+        )
+        self.addCleanup(self.kill, pid)
+
+        log = server_log_path(self.server.path)
+        deadline = time.monotonic() + 10
+        while "Done" not in (log.read_text() if log.exists() else ""):
+            self.assertLess(time.monotonic(), deadline, "fake server did not start")
+            time.sleep(0.05)
+        return pid
+
+    def kill(self, pid):
+        if not Server.objects.filter(id=self.server.id, is_running=True).exists():
+            return
+        try:
+            stop_process(self.server.id, pid, graceful=False)
+        except SupervisorError:
+            pass
+
+    def assertStopped(self, result, outcome):
+        self.assertEqual(result["outcome"], outcome)
+        self.server.refresh_from_db()
+        self.assertEqual((self.server.is_running, self.server.pid), (False, None))
+        stop = ServerStop.objects.get(server=self.server)
+        self.assertEqual((stop.outcome, stop.exit_code), (outcome, result["exit_code"]))
+
+    def test_start_marks_running(self):
+        pid = self.start("obedient")
+        self.server.refresh_from_db()
+        self.assertEqual((self.server.is_running, self.server.pid), (True, pid))
+
+        with self.assertRaises(SupervisorError):
+            start_process(self.server.id, [sys.executable, "-c", ""], self.server.path)
+
+    def test_graceful_stop(self):
+        pid = self.start("obedient")
+        result = stop_process(self.server.id, pid)
+        self.assertStopped(result, ServerStop.GRACEFUL)
+        self.assertEqual(result["exit_code"], 0)
+        self.assertIn("Stopping server", server_log_path(self.server.path).read_text())
+
+    def test_ignored_stop_is_terminated(self):
+        pid = self.start("deaf")
+        self.assertStopped(stop_process(self.server.id, pid), ServerStop.TERMINATED)
+
+    def test_ignored_sigterm_is_killed(self):
+        pid = self.start("stubborn")
+        self.assertStopped(stop_process(self.server.id, pid), ServerStop.KILLED)
+
+    def test_forced_stop_kills_at_once(self):
+        pid = self.start("obedient")
+        result = stop_process(self.server.id, pid, graceful=False)
+        self.assertStopped(result, ServerStop.KILLED)
+        self.assertLess(result["duration"], 1)
+
+
+@override_settings(
+    SERVER_HOST="test",
+    SERVER_PORT_RANGES={"test": [(30000, 30199)]},
+    ADMISSION_RESERVED_MB=1024,
+    ADMISSION_JVM_OVERHEAD_MB=512,
+    ADMISSION_MAX_LOAD=1.5,
+)
+class AdmissionTests(TestCase):
+    def setUp(self):
+        _synced_hosts.clear()
+        self.modpack = make_modpack()
+        self.controller = admission.AdmissionController()
+        self.meminfo = {"total": 16384, "available": 12000}
+        self.load = {"load1": 1.0, "cpus": 4}
+        for name, value in (
+            ("read_meminfo", lambda: self.meminfo),
+            ("read_load", lambda: self.load),
+            ("_resident_mb", lambda pid: 1000 if pid else 0),
+        ):
+            patcher = mock.patch.object(admission, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def server(self, name, ram, running=False):
+        server = create_server(
+            name=name, version="1.20.1", path=f"/tmp/{name}", modpack=self.modpack,
+            ram=ram,
+        )
+        if running:
+            Server.objects.filter(id=server.id).update(is_running=True, pid=4242)
+        return server
+
+    def test_headroom_is_the_tighter_of_committed_and_available(self):
+        self.server("running", 4096, running=True)
+        report = self.controller.headroom()
+        # committed: 16384 - 1024 - (4096 + 512) = 10752
+        # available: 12000 - 1024 - (4608 footprint - 1000 resident) = 7368
+        self.assertEqual(report["committed_mb"], 4608)
+        self.assertEqual(report["headroom_mb"], 7368)
+
+        self.meminfo = {"total": 8192, "available": 8000}
+        # committed: 8192 - 1024 - 4608 = 2560
+        self.assertEqual(self.controller.headroom()["headroom_mb"], 2560)
+
+    def test_check_refuses_what_does_not_fit(self):
+        self.server("running", 4096, running=True)
+        self.controller.check(self.server("fits", 6144))
+
+        with self.assertRaises(admission.Overcommit) as cm:
+            self.controller.check(self.server("too-big", 7000))
+        self.assertIn("needs 7512 MB, 7368 MB free", str(cm.exception))
+        self.assertEqual(cm.exception.headroom["headroom_mb"], 7368)
+
+    def test_check_refuses_a_busy_host(self):
+        server = self.server("small", 1024)
+        self.load = {"load1": 6.1, "cpus": 4}
+        with self.assertRaisesRegex(admission.Overcommit, "Host is busy"):
+            self.controller.check(server)
+
+    def test_admitted_start_is_committed_until_it_runs(self):
+        first = self.server("first", 4096)
+        second = self.server("second", 4096)
+        self.meminfo = {"total": 9216, "available": 9216}
+
+        with self.controller.admit(first):
+            self.assertEqual(self.controller.headroom()["starting"], 1)
+            with self.assertRaises(admission.Overcommit):
+                self.controller.check(second)
+        self.controller.check(second)
+
+    def test_fits_ignores_current_use(self):
+        self.meminfo = {"total": 8192, "available": 100}
+        self.assertTrue(self.controller.fits(6656))
+        self.assertFalse(self.controller.fits(6657))
+
+
+class JarStandIn(BaseHTTPRequestHandler):
+    """Serves ``body`` and honours ``Range: bytes=N-``."""
+
+    body = b""
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.headers.get("Range"))
+        start = 0
+        if self.headers.get("Range"):
+            start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        data = self.body[start:]
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class ArtifactStoreTests(SimpleTestCase):
+    def setUp(self):
+        JarStandIn.body = os.urandom(300_000)
+        JarStandIn.requests = []
+        self.digest = hashlib.sha256(JarStandIn.body).hexdigest()
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), JarStandIn)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        self.addCleanup(httpd.server_close)
+        self.addCleanup(httpd.shutdown)
+        self.url = f"http://127.0.0.1:{httpd.server_port}/server.jar"
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.store = ArtifactStore(self.root / "artifacts")
+
+    def test_miss_downloads_and_hit_does_not(self):
+        self.assertIsNone(self.store.lookup(self.url))
+
+        path = self.store.fetch(self.url, self.digest)
+        self.assertEqual(path, self.store.object_path(self.digest))
+        self.assertEqual(path.read_bytes(), JarStandIn.body)
+
+        self.assertEqual(self.store.fetch(self.url), path)
+        # another process finds it through the url record
+        self.assertEqual(ArtifactStore(self.store.root).lookup(self.url), path)
+        self.assertEqual(len(JarStandIn.requests), 1)
+
+        jar = self.root / "server.jar"
+        self.store.link_into(self.url, jar)
+        self.assertEqual(jar.read_bytes(), JarStandIn.body)
+        self.assertEqual(len(JarStandIn.requests), 1)
+
+    def test_other_checksum_is_a_miss(self):
+        self.store.fetch(self.url)
+        self.assertIsNone(self.store.lookup(self.url, "0" * 64))
+
+        with self.assertRaises(ChecksumMismatch):
+            self.store.fetch(self.url, "0" * 64)
+        self.assertFalse(self.store.object_path("0" * 64).exists())
+        self.assertEqual(list((self.store.root / "tmp").glob("*.part")), [])
+
+    def test_partial_download_is_resumed(self):
+        part = self.store._part_path(self.url)
+        part.parent.mkdir(parents=True)
+        part.write_bytes(JarStandIn.body[:100_000])
+
+        path = self.store.fetch(self.url, self.digest)
+        self.assertEqual(JarStandIn.requests, ["bytes=100000-"])
+        self.assertEqual(path.read_bytes(), JarStandIn.body)
+
+
+class InstallTemplateStoreTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.store = InstallTemplateStore(self.root / "templates")
+        self.installer = self.root / "forge-installer.jar"
+        self.installer.write_bytes(b"installer")
+        self.runs = []
+
+    def run_installer(self, jar: Path, cwd: Path) -> bool:
+        self.runs.append(jar)
+        (cwd / "libraries" / "net").mkdir(parents=True)
+        (cwd / "libraries" / "net" / "forge.jar").write_bytes(b"forge")
+        (cwd / "run.sh").write_text("java @args\n")
+        (cwd / "installer.jar.log").write_text("done\n")
+        return True
+
+    def test_installer_runs_once_per_key(self):
+        key = self.store.key("forge", "1.20.1-47.2.0", "ab" * 32)
+
+        template = self.store.ensure(key, self.installer, self.run_installer)
+        self.assertTrue((template / COMPLETE_MARKER).exists())
+        self.assertFalse((template / "installer.jar").exists())
+        self.assertFalse((template / "installer.jar.log").exists())
+        self.assertEqual(self.store.ensure(key, self.installer, self.run_installer), template)
+        self.assertEqual(len(self.runs), 1)
+
+        dest = self.root / "server"
+        self.store.clone_into(template, dest)
+        self.assertEqual((dest / "libraries" / "net" / "forge.jar").read_bytes(), b"forge")
+        self.assertEqual((dest / "run.sh").read_text(), "java @args\n")
+        self.assertFalse((dest / COMPLETE_MARKER).exists())
+
+    def test_failed_install_leaves_no_template(self):
+        key = self.store.key("neoforge", "20.4.1", "cd" * 32)
+
+        self.assertIsNone(self.store.ensure(key, self.installer, lambda jar, cwd: False))
+        self.assertEqual(list(self.store.root.iterdir()), [self.store.root / f".{key}.lock"])
+
+        self.assertIsNotNone(self.store.ensure(key, self.installer, self.run_installer))
+        self.assertEqual(len(self.runs), 1)
+
+
+class LogSinkTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.server = Server.objects.create(
+            name="sink", version="1.20.1", port=31000, path=tmp.name,
+            modpack=make_modpack(),
+        )
+        self.layer = mock.AsyncMock()
+        for target, value in (
+            ("apps.server.logsink.get_channel_layer", lambda: self.layer),
+            ("apps.server.logsink.log_buffer", MemoryLogBuffer(100)),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # the flush thread never wakes on its own
+        self.sink = LogSink(interval=3600, batch_size=3)
+        self.addCleanup(self.sink.close_all)
+
+    def sent(self):
+        return [call.args[1] for call in self.layer.group_send.call_args_list]
+
+    def test_lines_are_shipped_in_batches(self):
+        log = server_log_path(self.server.path)
+        self.sink.write(self.server.id, "[Server] one")
+        self.sink.write(self.server.id, "[Server] two")
+        self.assertEqual(self.sent(), [])
+
+        self.sink.flush()
+        self.assertEqual(log.read_text(), "[Server] one\n[Server] two\n")
+        self.assertEqual(
+            self.sent(),
+            [{"type": "send_logs", "logs": ["[Server] one", "[Server] two"], "seq": 1}],
+        )
+
+        self.sink.flush()
+        self.assertEqual(len(self.sent()), 1)
+
+        self.sink.write(self.server.id, "[Server] three")
+        self.sink.close(self.server.id)
+        self.assertEqual(self.sent()[-1]["seq"], 3)
+        self.assertTrue(log.read_text().endswith("[Server] three\n"))
+
+    def test_full_batch_wakes_the_flush_thread(self):
+        for n in range(3):
+            self.sink.write(self.server.id, f"line {n}")
+
+        deadline = time.monotonic() + 5
+        while not self.sent():
+            self.assertLess(time.monotonic(), deadline, "batch was not shipped")
+            time.sleep(0.01)
+        self.assertEqual(self.sent()[0]["logs"], ["line 0", "line 1", "line 2"])
+
+
+@override_settings(LOG_BACKFILL_LINES=3)
+class LogBufferTests(SimpleTestCase):
+    def setUp(self):
+        self.buffer = MemoryLogBuffer(5)
+        self.assertEqual(self.buffer.append(1, ["a", "b", "c"]), 1)
+        self.assertEqual(self.buffer.append(1, ["d", "e", "f", "g"]), 4)
+
+    def test_oldest_lines_are_evicted(self):
+        self.assertEqual(self.buffer.read(1, 10), (3, ["c", "d", "e", "f", "g"]))
+        self.assertEqual(self.buffer.read(1, 2), (6, ["f", "g"]))
+        self.assertEqual(self.buffer.read(2, 10), (1, []))
+
+    def test_first_connect_gets_the_tail(self):
+        self.assertEqual(
+            replay(self.buffer, 1),
+            {"seq": 5, "logs": ["e", "f", "g"], "gap": False, "reset": False},
+        )
+        self.assertEqual(replay(self.buffer, 1, limit=1)["logs"], ["g"])
+
+    def test_reconnect_gets_missing_lines(self):
+        self.assertEqual(
+            replay(self.buffer, 1, since=4),
+            {"seq": 5, "logs": ["e", "f", "g"], "gap": False, "reset": False},
+        )
+        self.assertEqual(replay(self.buffer, 1, since=7)["logs"], [])
+
+    def test_evicted_lines_are_a_gap(self):
+        result = replay(self.buffer, 1, since=1)
+        self.assertTrue(result["gap"])
+        self.assertEqual((result["seq"], result["logs"]), (3, ["c", "d", "e", "f", "g"]))
+
+    def test_restarted_sequence_is_a_reset(self):
+        result = replay(self.buffer, 1, since=50)
+        self.assertTrue(result["reset"])
+        self.assertEqual((result["seq"], result["logs"]), (5, ["e", "f", "g"]))
+
+
+class AccessSyncTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.server_dir = Path(tmp.name)
+        self.server = Server.objects.create(
+            name="access", version="1.20.1", port=31000, path=tmp.name,
+            modpack=make_modpack(), is_running=True, pid=4242,
+        )
+        get_user_model().objects.create_user(username="steve", password="x")
+
+        patcher = mock.patch(
+            "apps.server.supervisor.send_input",
+            side_effect=SupervisorError("Process is not managed by this supervisor"),
+        )
+        self.send_input = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_foreign_server_is_reloaded_over_rcon(self):
+        with mock.patch.object(access, "run_command") as run_command:
+            stats = access.sync_access()
+        run_command.assert_called_once_with(self.server.id, "whitelist reload")
+        self.assertEqual(stats["reloaded"], 1)
+        whitelist = json.loads((self.server_dir / "whitelist.json").read_text())
+        self.assertEqual([entry["name"] for entry in whitelist], ["steve"])
+
+        with mock.patch.object(access, "run_command") as run_command:
+            self.assertEqual(access.sync_access()["reloaded"], 0)
+        run_command.assert_not_called()
+
+    def test_unreachable_rcon_is_logged(self):
+        with mock.patch.object(access, "run_command", side_effect=RconError("refused")):
+            with self.assertLogs("apps.server.access", "WARNING"):
+                stats = access.sync_access()
+        self.assertEqual((stats["whitelist"], stats["reloaded"]), (1, 0))
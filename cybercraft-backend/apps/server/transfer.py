@@ -0,0 +1,298 @@
+import gzip
+import io
+import json
+import os
+import queue
+import shutil
+import tarfile
+import tempfile
+import threading
+from pathlib import Path, PurePosixPath
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.modpacks.models import ModPack
+
+from .backups import EXCLUDE_DIRS
+from .models import Server
+from .ports import create_server
+from .rcon import rcon_properties
+from .services import smart_update_properties
+from .utils import normalize
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+METADATA_NAME = ".cybercraft-server.json"
+BLOCK_SIZE = 1024 * 1024
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_MAGIC = b"\x1f\x8b"
+
+IMPORT_FIELDS = {
+    "version",
+    "loader",
+    "ram",
+    "description",
+    "log_retention_days",
+    "log_retention_mb",
+}
+
+_DONE = object()
+
+
+class TransferError(Exception):
+    pass
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def export_codec() -> str:
+    return "zstd" if zstandard is not None else "gzip"
+
+
+def archive_suffix(codec: str) -> str:
+    return ".tar.zst" if codec == "zstd" else ".tar.gz"
+
+
+def server_metadata(server: Server) -> dict:
+    return {
+        "name": server.name,
+        "version": server.version,
+        "loader": server.loader,
+        "ram": server.ram,
+        "modpack": server.modpack.name,
+        "description": server.description,
+        "log_retention_days": server.log_retention_days,
+        "log_retention_mb": server.log_retention_mb,
+    }
+
+
+class _QueueSink:
+    """File-like object handing fixed-size blocks to a bounded queue."""
+
+    def __init__(self, blocks: queue.Queue, cancelled: threading.Event):
+        self.blocks = blocks
+        self.cancelled = cancelled
+        self.buf = bytearray()
+
+    def write(self, data) -> int:
+        self.buf += data
+        while len(self.buf) >= BLOCK_SIZE:
+            self.put(bytes(self.buf[:BLOCK_SIZE]))
+            del self.buf[:BLOCK_SIZE]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def finish(self):
+        if self.buf:
+            self.put(bytes(self.buf))
+            self.buf.clear()
+        self.put(_DONE)
+
+    def put(self, item):
+        # blocks while the consumer is behind; gives up once it went away
+        while True:
+            if self.cancelled.is_set():
+                raise _Cancelled
+            try:
+                self.blocks.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+
+def _compressed(sink: _QueueSink, codec: str):
+    level = settings.EXPORT_COMPRESSION_LEVEL
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=level, threads=-1).stream_writer(
+            sink, closefd=False
+        )
+    return gzip.GzipFile(fileobj=sink, mode="wb", compresslevel=min(level, 9))
+
+
+def _add_tree(tar: tarfile.TarFile, base: Path):
+    for root, dirs, names in os.walk(base):
+        dirs[:] = sorted(d for d in dirs if d not in EXCLUDE_DIRS)
+        root = Path(root)
+        for name in dirs + sorted(names):
+            path = root / name
+            try:
+                tar.add(path, arcname=path.relative_to(base).as_posix(), recursive=False)
+            except FileNotFoundError:
+                continue
+
+
+def export_stream(server: Server, codec: str = None):
+    """
+    Yield the server directory as a compressed tar, block by block.
+
+    A thread writes the archive into a bounded queue, so memory stays at
+    EXPORT_QUEUE_BLOCKS blocks however large the server is and nothing is
+    written to disk. Closing the generator (client gone) stops the thread.
+    """
+    codec = codec or export_codec()
+    base = Path(server.path)
+    metadata = json.dumps(server_metadata(server), indent=2).encode("utf-8")
+
+    blocks = queue.Queue(maxsize=settings.EXPORT_QUEUE_BLOCKS)
+    cancelled = threading.Event()
+    sink = _QueueSink(blocks, cancelled)
+
+    def produce():
+        try:
+            with _compressed(sink, codec) as out:
+                with tarfile.open(fileobj=out, mode="w|", bufsize=BLOCK_SIZE) as tar:
+                    info = tarfile.TarInfo(METADATA_NAME)
+                    info.size = len(metadata)
+                    tar.addfile(info, io.BytesIO(metadata))
+                    _add_tree(tar, base)
+            sink.finish()
+        except _Cancelled:
+            pass
+        except BaseException as e:
+            try:
+                sink.put(e)
+            except _Cancelled:
+                pass
+
+    thread = threading.Thread(target=produce, daemon=True, name="server-export")
+    thread.start()
+    try:
+        while True:
+            item = blocks.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise TransferError(f"Export failed: {item}") from item
+            yield item
+    finally:
+        cancelled.set()
+
+
+class _Peekable:
+    """Wraps a read-only stream so its first bytes can be inspected."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.head = b""
+
+    def peek(self, size: int) -> bytes:
+        while len(self.head) < size:
+            data = self.raw.read(size - len(self.head))
+            if not data:
+                break
+            self.head += data
+        return self.head[:size]
+
+    def read(self, size=-1) -> bytes:
+        if self.head:
+            if size < 0:
+                data, self.head = self.head + self.raw.read(), b""
+                return data
+            data, self.head = self.head[:size], self.head[size:]
+            return data
+        return self.raw.read(size)
+
+
+def _decompressed(stream):
+    stream = _Peekable(stream)
+    magic = stream.peek(4)
+    if magic.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise TransferError("zstd archives need the zstandard package")
+        return zstandard.ZstdDecompressor().stream_reader(stream, read_size=BLOCK_SIZE)
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+    return stream
+
+
+def _check_member(member: tarfile.TarInfo):
+    # the "data" filter would strip a leading "/" and extract it anyway
+    path = PurePosixPath(member.name)
+    if path.is_absolute() or ".." in path.parts:
+        raise TransferError(f"Unsafe path in archive: {member.name}")
+
+
+def import_stream(stream, name: str = None, **overrides) -> Server:
+    """
+    Unpack a server archive read from ``stream`` into MINECRAFT_DIR/<name>
+    and register it as a new server on a free port.
+
+    Members are extracted as they arrive (tar ``r|``), so the upload is
+    never held in memory or staged. ``name`` and ``overrides`` take
+    precedence over the metadata stored in the archive.
+    """
+    minecraft_dir = Path(settings.MINECRAFT_DIR)
+    minecraft_dir.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=".import-", dir=minecraft_dir))
+
+    metadata = {}
+    try:
+        with tarfile.open(
+            fileobj=_decompressed(stream), mode="r|", bufsize=BLOCK_SIZE
+        ) as tar:
+            for member in tar:
+                if member.name == METADATA_NAME:
+                    metadata = json.load(tar.extractfile(member))
+                    continue
+                _check_member(member)
+                tar.extract(member, staging, filter="data")
+    except (tarfile.TarError, EOFError, OSError, ValueError) as e:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise TransferError(f"Invalid archive: {e}") from e
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    try:
+        return _register(staging, metadata, name, overrides)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def _register(staging: Path, metadata: dict, name: str, overrides: dict) -> Server:
+    fields = {**metadata, **{k: v for k, v in overrides.items() if v is not None}}
+    name = (name or fields.pop("name", "") or "").strip()
+    fields.pop("name", None)
+    if not name:
+        raise TransferError("Server name required")
+    if Server.objects.filter(name=name).exists():
+        raise TransferError("Server with this name already exists")
+
+    modpack = fields.pop("modpack", None)
+    if isinstance(modpack, int) or str(modpack).isdigit():
+        modpack = ModPack.objects.filter(id=int(modpack)).first()
+    else:
+        modpack = ModPack.objects.filter(name=modpack).first()
+    if modpack is None:
+        raise TransferError("Unknown modpack")
+
+    minecraft_dir = Path(settings.MINECRAFT_DIR).resolve()
+    target = minecraft_dir / normalize(name)
+    if target.resolve().parent != minecraft_dir:
+        raise TransferError("Invalid server name")
+    if target.exists():
+        raise TransferError(f"{target} already exists")
+
+    fields = {k: v for k, v in fields.items() if k in IMPORT_FIELDS}
+    if not fields.get("version"):
+        raise TransferError("Server version required")
+
+    with transaction.atomic():
+        server = create_server(name=name, path=str(target), modpack=modpack, **fields)
+        os.replace(staging, target)
+
+    smart_update_properties(
+        target / "server.properties",
+        {"server-port": server.port, **rcon_properties(server)},
+    )
+    return server
@@ -1,15 +1,12 @@
-import json
 import logging
-import threading
+import math
 import re
 from pathlib import Path
 
 import requests
 from django.conf import settings
-from django.core.cache import cache
-from django.db import transaction, close_old_connections
 from django.shortcuts import get_object_or_404
-from django.http import JsonResponse
+from django.http import StreamingHttpResponse
 
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ViewSet
@@ -18,57 +15,56 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework import status
 
-from .models import Server
+from .admission import Overcommit, admission
+from .arcadia import arcadia
+from .jobs import enqueue
+from .logarchive import archive_for
+from .logsink import server_log_path
+from .logtail import read_backward, read_forward, wait_for_growth
+from .models import Job, Server, WorldSnapshot
+from .ports import NoFreePort, create_server
 from .serializers import ServerSerializer, ServerImageSerializer
-from .utils import ws_log
-from .services import (
-    create_server_full,
-    restart_with_fixed_port,
-    terminate_process,
+from .rcon import RconError, broadcast_command, run_command
+from .services import ProvisionError, queue_start, queue_stop, start_server
+from .supervisor import SupervisorError, stop_all_processes
+from .transfer import (
+    TransferError,
+    archive_suffix,
+    export_codec,
+    export_stream,
+    import_stream,
 )
 
 logger = logging.getLogger(__name__)
 
 MINECRAFT_DIR = Path(settings.MINECRAFT_DIR)
 
-ARCADIA_MANIFEST_URL = "https://jars.arcadiatech.org/manifest.json"
+MIN_RAM_MB = 256
 
-PORT_RESERVE_TIMEOUT = 300
 
+class BadParameter(ValueError):
+    pass
 
-def _port_cache_key(port: int) -> str:
-    return f"reserved_port:{port}"
 
-
-def reserve_port(start: int = 25565, end: int = 26000) -> int:
-    used = set(Server.objects.values_list("port", flat=True))
-    for port in range(start, end):
-        if port in used:
-            continue
-        if cache.add(_port_cache_key(port), "1", timeout=PORT_RESERVE_TIMEOUT):
-            return port
-    raise RuntimeError("No free ports available")
-
-
-def fetch_arcadia_manifest() -> dict:
-    r = requests.get(ARCADIA_MANIFEST_URL, timeout=10)
-    r.raise_for_status()
-    return r.json()
-
-
-def arcadia_find(server_type: str, version: str) -> str:
-    manifest = fetch_arcadia_manifest()
-    types = manifest.get("mc_java_servers", {}).get("types", {})
-    t = types.get(server_type)
-    if not t:
-        raise ValueError("Invalid server type")
-
-    v = t.get("versions", {}).get(version)
-    if not v:
-        raise ValueError("Invalid version")
-
-    url = v.get("url")
-    return url[0] if isinstance(url, list) else url
+def number_param(params, name, default=None, minimum=None, maximum=None, cast=int):
+    """
+    Read a numeric request parameter. Values above ``maximum`` are clamped;
+    anything unparsable, non-finite or below ``minimum`` raises BadParameter.
+    """
+    raw = params.get(name)
+    if raw is None or raw == "":
+        return default
+    try:
+        value = cast(raw)
+    except (TypeError, ValueError):
+        raise BadParameter(f"{name} must be a number")
+    if not math.isfinite(value):
+        raise BadParameter(f"{name} must be a number")
+    if minimum is not None and value < minimum:
+        raise BadParameter(f"{name} must be at least {minimum}")
+    if maximum is not None:
+        value = min(value, maximum)
+    return value
 
 
 class ServerCreateAPIView(APIView):
@@ -80,8 +76,11 @@ class ServerCreateAPIView(APIView):
         name = data.get("name", "").strip()
         version = data.get("version")
         server_type = data.get("server_type")
-        ram = int(data.get("ram", 1024))
         modpack_id = data.get("modpack")
+        try:
+            ram = number_param(data, "ram", 1024, minimum=MIN_RAM_MB)
+        except BadParameter as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         if not all([name, version, server_type, modpack_id]):
             return Response(
@@ -89,6 +88,12 @@ class ServerCreateAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        if not admission.fits(ram):
+            return Response(
+                {"error": f"{ram} MB of RAM does not fit on this host"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         if Server.objects.filter(name=name).exists():
             return Response(
                 {"error": "Server with this name already exists"},
@@ -96,42 +101,52 @@ class ServerCreateAPIView(APIView):
             )
 
         try:
-            port = reserve_port()
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
+            url = arcadia.find(server_type, version)
+            sha256 = arcadia.entry(server_type, version).get("sha256")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except requests.RequestException as e:
+            return Response(
+                {"error": f"Manifest unavailable: {e}"},
+                status=status.HTTP_502_BAD_GATEWAY,
+            )
 
-        with transaction.atomic():
-            server = Server.objects.create(
+        try:
+            server = create_server(
                 name=name,
                 version=version,
+                loader=server_type,
                 ram=ram,
-                port=port,
                 path=str(MINECRAFT_DIR / name),
                 modpack_id=modpack_id,
             )
+        except NoFreePort as e:
+            return Response({"error": str(e)}, status=500)
 
-        def bg_task(server_id: int):
-            close_old_connections()
-            try:
-                url = arcadia_find(server_type, version)
-                create_server_full(
-                    server=Server.objects.get(id=server_id),
-                    jar_url=url,
-                )
-            except Exception as e:
-                logger.exception("Server creation failed")
-                ws_log(server_id, f"[Error] {e}")
-            finally:
-                close_old_connections()
-
-        threading.Thread(target=bg_task, args=(server.id,), daemon=True).start()
+        job = enqueue(
+            "create_server", {"jar_url": url, "sha256": sha256}, server=server
+        )
 
         return Response(
-            {"status": "creating", "server_id": server.id},
+            {"status": "queued", "server_id": server.id, "job_id": job.id},
             status=status.HTTP_201_CREATED,
         )
 
 
+class ServerVersionsAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        try:
+            types = arcadia.catalog()
+        except requests.RequestException as e:
+            return Response(
+                {"error": f"Manifest unavailable: {e}"},
+                status=status.HTTP_502_BAD_GATEWAY,
+            )
+        return Response({"types": types})
+
+
 class ServerControlAPIView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
 
@@ -142,46 +157,297 @@ class ServerControlAPIView(APIView):
             if server.is_running:
                 return Response({"error": "Already running"}, status=400)
 
-            jars = list(Path(server.path).glob("*.jar"))
-            if not jars:
-                return Response({"error": "Server jar not found"}, status=500)
-
-            pid = restart_with_fixed_port(jars[0], server.ram, server.id)
-            server.pid = pid
-            server.is_running = True
-            server.save()
+            try:
+                pid = start_server(server)
+            except ProvisionError as e:
+                return Response({"error": str(e)}, status=500)
+            except SupervisorError as e:
+                return Response({"error": str(e)}, status=500)
+            except Overcommit as e:
+                if request.data.get("queue") in (True, "true", "1"):
+                    job = queue_start(server, str(e))
+                    return Response(
+                        {"status": "queued", "job_id": job.id, "reason": str(e)},
+                        status=status.HTTP_202_ACCEPTED,
+                    )
+                return Response(
+                    {"error": str(e), "headroom": e.headroom},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                )
 
-            return Response({"status": "started"})
+            return Response({"status": "started", "pid": pid})
 
         if action == "stop":
             if not server.is_running or not server.pid:
                 return Response({"error": "Not running"}, status=400)
 
-            terminate_process(server.pid)
-            server.pid = None
-            server.is_running = False
-            server.save()
-
-            ws_log(server.id, "[Server] Stopped")
-            return Response({"status": "stopped"})
+            graceful = request.data.get("force") not in (True, "true", "1")
+            job = queue_stop(server, graceful)
+            return Response(
+                {"status": "stopping", "job_id": job.id},
+                status=status.HTTP_202_ACCEPTED,
+            )
 
         return Response({"error": "Invalid action"}, status=400)
 
 
+class ServerStopAllAPIView(APIView):
+    """Stop every running server (or the listed ones) in parallel."""
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def post(self, request):
+        graceful = request.data.get("force") not in (True, "true", "1")
+        try:
+            results = stop_all_processes(request.data.get("servers"), graceful)
+        except SupervisorError as e:
+            return Response({"error": str(e)}, status=500)
+
+        return Response({"results": results})
+
+
+class ServerCommandAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def post(self, request, pk):
+        server = get_object_or_404(Server, pk=pk)
+        command = str(request.data.get("command", "")).strip()
+        if not command:
+            return Response(
+                {"error": "command required"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if not server.is_running:
+            return Response({"error": "Not running"}, status=status.HTTP_409_CONFLICT)
+
+        try:
+            response = run_command(server.id, command)
+        except TimeoutError:
+            return Response(
+                {"error": "RCON timeout"}, status=status.HTTP_504_GATEWAY_TIMEOUT
+            )
+        except RconError as e:
+            return Response({"error": str(e)}, status=status.HTTP_502_BAD_GATEWAY)
+
+        return Response({"response": response})
+
+
+class ServerBatchCommandAPIView(APIView):
+    """Send one command to many servers (default: all running) concurrently."""
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def post(self, request):
+        command = str(request.data.get("command", "")).strip()
+        if not command:
+            return Response(
+                {"error": "command required"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        servers = Server.objects.filter(is_running=True)
+        if request.data.get("servers") is not None:
+            servers = servers.filter(id__in=request.data["servers"])
+        server_ids = list(servers.values_list("id", flat=True))
+
+        try:
+            results = broadcast_command(server_ids, command)
+        except TimeoutError:
+            return Response(
+                {"error": "RCON timeout"}, status=status.HTTP_504_GATEWAY_TIMEOUT
+            )
+
+        return Response(
+            {
+                "results": {
+                    str(sid): (
+                        {"error": str(result) or type(result).__name__}
+                        if isinstance(result, Exception)
+                        else {"response": result}
+                    )
+                    for sid, result in results.items()
+                }
+            }
+        )
+
+
 class ServerLogsAPIView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
 
+    MAX_LIMIT = 5000
+    MAX_WAIT = 30
+
     def get(self, request, pk):
         server = get_object_or_404(Server, pk=pk)
-        log_file = Path(server.path) / "logs" / "latest.log"
+        log_file = server_log_path(server.path)
+        params = request.query_params
+
+        try:
+            limit = number_param(params, "limit", 500, minimum=1, maximum=self.MAX_LIMIT)
+            before = number_param(params, "before", minimum=0)
+            after = number_param(params, "after", minimum=0)
+            wait = number_param(
+                params, "wait", 0, minimum=0, maximum=self.MAX_WAIT, cast=float
+            )
+            since = number_param(params, "since", cast=float)
+            until = number_param(params, "until", cast=float)
+        except BadParameter as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        match = None
+        if params.get("regex"):
+            try:
+                match = re.compile(params["regex"]).search
+            except re.error as e:
+                return Response(
+                    {"error": f"Invalid regex: {e}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        elif params.get("q"):
+            needle = params["q"]
+            match = lambda line: needle in line  # noqa: E731
+
+        if since is not None or until is not None:
+            # history search over rotated segments, by unix timestamps
+            return Response(
+                archive_for(server.path).search(since, until, match, limit)
+            )
+
+        if after is not None:
+            if wait > 0:
+                wait_for_growth(log_file, after, wait)
+            if not log_file.exists():
+                return Response({"logs": [], "start": 0, "end": 0})
+            return Response(read_forward(log_file, after, limit, match))
 
         if not log_file.exists():
-            return Response({"logs": []})
+            return Response({"logs": [], "start": 0, "end": 0})
+
+        return Response(read_backward(log_file, before, limit, match))
+
+
+class ServerLogSegmentsAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request, pk):
+        server = get_object_or_404(Server, pk=pk)
+        return Response({"segments": archive_for(server.path).segments()})
+
+
+class ServerSnapshotAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request, pk):
+        server = get_object_or_404(Server, pk=pk)
+        snapshots = WorldSnapshot.objects.filter(server=server).values(
+            "id", "name", "archived", "files", "size",
+            "save_off_seconds", "duration", "created_at",
+        )
+        return Response({"snapshots": list(snapshots)})
+
+    def post(self, request, pk):
+        server = get_object_or_404(Server, pk=pk)
+        archive = request.data.get("archive") in (True, "true", "1")
+        job = enqueue("snapshot_world", {"archive": archive}, server=server)
+        return Response(
+            {"status": "queued", "job_id": job.id}, status=status.HTTP_202_ACCEPTED
+        )
+
+
+class ServerExportAPIView(APIView):
+    """Download the server directory as a streamed tar.zst (or tar.gz)."""
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request, pk):
+        server = get_object_or_404(Server.objects.select_related("modpack"), pk=pk)
+        if server.is_running and request.query_params.get("force") not in ("true", "1"):
+            return Response(
+                {"error": "Server is running; stop it or pass force=1"},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        codec = export_codec()
+        response = StreamingHttpResponse(
+            export_stream(server, codec),
+            content_type="application/zstd" if codec == "zstd" else "application/gzip",
+        )
+        filename = f"{server.name}{archive_suffix(codec)}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ServerImportAPIView(APIView):
+    """
+    Create a server from an exported archive sent as the raw request body
+    (not multipart), unpacked while it is read.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def post(self, request):
+        params = request.query_params
+        if request.stream is None:
+            return Response(
+                {"error": "archive required"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            ram = number_param(params, "ram", minimum=MIN_RAM_MB)
+        except BadParameter as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            server = import_stream(
+                request.stream,
+                name=params.get("name"),
+                version=params.get("version"),
+                loader=params.get("loader"),
+                ram=ram,
+                modpack=params.get("modpack"),
+            )
+        except TransferError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except NoFreePort as e:
+            return Response({"error": str(e)}, status=500)
+
+        return Response(
+            {"server_id": server.id, "port": server.port},
+            status=status.HTTP_201_CREATED,
+        )
 
-        with open(log_file, "r", encoding="utf-8", errors="ignore") as f:
-            lines = f.readlines()[-500:]
 
-        return Response({"logs": lines})
+class HostHeadroomAPIView(APIView):
+    """Committed heap and free memory/CPU per host."""
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        hosts = settings.SERVER_PORT_RANGES.keys()
+        return Response({"hosts": [admission.headroom(host) for host in hosts]})
+
+
+class JobListAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            limit = number_param(params, "limit", 100, minimum=1, maximum=1000)
+            server_id = number_param(params, "server", minimum=1)
+        except BadParameter as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        jobs = Job.objects.all()
+        for field in ("status", "kind"):
+            if params.get(field):
+                jobs = jobs.filter(**{field: params[field]})
+        if server_id is not None:
+            jobs = jobs.filter(server=server_id)
+
+        values = jobs.values(
+            "id", "kind", "server", "host", "status", "attempts", "max_attempts",
+            "run_after", "error", "created_at", "started_at", "finished_at",
+        )[:limit]
+        return Response({"jobs": list(values)})
 
 
 class ServerViewSet(ModelViewSet):
@@ -97,6 +97,11 @@ DATABASES = {
     }
 }
 
+if DATABASES["default"]["ENGINE"].endswith("sqlite3"):
+    # a file rather than shared-cache memory, so tests see SQLite's real
+    # locking (busy timeout) like the panel does
+    DATABASES["default"]["TEST"] = {"NAME": BASE_DIR / "test_db.sqlite3"}
+
 CACHES = {
     "default": {
         "BACKEND": os.environ.get(
@@ -153,6 +158,141 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 MINECRAFT_DIR = BASE_DIR / "server_files"
 LOGS_DIR = BASE_DIR / "logs"
+CACHE_DIR = MINECRAFT_DIR / ".cache"
+ARTIFACTS_DIR = MINECRAFT_DIR / ".artifacts"
+INSTALL_TEMPLATES_DIR = MINECRAFT_DIR / ".templates"
+
+ARCADIA_MANIFEST_URL = os.environ.get(
+    "ARCADIA_MANIFEST_URL", "https://jars.arcadiatech.org/manifest.json"
+)
+ARCADIA_MANIFEST_TTL = int(os.environ.get("ARCADIA_MANIFEST_TTL", 600))
+
+LOG_FLUSH_INTERVAL = float(os.environ.get("LOG_FLUSH_INTERVAL", 0.05))
+LOG_BATCH_SIZE = int(os.environ.get("LOG_BATCH_SIZE", 256))
+
+# Panel logs rotate at whichever limit is hit first; rotated segments are
+# compressed with "zstd" (needs the zstandard package, else gzip) or "gzip".
+LOG_ROTATE_BYTES = int(os.environ.get("LOG_ROTATE_BYTES", 64 * 1024 * 1024))
+LOG_ROTATE_AGE = int(os.environ.get("LOG_ROTATE_AGE", 24 * 3600))
+LOG_COMPRESSION = os.environ.get("LOG_COMPRESSION", "zstd")
+LOG_COMPRESSION_LEVEL = int(os.environ.get("LOG_COMPRESSION_LEVEL", 6))
+
+# Recent lines kept per server for WebSocket backfill. Use "redis" when the
+# supervisor runs in its own process (SUPERVISOR_CHANNEL).
+LOG_BUFFER_BACKEND = os.environ.get("LOG_BUFFER_BACKEND", "memory")
+LOG_BUFFER_REDIS_URL = os.environ.get("REDIS_URL", "redis://127.0.0.1:6379/0")
+LOG_BUFFER_SIZE = int(os.environ.get("LOG_BUFFER_SIZE", 2000))
+LOG_BACKFILL_LINES = int(os.environ.get("LOG_BACKFILL_LINES", 500))
+
+# Per-WebSocket flow control: lines queued before the oldest are dropped,
+# the most lines sent in one frame, the bytes sent but not yet acked by
+# the client before sending pauses, and how long a paused connection
+# waits for an ack before it is closed.
+LOG_WS_QUEUE_LINES = int(os.environ.get("LOG_WS_QUEUE_LINES", 5000))
+LOG_WS_FRAME_LINES = int(os.environ.get("LOG_WS_FRAME_LINES", 1000))
+LOG_WS_WINDOW_BYTES = int(os.environ.get("LOG_WS_WINDOW_BYTES", 1024 * 1024))
+LOG_WS_ACK_TIMEOUT = float(os.environ.get("LOG_WS_ACK_TIMEOUT", 30))
+
+SERVER_HOST = os.environ.get("SERVER_HOST", "default")
+
+# Minecraft port ranges per host, as (first, last) pairs.
+SERVER_PORT_RANGES = {
+    SERVER_HOST: [
+        tuple(
+            int(p)
+            for p in os.environ.get("SERVER_PORT_RANGE", "25565-25999").split("-")
+        )
+    ],
+}
+
+MODPACK_HASH_WORKERS = int(
+    os.environ.get("MODPACK_HASH_WORKERS", min(8, os.cpu_count() or 4))
+)
+
+# Launcher token lifetime, and how long a resolved token is cached.
+LAUNCHER_TOKEN_TTL = int(os.environ.get("LAUNCHER_TOKEN_TTL", 30 * 86400))
+LAUNCHER_TOKEN_CACHE_TTL = int(os.environ.get("LAUNCHER_TOKEN_CACHE_TTL", 60))
+
+# Upper bound on how stale the cached launcher server list can get when
+# status changes in another process and the cache is not shared.
+LAUNCHER_SERVERS_TTL = int(os.environ.get("LAUNCHER_SERVERS_TTL", 30))
+
+# Processes chunking and hashing changed files during a backup (the
+# chunker is CPU bound, roughly 13 MB/s per core).
+BACKUP_WORKERS = int(os.environ.get("BACKUP_WORKERS", min(4, os.cpu_count() or 2)))
+
+# Block size of the per-chunk hashes in modpack and launcher manifests.
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# "nginx" (X-Accel-Redirect, files under SENDFILE_ROOT) or "apache"/"lighttpd"
+# (X-Sendfile); empty serves files from Django.
+SENDFILE_BACKEND = os.environ.get("SENDFILE_BACKEND", "")
+SENDFILE_ROOT = os.environ.get("SENDFILE_ROOT", "")
+SENDFILE_URL = os.environ.get("SENDFILE_URL", "/protected/")
+
+# RCON listens on the game port + RCON_PORT_OFFSET.
+RCON_HOST = os.environ.get("RCON_HOST", "127.0.0.1")
+RCON_PORT_OFFSET = int(os.environ.get("RCON_PORT_OFFSET", 10000))
+RCON_TIMEOUT = float(os.environ.get("RCON_TIMEOUT", 5))
+
+# Graceful stop: seconds to wait after "stop" before SIGTERM, and after
+# SIGTERM before SIGKILL.
+SERVER_STOP_TIMEOUT = float(os.environ.get("SERVER_STOP_TIMEOUT", 60))
+SERVER_TERM_TIMEOUT = float(os.environ.get("SERVER_TERM_TIMEOUT", 15))
+
+# World snapshots of running servers: how many may copy at once and how
+# long to wait for "save-all flush" to finish.
+WORLD_SNAPSHOTS_DIR = Path(os.environ.get("WORLD_SNAPSHOTS_DIR", BASE_DIR / "snapshots"))
+WORLD_SNAPSHOT_CONCURRENCY = int(os.environ.get("WORLD_SNAPSHOT_CONCURRENCY", 2))
+WORLD_SNAPSHOT_SAVE_TIMEOUT = float(os.environ.get("WORLD_SNAPSHOT_SAVE_TIMEOUT", 60))
+
+# Server export/import archives: zstd level (gzip when zstandard is missing)
+# and how many 1 MiB blocks may wait between the archiver and the client.
+EXPORT_COMPRESSION_LEVEL = int(os.environ.get("EXPORT_COMPRESSION_LEVEL", 3))
+EXPORT_QUEUE_BLOCKS = int(os.environ.get("EXPORT_QUEUE_BLOCKS", 8))
+
+# Server List Ping status poller (``manage.py pollservers``). Intervals
+# adapt per server between the two bounds.
+SERVER_PING_HOST = os.environ.get("SERVER_PING_HOST", "127.0.0.1")
+STATUS_POLL_MIN_INTERVAL = float(os.environ.get("STATUS_POLL_MIN_INTERVAL", 5))
+STATUS_POLL_MAX_INTERVAL = float(os.environ.get("STATUS_POLL_MAX_INTERVAL", 60))
+STATUS_POLL_TIMEOUT = float(os.environ.get("STATUS_POLL_TIMEOUT", 2))
+STATUS_POLL_CONCURRENCY = int(os.environ.get("STATUS_POLL_CONCURRENCY", 200))
+STATUS_POLL_LATENCY_DELTA = int(os.environ.get("STATUS_POLL_LATENCY_DELTA", 20))
+
+# Seconds to wait after a user change before whitelist/ops are synced to
+# all servers, so bulk edits cause a single pass.
+ACCESS_SYNC_DELAY = float(os.environ.get("ACCESS_SYNC_DELAY", 1.0))
+
+# Background jobs (server provisioning). "local" runs them on threads of
+# the web process (started by the ASGI/WSGI application); "external"
+# leaves them to ``manage.py runjobs``.
+# JOB_HOST_CONCURRENCY caps running jobs per host across all runners and
+# JOB_STAGE_LIMITS caps downloads, installers and disk-heavy copies.
+JOB_RUNNER = os.environ.get("JOB_RUNNER", "local")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+JOB_HOST_CONCURRENCY = int(os.environ.get("JOB_HOST_CONCURRENCY", 4))
+JOB_STAGE_LIMITS = {
+    "download": int(os.environ.get("JOB_DOWNLOAD_CONCURRENCY", 3)),
+    "install": int(os.environ.get("JOB_INSTALL_CONCURRENCY", 1)),
+    "disk": int(os.environ.get("JOB_DISK_CONCURRENCY", 2)),
+}
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_DELAY = float(os.environ.get("JOB_RETRY_DELAY", 10))
+JOB_STALE_AFTER = int(os.environ.get("JOB_STALE_AFTER", 120))
+
+# Admission control for server starts: memory kept free for the OS and
+# panel, expected non-heap JVM memory per server, the highest 1-minute
+# load per CPU at which starts are allowed, and how many times a queued
+# start is retried (with the job backoff) before it gives up.
+ADMISSION_RESERVED_MB = int(os.environ.get("ADMISSION_RESERVED_MB", 1024))
+ADMISSION_JVM_OVERHEAD_MB = int(os.environ.get("ADMISSION_JVM_OVERHEAD_MB", 256))
+ADMISSION_MAX_LOAD = float(os.environ.get("ADMISSION_MAX_LOAD", 1.5))
+ADMISSION_QUEUE_ATTEMPTS = int(os.environ.get("ADMISSION_QUEUE_ATTEMPTS", 10))
+
+# Channel the process supervisor listens on (``manage.py runsupervisor``).
+# Empty means the supervisor runs inside the web process.
+SUPERVISOR_CHANNEL = os.environ.get("SUPERVISOR_CHANNEL", "")
 
 if not os.path.exists(MINECRAFT_DIR):
     os.makedirs(MINECRAFT_DIR)
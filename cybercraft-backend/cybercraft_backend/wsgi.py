@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cybercraft_backend.settings')
 
 application = get_wsgi_application()
+
+from apps.server.jobs import start_local_runner  # noqa: E402
+
+# runs background jobs in this process unless JOB_RUNNER="external"
+start_local_runner()